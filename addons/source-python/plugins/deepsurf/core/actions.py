@@ -0,0 +1,135 @@
+"""Module for the discrete action space of the bots.
+
+An action is a (move, yaw, pitch, jump, duck) tuple of indices.
+ActionSpace compiles the indices into lookup tables once, so
+filling a BotCmd is a few table reads. Disabled buttons keep their
+place in the tuple with a head of size 1, so actions stay 5 wide
+in buffers and recordings.
+This module doesn't depend on Source.Python so the learner can import it.
+"""
+
+# =============================================================================
+# >> ALL DECLARATION
+# =============================================================================
+__all__ = (
+    "ACTION_SPACE_VERSION",
+    "BUTTONS",
+    "ActionSpace",
+)
+
+# =============================================================================
+# >> GLOBAL VARIABLES
+# =============================================================================
+ACTION_SPACE_VERSION = 1
+# button heads in action order
+BUTTONS = ("jump", "duck")
+# (forward, side) signs by move index, 0 is no move,
+# then clockwise from forward
+MOVE_DIRECTIONS = (
+    (0, 0),
+    (1, 0),
+    (1, 1),
+    (0, 1),
+    (-1, 1),
+    (-1, 0),
+    (-1, -1),
+    (0, -1),
+    (1, -1),
+)
+max_pitch = 89.0
+
+
+# =============================================================================
+# >> CLASSES
+# =============================================================================
+class ActionSpace:
+    """Lookup tables for the discrete actions.
+
+    Turn indices up to turn_values / 2 turn by index * turn_step
+    degrees per tick, the ones above turn the other way.
+    masks are the engine's button bits by name in BUTTONS, buttons
+    the enabled ones.
+    """
+
+    def __init__(
+        self,
+        masks=None,
+        move_speed=400.0,
+        turn_values=200,
+        turn_step=0.05,
+        buttons=BUTTONS,
+    ):
+        if turn_values < 2 or turn_values % 2 != 0:
+            raise ValueError(
+                f"Turn values must be even and at least 2, got {turn_values}"
+            )
+        if turn_step <= 0.0:
+            raise ValueError(f"Invalid turn step {turn_step}")
+        for name in buttons:
+            if name not in BUTTONS:
+                raise ValueError(f"Unknown button '{name}', use some of {BUTTONS}")
+
+        self.move_speed = float(move_speed)
+        self.turn_values = turn_values
+        self.turn_step = float(turn_step)
+        self.buttons = tuple(name for name in BUTTONS if name in buttons)
+
+        self.forward_moves = tuple(
+            forward * self.move_speed for forward, _ in MOVE_DIRECTIONS
+        )
+        self.side_moves = tuple(side * self.move_speed for _, side in MOVE_DIRECTIONS)
+        half = turn_values // 2
+        self.turns = tuple(
+            i * self.turn_step if i <= half else -(i - half) * self.turn_step
+            for i in range(turn_values + 1)
+        )
+        # bits pressed by each button head, 0 for disabled buttons
+        self.button_masks = tuple(
+            (masks or {}).get(name, 0) if name in self.buttons else 0
+            for name in BUTTONS
+        )
+
+        self.heads = (len(MOVE_DIRECTIONS), turn_values + 1, turn_values + 1) + tuple(
+            2 if name in self.buttons else 1 for name in BUTTONS
+        )
+        self.null_action = (0,) * len(self.heads)
+
+    def fill(self, bcmd, view_angles, base, action):
+        """Fill bcmd for action, turning from the base view angles.
+
+        view_angles is the QAngle reused for bcmd's aim.
+        """
+        move, yaw, pitch, jump, duck = action
+        turns = self.turns
+
+        pitch = base.x + turns[pitch]
+        if pitch < -max_pitch:
+            pitch = -max_pitch
+        elif pitch > max_pitch:
+            pitch = max_pitch
+        view_angles.x = pitch
+        view_angles.y = base.y + turns[yaw]
+        view_angles.z = base.z
+        bcmd.view_angles = view_angles
+
+        bcmd.forward_move = self.forward_moves[move]
+        bcmd.side_move = self.side_moves[move]
+        jump_mask, duck_mask = self.button_masks
+        bcmd.buttons = (jump_mask if jump else 0) | (duck_mask if duck else 0)
+        return bcmd
+
+    def descriptor(self):
+        """Get the action space as (key, value) pairs of plain values,
+        as posted to the learner."""
+        return (
+            ("version", ACTION_SPACE_VERSION),
+            ("heads", self.heads),
+            ("parts", ("move", "yaw", "pitch") + BUTTONS),
+            ("buttons", self.buttons),
+            ("move_speed", self.move_speed),
+            ("forward_moves", self.forward_moves),
+            ("side_moves", self.side_moves),
+            ("turn_values", self.turn_values),
+            ("turn_step", self.turn_step),
+            ("turns", self.turns),
+        )
@@ -4,34 +4,37 @@
 # >> IMPORTS
 # =============================================================================
 # Python
-import math
-import pickle
-import rpyc
-
-rpyc.core.protocol.DEFAULT_CONFIG["allow_pickle"] = True
+import sys
+import time
 
 # Source.Python
 from effects import beam
 from engines.precache import Model
-from engines.trace import engine_trace
 from engines.server import server
 from entities.helpers import index_from_edict
 from filters.recipients import RecipientFilter
 from mathlib import Vector, NULL_VECTOR, QAngle, NULL_QANGLE
 from players.bots import bot_manager, BotCmd
 from players.entity import Player
-from players.constants import PlayerButtons
+from players.constants import PlayerButtons, PlayerStates
 
 # deepsurf
-from .helpers import CustomEntEnum
-from .reward import (
-    DistanceReward,
-    VelocityReward,
-    FaceTargetReward,
-    FaceVelocityReward,
-    RampReward,
-)
+from .actions import ActionSpace, BUTTONS
+from .helpers import EngineTracer, teleport_index
+from .reward import RewardEngine
+from .budget import FrameBudget, QUALITY_LEVELS
+from .buffer import TransitionBuffer
 from .hud import draw_hud
+from .network import ActionPipeline, BatchResult, LearnerUnavailable, NetworkClient
+from .policy import Policy
+from .profiler import profiler
+from .recording import Recorder
+from .sensors import LAYOUTS, RaySensor, get_layout
+from .state import Observation
+from .tracing import TraceCache, TraceLog
+from .snapshot import ReadCounter, Snapshot
+from .stages import StageSampler
+from .starts import RecordingStarts, RouteStarts
 from .zone import Segment
 
 # =============================================================================
@@ -40,74 +43,120 @@ from .zone import Segment
 debug_rays = False
 debug_points = False
 beam_model = Model("sprites/laserbeam.vmt")
-point_directions = []
-# the actual number of directions will be
-# x - sqrt(x) + 2, e.g. 100 -> 92
-# because we only need 1 for both directly up and down
-num_directions = int(round(math.sqrt(100)))
-increment = 360.0 / num_directions
-theta = 0.0
-phi = 0.0
-
-for i in range(0, num_directions + 1):  # theta in range [0.0 : 180.0]
-    for j in range(0, num_directions):  # phi in range [0.0 : 360.0 - increment]
-        x = math.sin(math.radians(theta)) * math.cos(math.radians(phi))
-        y = math.sin(math.radians(theta)) * math.sin(math.radians(phi))
-        z = math.cos(math.radians(theta))
-        point_directions.append(Vector(x, y, z))
-
-        # only need one direction at north and south poles
-        if i == 0 or i == num_directions:
-            break
-
-        phi += increment
-
-    theta += increment * 0.5  # theta only changes by 180
-    phi = 0.0
+# engine button bits by actions.BUTTONS name
+button_masks = {name: getattr(PlayerButtons, name.upper()) for name in BUTTONS}
+default_action_space = ActionSpace(button_masks)
+# eye height of a ducked player, VEC_DUCK_VIEW in TF2
+ducked_view_offset = Vector(0, 0, 45)
 
 
 # =============================================================================
 # >> CLASSES
 # =============================================================================
 class Bot:
-    """A controllable bot class"""
-
-    __instance = None
-    conn = None
-    network = None
-    state = None
-    reward_functions = []
-
-    @staticmethod
-    def instance():
-        """Singleton instance"""
-        if Bot.__instance is None:
-            Bot()
-        return Bot.__instance
-
-    def __init__(self):
-        """Create a new bot"""
-        if Bot.__instance is not None:
-            raise Exception("This class is a singleton, use .instance() access method.")
+    """A controllable bot, one environment of Bots"""
 
+    def __init__(self, slot):
+        """Create a new bot for slot"""
+        self.slot = slot
         self.spawned = False
         self.bot = None
         self.controller = None
         self.training = False
         self.running = False
+        self.state = None
+        # maps actions to commands, see set_action_space
+        self.action_space = default_action_space
+        # reused for every command, see get_cmd
+        self.bcmd = BotCmd()
+        self.bcmd.reset()
+        self.view_angles = QAngle()
+        self.action = self.action_space.null_action
+        # reward components, see reward.py
+        self.reward = RewardEngine()
         self.drawn_directions = 32
         self.time_limit = 10.0
+        # segment episodes run on, the stage's when training stages
+        self.segment = Segment.instance()
+        # stage of the map the bot is on, None for Segment.instance()
+        self.stage = None
+        # stage the bot stays on when training stages, -1 for any
+        self.fixed_stage = -1
+        # called with (bot, episode ended) on reset to pick the stage,
+        # see Bots.set_stages
+        self.stage_picker = None
+        # stage, fraction of the route reached and whether the end
+        # was reached in the last finished episode
+        self.episode_stage = None
+        self.episode_progress = 0.0
+        self.episode_completed = False
+        self.episode_ended = False
+        # added to the start zone point on reset
+        self.start_offset = Vector()
+        # samples the states episodes start from instead of the
+        # start zone when set, see starts.py
+        self.starts = None
+        # restore the start state without a null move and send the first
+        # state on the tick the last episode ended, see set_fast_reset
+        self.fast_reset = False
+        # reused for restoring start states
+        self.start_origin = Vector()
+        self.start_angles = QAngle()
+        self.start_velocity = Vector()
+        # eye height when standing, depends on the class, see on_spawn
+        self.view_offset = None
+        # where the current episode started, for the reward
+        self.start_point = Vector()
+        # tick of the last reset until the episode's first action
+        # is applied, -1 after
+        self.reset_tick = -1
+        self.action_received = False
+        # resets, seconds spent in them, and episodes started with the
+        # ticks wasted between the reset and their first action
+        self.resets = 0
+        self.reset_time = 0.0
+        self.started = 0
+        self.wasted_ticks = 0
         self.start_time = 0.0
         self.total_reward = 0.0
-        self.conn = rpyc.connect("localhost", 18811)
-        self.network = self.conn.root.Network()
-        Bot.__instance = self
+        # total reward of the last finished episode
+        self.episode_reward = 0.0
+        # incremented on reset, drops actions requested for older episodes
+        self.episode = 0
+        # entities ignored by traces, see set_filter
+        self.filter = ()
+        # kinematics and route progress, captured once per tick
+        self.snapshot = Snapshot()
+        # counts engine reads while set, see count_reads
+        self.read_counter = None
+        self.read_ticks = 0
+        # buffers transitions when set, see Bots.set_buffer
+        self.buffer = None
+        # records ticks when set, see Bots.set_recording
+        self.recorder = None
+        # action applied on the last tick
+        self.applied_action = self.action_space.null_action
+        # ticks each action is applied for, see set_action_repeat
+        self.action_repeat = 1
+        # ticks the current action is still applied for
+        self.repeat_left = 0
+        # reward summed over the ticks of the current action
+        self.repeat_reward = 0.0
+        # budget.QUALITY_LEVELS level sensing is degraded to
+        self.quality = 0
+        self.sensor = None
+        self.set_sensor_layout("grid", 92)
+
+    def get_name(self):
+        if self.slot == 0:
+            return "Botty McBotface"
+        return f"Botty McBotface {self.slot + 1}"
 
     def spawn(self):
         if self.bot is not None or self.controller is not None:
             return
 
-        bot_edict = bot_manager.create_bot("Botty McBotface")
+        bot_edict = bot_manager.create_bot(self.get_name())
         if bot_edict is None:
             raise ValueError("Failed to create a bot")
 
@@ -120,44 +169,126 @@ class Bot:
         self.bot.set_property_uchar("m_PlayerClass.m_iClass", 7)
         self.bot.set_property_uchar("m_Shared.m_iDesiredPlayerClass", 7)
         self.bot.spawn(force=True)
-        self.reward_functions = [
-            DistanceReward(self.bot, 0.5),
-            VelocityReward(self.bot, 2.0),
-            FaceTargetReward(self.bot, 2.0),
-            FaceVelocityReward(self.bot, 2.0),
-            RampReward(self.bot, 2.0),
-        ]
+        self.filter = (self.bot,)
+        self.sensor.set_tracer(
+            EngineTracer(
+                self.filter,
+                enumerate_teleports=self.sensor.teleport_index is None
+                and not self.sensor.skip_teleports,
+            )
+        )
 
     def on_spawn(self):
         self.spawned = True
         # these need to be set after spawning
         self.bot.set_noblock(True)
+        self.view_offset = self.bot.get_property_vector("m_vecViewOffset")
         self.reset()
 
+    def is_active(self):
+        return self.bot is not None and self.controller is not None and self.spawned
+
+    def set_filter(self, filter):
+        """Ignore filter entities in traces, e.g. all bots"""
+        self.filter = filter
+        if self.sensor.tracer is not None:
+            self.sensor.tracer.filter = filter
+        if self.sensor.cache is not None:
+            self.sensor.cache.clear()
+
     def reset(self):
         if self.bot is None:
             return
 
-        if Segment.instance().start_zone is None:
+        if self.stage_picker is not None:
+            self.stage_picker(self, self.episode_ended)
+        self.episode_ended = False
+        if self.segment.start_zone is None:
             print("[deepsurf] No start zone")
             return
 
+        reset_start = time.perf_counter()
         self.total_reward = 0.0
-        bcmd = self.get_cmd(0, 0, 0, 0, 0)
-        self.controller.run_player_move(bcmd)
-        self.bot.snap_to_position(
-            Segment.instance().start_zone.point,
-            QAngle(0, Segment.instance().start_zone.orientation, 0),
-        )
+        if not self.fast_reset:
+            self.controller.run_player_move(self.get_cmd(self.action_space.null_action))
+        self.restore_start()
         self.state = None
-        for rf in self.reward_functions:
-            rf.reset()
+        self.action = self.action_space.null_action
+        self.applied_action = self.action_space.null_action
+        self.repeat_left = 0
+        self.repeat_reward = 0.0
+        if self.recorder is not None:
+            self.recorder.end_episode(self.slot)
+        self.episode += 1
+        self.sensor.reset()
+        self.snapshot.progress.reset()
+        self.reward.reset()
+        self.reset_tick = server.tick
+        self.action_received = False
+        self.resets += 1
+        self.reset_time += time.perf_counter() - reset_start
+
+    def restore_start(self):
+        """Put the bot in the next start state in one step, position,
+        view angles, velocity and duck state."""
+        origin = self.start_origin
+        angles = self.start_angles
+        velocity = self.start_velocity
+        if self.starts is None:
+            zone = self.segment.start_zone
+            origin.x = zone.point.x + self.start_offset.x
+            origin.y = zone.point.y + self.start_offset.y
+            origin.z = zone.point.z + self.start_offset.z
+            angles.x, angles.y, angles.z = 0.0, zone.orientation, 0.0
+            velocity.x, velocity.y, velocity.z = 0.0, 0.0, 0.0
+            ducked = False
+            start = zone.point
+        else:
+            kinematics, ducked = self.starts.next()
+            (
+                origin.x,
+                origin.y,
+                origin.z,
+                velocity.x,
+                velocity.y,
+                velocity.z,
+                angles.x,
+                angles.y,
+                angles.z,
+            ) = kinematics.tolist()
+            start = origin
+
+        self.bot.snap_to_position(origin, angles, velocity)
+        self.set_ducked(ducked)
+        self.start_point.x = start.x
+        self.start_point.y = start.y
+        self.start_point.z = start.z
+
+    def set_ducked(self, ducked):
+        """Duck or stand the bot at once, without a duck transition.
+        The engine picks the hull from the flags on its next think."""
+        flags = self.bot.get_property_int("m_fFlags")
+        if ducked:
+            flags |= PlayerStates.DUCKING
+        else:
+            flags &= ~PlayerStates.DUCKING
+        self.bot.set_property_int("m_fFlags", flags)
+        self.bot.set_property_bool("m_Local.m_bDucked", ducked)
+        self.bot.set_property_bool("m_Local.m_bDucking", False)
+        self.bot.set_property_float("m_Local.m_flDucktime", 0.0)
+        if ducked:
+            self.bot.set_property_vector("m_vecViewOffset", ducked_view_offset)
+        elif self.view_offset is not None:
+            self.bot.set_property_vector("m_vecViewOffset", self.view_offset)
 
     def kick(self, reason):
+        if self.read_counter is not None:
+            self.stop_counting_reads()
         if self.bot is not None:
             self.bot.kick(reason)
             self.bot = None
             self.controller = None
+            self.spawned = False
 
     def train(self):
         self.running = False
@@ -176,199 +307,247 @@ class Bot:
         self.running = False
         self.reset()
 
+    def capture(self):
+        """Read the bot's kinematics for this tick, shared by
+        get_state, get_cmd, the reward functions and the HUD."""
+        self.snapshot.capture(self.bot, self.filter, self.segment)
+
     def get_reward(self):
-        reward = 0.0
-        for rf in self.reward_functions:
-            rf.tick()
-            reward += rf.get()
-        return reward
+        return self.reward.tick(self.snapshot, self.start_point)
 
     def end_run(self):
-        print(f"run end, reward: {self.total_reward}")
-
-        if self.training:
-            self.network.end_episode(self.total_reward)
+        print(f"bot {self.slot} run end, reward: {self.total_reward}")
+        self.episode_reward = self.total_reward
+        self.reward.end_episode()
+        self.episode_stage = self.stage
+        route = self.segment.get_route()
+        progress = (
+            self.snapshot.progress.distance / route.length if route.length else 0.0
+        )
+        self.episode_progress = min(max(progress, 0.0), 1.0)
+        self.episode_completed = self.reached_end()
+        self.episode_ended = True
+        self.restart()
 
+    def restart(self):
+        """Start a new episode"""
         self.reset()
         self.start_time = server.time
 
-    def tick(self):
-        if self.bot is None or self.controller is None:
-            return
-
-        if not self.spawned:
-            return
-
-        if self.training:
-            self.train_tick()
-        elif self.running:
-            self.run_tick()
+    def end_tick(self):
+        if self.read_counter is not None:
+            self.read_ticks -= 1
+            if self.read_ticks <= 0:
+                self.stop_counting_reads()
+
+    def apply_action(self):
+        if self.action_received and self.reset_tick >= 0:
+            # the first state's tick isn't wasted if it's the reset tick
+            self.wasted_ticks += server.tick - self.reset_tick - 1
+            self.started += 1
+            self.reset_tick = -1
+        self.controller.run_player_move(self.get_cmd(self.action))
+        self.applied_action = self.action
+
+    def set_action(self, action):
+        """Set the action from the learner or policy to apply"""
+        self.action = action
+        self.action_received = True
 
     def train_tick(self):
-        # use values from previous tick for optimization
+        """Step the episode with the last action from the learner.
+
+        Returns the (env_id, reward, state, done) entry to send
+        to the learner, see Bots.tick. The reward is None for the
+        first state of an episode, the bot doesn't move on that tick.
+        Returns None while repeating an action, see set_action_repeat,
+        the entry after the last repeat has the rewards summed.
+        """
         if self.state is None:
+            self.capture()
             self.state = self.get_state()
+            self.repeat_left = self.action_repeat
+            if self.buffer is not None:
+                self.buffer.begin(self.state)
+            if self.recorder is not None:
+                self.record(0.0, False, True)
+            return self.slot, None, self.state, False
 
-        (
-            move_action,
-            yaw_action,
-            pitch_action,
-            jump_action,
-            duck_action,
-        ) = self.get_action(self.state)
-        bcmd = self.get_cmd(
-            move_action, yaw_action, pitch_action, jump_action, duck_action
-        )
-        self.controller.run_player_move(bcmd)
+        self.apply_action()
+        self.repeat_left -= 1
 
+        self.capture()
         reward = self.get_reward()
         self.total_reward += reward
 
         time_elapsed = self.time_limit - (server.time - self.start_time)
-        if server.tick % 67 == 0:
-            draw_hud(self.bot, time_elapsed, self.training, self.total_reward)
+        if server.tick % 67 == 0 and QUALITY_LEVELS[self.quality].draw:
+            draw_hud(
+                self.bot,
+                self.snapshot,
+                time_elapsed,
+                self.training,
+                self.total_reward,
+                self.reward,
+            )
 
         done = self.is_done()
+        if not done and self.repeat_left > 0:
+            self.repeat_reward += reward
+            return None
 
+        reward += self.repeat_reward
+        self.repeat_reward = 0.0
+        self.repeat_left = self.action_repeat
         self.state = self.get_state()
-        self.network.post_action(reward, pickle.dumps(self.state), done)
+        if self.buffer is not None:
+            self.buffer.add(self.action, reward, done, self.state)
+        if self.recorder is not None:
+            self.record(reward, done, False)
+        entry = (self.slot, reward, self.state, done)
         if done:
             self.end_run()
+        return entry
 
-    def run_tick(self):
+    def observe(self):
+        """Get the (env_id, state) entry to request a greedy action for"""
+        first = self.state is None
+        self.capture()
         self.state = self.get_state()
-        (
-            move_action,
-            yaw_action,
-            pitch_action,
-            jump_action,
-            duck_action,
-        ) = self.get_action_run(self.state)
-        bcmd = self.get_cmd(
-            move_action, yaw_action, pitch_action, jump_action, duck_action
-        )
-        self.controller.run_player_move(bcmd)
+        self.repeat_left = self.action_repeat
+        if self.recorder is not None:
+            # rewards are only computed for recordings when running
+            reward = 0.0 if first else self.get_reward()
+            self.total_reward += reward + self.repeat_reward
+            self.record(reward + self.repeat_reward, False, first)
+        self.repeat_reward = 0.0
+        return self.slot, self.state
+
+    def observe_local(self):
+        """Get the observation buffer for an in-process policy"""
+        self.observe()
+        return self.observation
+
+    def act(self):
+        """Apply the greedy action for the observed state"""
+        self.apply_action()
+        self.repeat_left -= 1
 
         time_elapsed = self.time_limit - (server.time - self.start_time)
-        if server.tick % 67 == 0:
-            draw_hud(self.bot, time_elapsed, self.training, 0)
+        if server.tick % 67 == 0 and QUALITY_LEVELS[self.quality].draw:
+            draw_hud(self.bot, self.snapshot, time_elapsed, self.training, 0)
 
         if self.is_done():
+            if self.recorder is not None:
+                self.recorder.mark_done(self.slot)
             self.end_run()
 
-    def is_done(self):
-        end_distance = Vector.get_distance(
-            self.bot.origin, Segment.instance().end_zone.point
+    def repeat(self):
+        """Apply the greedy action again without observing,
+        see set_action_repeat"""
+        self.capture()
+        if self.recorder is not None:
+            self.repeat_reward += self.get_reward()
+        self.act()
+
+    def is_repeating(self):
+        """Is the bot still applying its last action?"""
+        return self.repeat_left > 0
+
+    def set_action_repeat(self, ticks):
+        """Apply each action for ticks ticks, summing their rewards.
+        The bot only senses and asks for actions every ticks ticks,
+        episodes still end on the tick they're done."""
+        self.action_repeat = max(1, ticks)
+        self.restart()
+
+    def record(self, reward, done, first):
+        """Record this tick's state, see recording.py"""
+        snapshot = self.snapshot
+        origin = snapshot.origin
+        velocity = snapshot.velocity
+        angle = snapshot.view_angle
+        self.recorder.record(
+            self.slot,
+            self.applied_action,
+            reward,
+            done,
+            self.state,
+            (
+                origin.x,
+                origin.y,
+                origin.z,
+                velocity.x,
+                velocity.y,
+                velocity.z,
+                angle.x,
+                angle.y,
+                angle.z,
+            ),
+            first,
+            snapshot.ducked,
         )
-        done = end_distance < 100.0
+
+    def reached_end(self):
+        """Is the bot at the end zone as of the last snapshot?"""
+        end = self.segment.end_zone.point
+        return Vector.get_distance(self.snapshot.origin, end) < 100.0
+
+    def is_done(self):
+        """Has the episode ended as of the last snapshot?"""
+        done = self.reached_end()
 
         if server.time > self.start_time + self.time_limit:
             done = True
 
         return done
 
-    def get_angle_change(self, index):
-        turn_values = 200
-
-        # min 0.05 per tick, max 5.0
-        # (3.35 /s , 335 /s)
-        if index <= turn_values / 2:
-            return index * 0.05
-
-        index -= turn_values / 2
-        return index * -0.05
-
-    def get_cmd(
-        self, move_action=0, yaw_action=0, pitch_action=0, jump_action=0, duck_action=0
-    ):
-        """Get BotCmd for move direction and aim delta"""
-        bcmd = BotCmd()
-        bcmd.reset()
-        view_angles = self.bot.view_angle
-
-        if yaw_action != 0:
-            view_angles.y += self.get_angle_change(yaw_action)
-        if pitch_action != 0:
-            view_angles.x += self.get_angle_change(pitch_action)
-            if view_angles.x < -89.0:
-                view_angles.x = -89.0
-            if view_angles.x > 89.0:
-                view_angles.x = 89.0
-
-        bcmd.view_angles = view_angles
-
-        if move_action != 0:
-            # Map move direction to forward + side axis
-            move_speed = 400
-            move_options = {
-                1: {"forward_move": move_speed, "side_move": 0},
-                2: {"forward_move": move_speed, "side_move": move_speed},
-                3: {"forward_move": 0, "side_move": move_speed},
-                4: {"forward_move": -move_speed, "side_move": move_speed},
-                5: {"forward_move": -move_speed, "side_move": 0},
-                6: {"forward_move": -move_speed, "side_move": -move_speed},
-                7: {"forward_move": 0, "side_move": -move_speed},
-                8: {"forward_move": move_speed, "side_move": -move_speed},
-            }
-            move = move_options[move_action]
-            bcmd.forward_move = move["forward_move"]
-            bcmd.side_move = move["side_move"]
-
-        if jump_action != 0:
-            bcmd.buttons |= PlayerButtons.JUMP
-
-        if duck_action != 0:
-            bcmd.buttons |= PlayerButtons.DUCK
-
-        return bcmd
-
-    def get_action(self, state):
-        action = self.network.get_action(pickle.dumps(state))
-        return action
-
-    def get_action_run(self, state):
-        action = self.network.get_action_run(pickle.dumps(state))
-        return action
+    def get_cmd(self, action):
+        """Get the bot's BotCmd for action, turning from the
+        snapshot's view angles, see actions.ActionSpace"""
+        return self.action_space.fill(
+            self.bcmd, self.view_angles, self.snapshot.view_angle, action
+        )
 
     def get_state(self):
-        point_cloud = self.get_point_cloud()
-        state = []
-        for point in point_cloud:
-            state.append(point["distance"])
-        for point in point_cloud:
-            state.append(1.0 if point["is_teleport"] else 0.0)
+        """Get the encoded observation of the bot, see state.py"""
+        observation = self.observation
+        sensor = self.get_point_cloud()
+        observation.distances[:] = sensor.distances
+        observation.teleports[:] = sensor.teleports
+        observation.set_ages(sensor.ages)
 
         # project velocity to bots orientation
-        velocity = self.bot.get_property_vector("m_vecVelocity")
-        forward = Vector()
-        right = Vector()
-        self.bot.rotation.get_angle_vectors(forward, right)
-        state.extend([velocity.dot(forward), velocity.dot(right), velocity.z])
+        # (snapshot is captured for this tick by the caller)
+        snapshot = self.snapshot
+        velocity = snapshot.velocity
+        forward = snapshot.body_forward
+        right = snapshot.body_right
+        observation.velocity[:] = (
+            velocity.dot(forward),
+            velocity.dot(right),
+            velocity.z,
+        )
 
         # next point direction oriented to bot space
-        remaining_points = Segment.instance().get_remaining_points(self.bot.origin)
-        self.bot.rotation.get_angle_vectors(forward, right)
-        next_point = remaining_points[0]  # guaranteed length >= 1 if segment valid
-        origin = self.bot.origin
-        diff = next_point - origin
-        state.extend([diff.dot(forward), diff.dot(right), diff.z])
+        origin = snapshot.origin
+        diff = snapshot.progress.next_point - origin
+        observation.waypoints[0:3] = (diff.dot(forward), diff.dot(right), diff.z)
 
         # 2nd next point oriented to bot space
         # (same as previous if the end)
-        self.bot.rotation.get_angle_vectors(forward, right)
-        if len(remaining_points) > 1:
-            next_point = remaining_points[1]
-        origin = self.bot.origin
-        diff = next_point - origin
-        state.extend([diff.dot(forward), diff.dot(right), diff.z])
+        diff = snapshot.progress.next_next_point - origin
+        observation.waypoints[3:6] = (diff.dot(forward), diff.dot(right), diff.z)
 
         if debug_points:
-            for i in range(0, len(remaining_points)):
+            for end_position in (
+                snapshot.progress.next_point,
+                snapshot.progress.next_next_point,
+            ):
                 color = [255, 0, 0]
-                end_position = remaining_points[i]
                 beam(
                     RecipientFilter(),
-                    start=self.bot.origin,
+                    start=origin,
                     end=end_position,
                     parent=False,
                     life_time=1,
@@ -381,67 +560,37 @@ class Bot:
                     start_width=0.4,
                     end_width=0.4,
                 )
-                if i >= 1:
-                    break
 
-        return state
+        return observation.encode()
 
     def get_point_cloud(self):
-        points = []
-
-        # Transform to local space of bot
-        cos = math.cos(self.bot.view_angle.y)
-        sin = math.cos(self.bot.view_angle.y)
-        direction_num = 1
-
-        for direction in point_directions:
-            local_dir = Vector(
-                direction.x * cos - direction.y * sin,
-                direction.x * sin + direction.y * cos,
-            )
-            point = self.get_single_point(
-                Vector.normalized(local_dir), 10000.0, direction_num
-            )
-            direction_num += 1
-            points.append(point)
+        """Cast the sensor rays, results are in self.sensor"""
+        origin = self.snapshot.origin
+        self.sensor.sense((origin.x, origin.y, origin.z), self.snapshot.view_angle.y)
 
         if debug_rays:
+            self.draw_rays(origin)
             # can only draw 32 temporary entities per frame
             self.drawn_directions += 32
 
-        return points
+        return self.sensor
 
-    def get_single_point(self, direction: Vector, distance: float, direction_num):
-        point = {"distance": distance, "is_teleport": False}
+    def draw_rays(self, origin):
+        sensor = self.sensor
+        for i in range(max(0, self.drawn_directions - 32), self.drawn_directions):
+            if i >= len(sensor):
+                break
 
-        # shoot rays from above bot origin so they can "see" more of the ground / ramps, etc.
-        destination = self.bot.origin + Vector(0, 0, 48) + direction * distance
-        entity_enum = CustomEntEnum(self.bot.origin, destination, (self.bot,))
-
-        # Check for normal geometry
-        entity_enum.normal_trace()
-
-        # Check for trigger_teleports
-        engine_trace.enumerate_entities(entity_enum.ray, True, entity_enum)
-
-        if entity_enum.did_hit:
-            point["distance"] = Vector.get_distance(self.bot.origin, entity_enum.point)
-            point["is_teleport"] = entity_enum.is_teleport
-
-        if (
-            debug_rays is True
-            and self.drawn_directions - 32 < direction_num <= self.drawn_directions
-        ):
             color = [255, 0, 0]
-            end_position = destination
-            if entity_enum.did_hit:
+            end_position = Vector(*sensor.ends[i])
+            if sensor.hits[i] is not None:
                 color = [0, 255, 0]
-                end_position = entity_enum.point
-                if entity_enum.is_teleport is True:
+                end_position = Vector(*sensor.hits[i])
+                if sensor.teleports[i]:
                     color = [0, 0, 255]
             beam(
                 RecipientFilter(),
-                start=self.bot.origin,
+                start=origin,
                 end=end_position,
                 parent=False,
                 life_time=100,
@@ -455,7 +604,10 @@ class Bot:
                 end_width=0.4,
             )
 
-        return point
+    def set_action_space(self, action_space):
+        """Map actions with an actions.ActionSpace"""
+        self.action_space = action_space
+        self.restart()
 
     def set_time_limit(self, value: float):
         self.time_limit = value
@@ -463,10 +615,919 @@ class Bot:
     def get_time_limit(self):
         return self.time_limit
 
+    def set_start_offset(self, offset):
+        """Start episodes at offset from the start zone point."""
+        self.start_offset = offset
+
+    def set_starts(self, starts):
+        """Start episodes from states of a starts.StartSampler,
+        None for the start zone."""
+        self.starts = starts
+        self.restart()
+
+    def set_fixed_stage(self, stage):
+        """Keep the bot on stage when training stages, -1 for
+        any stage, see Bots.set_stages."""
+        self.fixed_stage = stage
+        self.restart()
+
+    def set_fast_reset(self, enabled):
+        """Reset in one step and send the first state of an episode on
+        the tick the last one ended, see Bots.step."""
+        self.fast_reset = enabled
+        self.restart()
+
+    def get_reset_stats(self):
+        """Get (resets, mean ticks wasted before an episode's first
+        action, mean reset ms)."""
+        return (
+            self.resets,
+            self.wasted_ticks / self.started if self.started > 0 else 0.0,
+            self.reset_time / self.resets * 1000.0 if self.resets > 0 else 0.0,
+        )
+
+    def reset_reset_stats(self):
+        self.resets = 0
+        self.reset_time = 0.0
+        self.started = 0
+        self.wasted_ticks = 0
+
+    def count_reads(self, ticks):
+        """Count the bot's engine property reads for the next ticks."""
+        if self.bot is None or self.read_counter is not None:
+            return
+        self.read_counter = ReadCounter(self.bot)
+        self.read_ticks = ticks
+        self.read_total_ticks = ticks
+        self.bot = self.read_counter
+
+    def stop_counting_reads(self):
+        counter = self.read_counter
+        self.bot = counter.player
+        self.read_counter = None
+        ticks = self.read_total_ticks - self.read_ticks
+        if ticks > 0:
+            print(
+                f"[deepsurf] {round(counter.reads / ticks, 1)} engine reads per tick "
+                f"over {ticks} ticks"
+            )
+
+    def set_sensor_layout(self, name, budget, fov=180.0):
+        """Use a ray sensor layout from sensors.py with at most budget rays."""
+        sensor = RaySensor(get_layout(name, budget, fov))
+        sensor.teleport_index = teleport_index
+        ages = False
+        if self.sensor is not None:
+            sensor.set_tracer(self.sensor.tracer)
+            sensor.set_cache(self.sensor.cache)
+            sensor.teleport_index = self.sensor.teleport_index
+            sensor.reuse_distance = self.sensor.reuse_distance
+            sensor.refresh_count = min(self.sensor.refresh_count, len(sensor))
+            sensor.set_forward_bias(self.sensor.forward_bias)
+            ages = self.observation.ages_size > 0
+        self.sensor = sensor
+        self.sensor_layout = name
+        self.observation = Observation(len(sensor), LAYOUTS.index(name), ages)
+        self.on_observation_changed()
+
+    def set_trace_cache(self, grid_size, capacity):
+        """Cache trace results in cells of grid_size units, 0 to disable."""
+        if grid_size > 0 and capacity > 0:
+            self.sensor.set_cache(TraceCache(self.sensor.tracer, grid_size, capacity))
+        else:
+            self.sensor.set_cache(None)
+
+    def set_teleport_index(self, enabled):
+        """Find teleports with the teleport index instead of
+        enumerating entities for every ray."""
+        self.sensor.teleport_index = teleport_index if enabled else None
+        if self.sensor.tracer is not None:
+            self.sensor.tracer.enumerate_teleports = (
+                not enabled and not self.sensor.skip_teleports
+            )
+        if self.sensor.cache is not None:
+            # cached results may or may not include teleports
+            self.sensor.cache.clear()
+
+    def set_stagger(self, refresh_count, forward_bias=0.0, ages=False):
+        """Trace only refresh_count rays per tick (0 for all), refreshing
+        forward rays more often with forward_bias. ages adds the ray
+        ages channel to observations."""
+        self.sensor.refresh_count = min(refresh_count, len(self.sensor))
+        self.sensor.set_forward_bias(forward_bias)
+        self.sensor.reset_stats()
+        self.observation = Observation(len(self.sensor), self.observation.layout, ages)
+        self.on_observation_changed()
+
+    def set_quality(self, level):
+        """Degrade sensing to a budget.QUALITY_LEVELS level,
+        0 for full quality. Observations record the level."""
+        quality = QUALITY_LEVELS[level]
+        self.quality = level
+        self.observation.set_quality(level)
+        sensor = self.sensor
+        if quality.ray_fraction < 1.0:
+            sensor.ray_limit = max(1, int(len(sensor) * quality.ray_fraction))
+        else:
+            sensor.ray_limit = 0
+
+        skip_teleports = not quality.teleports
+        if sensor.skip_teleports != skip_teleports:
+            sensor.skip_teleports = skip_teleports
+            if sensor.tracer is not None:
+                sensor.tracer.enumerate_teleports = (
+                    sensor.teleport_index is None and not skip_teleports
+                )
+            if sensor.cache is not None:
+                # cached results may or may not include teleports
+                sensor.cache.clear()
+
+    def on_observation_changed(self):
+        self.set_quality(self.quality)
+        if self.buffer is not None:
+            # buffered observations have the old size
+            self.set_buffer(self.buffer.capacity)
+        self.reset()
+
+    def set_buffer(self, capacity):
+        """Buffer up to capacity transitions, 0 to disable."""
+        if capacity > 0:
+            self.buffer = TransitionBuffer(capacity, self.observation.size)
+        else:
+            self.buffer = None
+
+    def is_blocked(self):
+        """Is the bot waiting for buffered transitions to be sent?"""
+        if self.buffer is None:
+            return False
+        if self.state is None:
+            return not self.buffer.can_begin()
+        return self.buffer.is_full()
+
+    def log_traces(self, path=None):
+        """Start logging the sensor's traces, or stop and save
+        them to path, see tracing.TraceLog. Returns the traces saved."""
+        tracer = self.sensor.tracer
+        if path is None:
+            if not isinstance(tracer, TraceLog):
+                self.sensor.set_tracer(TraceLog(tracer))
+            return 0
+
+        if not isinstance(tracer, TraceLog):
+            return 0
+        tracer.save(path)
+        self.sensor.set_tracer(tracer.tracer)
+        return len(tracer)
+
+    def set_trace_reuse(self, distance):
+        """Reuse the last tick's rays if the bot moved less than distance."""
+        self.sensor.reuse_distance = distance
+
     def get_origin(self):
         if self.bot is not None:
             return self.bot.origin
         return NULL_VECTOR
 
+
+class Bots:
+    """Bots sharing one learner connection, one environment per slot.
+
+    The transitions of all training bots are sent to the learner
+    in a single message per tick, see NetworkClient.step_batch.
+    Bots are paused while the learner is unavailable and start new
+    episodes once it's back. Running bots don't need the learner
+    when a policy is loaded, see set_policy.
+    """
+
+    __instance = None
+
+    @staticmethod
+    def instance():
+        """Singleton instance"""
+        if Bots.__instance is None:
+            Bots()
+        return Bots.__instance
+
+    def __init__(self):
+        """Start connecting to the learner"""
+        if Bots.__instance is not None:
+            raise Exception("This class is a singleton, use .instance() access method.")
+
+        self.network = NetworkClient()
+        # network generation the bots' episodes belong to
+        self.generation = self.network.generation
+        # ticks spent waiting for the learner
+        self.paused_ticks = 0
+        self.bots = []
+        # pipelines action requests when set, see set_async
+        self.pipeline = None
+        # ticks a blocking learner call may take, see set_call_deadline
+        self.call_deadline = 4.0
+        # transitions per message when buffering, see set_buffer
+        self.chunk_size = 0
+        self.buffer_capacity = 0
+        # greedy actions for running bots in-process when set
+        self.policy = None
+        # records the bots' ticks when set, see set_recording
+        self.recorder = None
+        # degrades sensing when ticks overrun when set, see set_budget
+        self.budget = None
+        self.quality = 0
+        # ticks each action is applied for, see set_action_repeat
+        self.action_repeat = 1
+        # maps the learner's actions to commands, see set_action_space
+        self.action_space = default_action_space
+        # states episodes start from, see set_starts
+        self.starts = None
+        # speed of route starts when set, see set_route_starts
+        self.route_speed = None
+        # recordings starts are from when set, see set_recording_starts
+        self.recording_paths = None
+        self.fast_reset = False
+        # stages of the map bots train and run on when set,
+        # see set_stages
+        self.map_route = None
+        self.stage_sampler = None
+        # episodes until the stage weights are fetched again
+        self.stage_weights_episodes = 0
+        self.env_steps = 0
+        # env steps the bots chose an action on, see Bot.set_action_repeat
+        self.decisions = 0
+        self.stats_start = time.monotonic()
+        self.stats_round_trips = 0
+        Bots.__instance = self
+
+    def __iter__(self):
+        return iter(self.bots)
+
+    def __len__(self):
+        return len(self.bots)
+
+    def get(self, slot):
+        if 0 <= slot < len(self.bots):
+            return self.bots[slot]
+        return None
+
+    def from_index(self, index):
+        """Get the bot controlling player index"""
+        for bot in self.bots:
+            if bot.bot is not None and bot.bot.index == index:
+                return bot
+        return None
+
+    def spawn(self, count=0):
+        """Spawn count bots, kicking any extra ones.
+        0 spawns the existing bots or a single one."""
+        if count <= 0:
+            count = max(1, len(self.bots))
+
+        while len(self.bots) > count:
+            self.bots.pop().kick("Removed")
+        while len(self.bots) < count:
+            bot = Bot(len(self.bots))
+            bot.set_quality(self.quality)
+            bot.action_repeat = self.action_repeat
+            bot.action_space = self.action_space
+            bot.starts = self.starts
+            bot.fast_reset = self.fast_reset
+            if self.map_route is not None:
+                bot.stage_picker = self.pick_stage
+            bot.set_buffer(self.buffer_capacity)
+            bot.recorder = self.recorder
+            self.bots.append(bot)
+
+        for bot in self.bots:
+            bot.spawn()
+
+        # bots don't collide, so they shouldn't see each other either
+        players = tuple(bot.bot for bot in self.bots if bot.bot is not None)
+        for bot in self.bots:
+            bot.set_filter(players)
+
+    def kick(self, reason):
+        for bot in self.bots:
+            bot.kick(reason)
+
+    def tick(self):
+        start_time = time.perf_counter()
+        self.tick_bots()
+        if self.budget is not None:
+            level = self.budget.update(
+                time.perf_counter() - start_time, server.tick_interval
+            )
+            if level != self.quality:
+                self.set_quality(level)
+
+    def tick_bots(self):
+        self.network.call_deadline = server.tick_interval * self.call_deadline
+        available = self.network.poll()
+        active = [bot for bot in self.bots if bot.is_active()]
+        if not any(bot.training or bot.running for bot in active):
+            return
+
+        if self.policy is not None and self.policy.poll():
+            print(f"[deepsurf] Reloaded policy '{self.policy.path}'")
+
+        if not available:
+            if self.policy is None or any(bot.training for bot in active):
+                self.paused_ticks += 1
+                return
+            runners = [bot for bot in active if bot.running]
+            self.run_policy(runners)
+            self.env_steps += len(runners)
+            for bot in runners:
+                bot.end_tick()
+            return
+
+        if self.network.generation != self.generation:
+            # replies and transitions in flight were lost with the
+            # previous connection
+            self.generation = self.network.generation
+            try:
+                self.post_action_space()
+                self.fetch_stage_weights()
+            except LearnerUnavailable:
+                # picked up by the next poll
+                pass
+            if self.pipeline is not None:
+                self.pipeline.clear()
+            for bot in active:
+                if bot.training or bot.running:
+                    bot.restart()
+
+        try:
+            self.step(active)
+        except LearnerUnavailable:
+            # picked up by the next poll
+            pass
+
+    def step(self, active):
+        if self.chunk_size > 0 and not self.network.has("post_transitions"):
+            print("[deepsurf] Learner doesn't support buffered transitions")
+            self.set_buffer(0, 0)
+
+        if self.pipeline is not None:
+            for actions, episodes in self.pipeline.collect(server.tick):
+                self.dispatch(actions, episodes)
+
+        ticks = [
+            bot.train_tick() for bot in active if bot.training and not bot.is_blocked()
+        ]
+        # None while repeating an action
+        steps = [entry for entry in ticks if entry is not None]
+        # fast resets start the next episode right away
+        starts = [
+            self.bots[env_id].train_tick()
+            for env_id, _, _, done in steps
+            if done
+            and self.bots[env_id].fast_reset
+            and not self.bots[env_id].is_blocked()
+        ]
+        steps += starts
+        runners = [bot for bot in active if bot.running]
+        if self.policy is not None:
+            self.run_policy(runners)
+            self.env_steps += len(runners)
+            runners = []
+        repeaters = [bot for bot in runners if bot.is_repeating()]
+        runners = [bot for bot in runners if not bot.is_repeating()]
+        observations = [bot.observe() for bot in runners]
+        self.decisions += len(observations)
+
+        if steps or observations:
+            self.request(steps, observations)
+
+        for bot in runners:
+            bot.act()
+        for bot in repeaters:
+            bot.repeat()
+
+        if self.chunk_size > 0:
+            self.flush(active)
+
+        for env_id, reward, state, done in steps:
+            if done:
+                self.end_episode(self.bots[env_id])
+            if reward is not None:
+                self.decisions += 1
+            else:
+                # the bot doesn't move on the first tick of an episode
+                self.env_steps -= 1
+        self.env_steps += len(ticks) + len(starts) + len(runners) + len(repeaters)
+
+        for bot in active:
+            bot.end_tick()
+
+    def run_policy(self, runners):
+        """Step running bots with actions from the in-process policy."""
+        repeaters = [bot for bot in runners if bot.is_repeating()]
+        deciders = [bot for bot in runners if not bot.is_repeating()]
+        if deciders:
+            try:
+                actions = self.policy.act([bot.observe_local() for bot in deciders])
+            except ValueError as e:
+                print(f"[deepsurf] Unloading policy: {e}")
+                self.policy = None
+                return
+
+            for bot, action in zip(deciders, actions):
+                bot.set_action(action)
+                bot.act()
+            self.decisions += len(deciders)
+
+        for bot in repeaters:
+            bot.repeat()
+
+    def set_policy(self, path):
+        """Run bots with the policy exported to path, see policy.py,
+        None to get actions from the learner. Raises if the policy
+        can't be loaded."""
+        if path is None:
+            self.policy = None
+            return
+        policy = Policy(path, max(1, len(self.bots)))
+        if policy.heads != self.action_space.heads:
+            raise ValueError(
+                f"Policy has heads {policy.heads}, "
+                f"the action space {self.action_space.heads}"
+            )
+        self.policy = policy
+
+    def set_recording(self, directory, max_bytes=256 << 20, max_episodes=0):
+        """Record the bots' ticks to files in directory, starting a new
+        file after max_bytes or max_episodes episodes, see recording.py.
+        None stops recording."""
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+        if directory is not None:
+            self.recorder = Recorder(
+                directory, self.get_recording_meta, max_bytes, max_episodes
+            )
+        for bot in self.bots:
+            bot.recorder = self.recorder
+            bot.restart()
+
+    def set_budget(self, enabled, fraction=0.5):
+        """Degrade sensing while ticks take more than fraction of the
+        tick interval and restore it with headroom, see budget.py."""
+        if enabled:
+            self.budget = FrameBudget(fraction)
+        else:
+            self.budget = None
+        self.set_quality(0)
+
+    def set_quality(self, level):
+        """Set the budget.QUALITY_LEVELS level of all bots."""
+        if level != self.quality:
+            if self.budget is not None and self.budget.events:
+                _, _, _, average, budget = self.budget.events[-1]
+                cost = f"{round(average, 2)}/{round(budget, 2)} ms"
+            else:
+                cost = "budget off"
+            change = "Degrading" if level > self.quality else "Restoring"
+            print(
+                f"[deepsurf] {change} tick quality {self.quality} -> {level} ({cost})"
+            )
+        self.quality = level
+        for bot in self.bots:
+            bot.set_quality(level)
+
+    def set_action_space(
+        self, move_speed=400.0, turn_values=200, turn_step=0.05, buttons=BUTTONS
+    ):
+        """Compile the action space the bots use, see actions.py,
+        and post it to the learner. Raises ValueError for invalid
+        settings."""
+        self.action_space = ActionSpace(
+            button_masks, move_speed, turn_values, turn_step, buttons
+        )
+        for bot in self.bots:
+            bot.set_action_space(self.action_space)
+        if self.policy is not None and self.policy.heads != self.action_space.heads:
+            print("[deepsurf] Unloading policy: it doesn't match the action space")
+            self.policy = None
+        try:
+            self.post_action_space()
+        except LearnerUnavailable:
+            # posted once connected
+            pass
+
+    def post_action_space(self):
+        """Post the action space descriptor to learners implementing
+        set_action_space."""
+        if self.network.has("set_action_space"):
+            self.network.set_action_space(self.action_space.descriptor())
+
+    def set_starts(self, starts):
+        """Start episodes from states of a starts.StartSampler shared
+        by all bots, None for the start zone."""
+        self.starts = starts
+        self.route_speed = None
+        self.recording_paths = None
+        for bot in self.bots:
+            bot.set_starts(starts)
+
+    def set_route_starts(self, speed=0.0):
+        """Start episodes at random points of the route at speed,
+        see starts.RouteStarts. Each stage has its own when training
+        stages. Raises ValueError without a valid segment."""
+        if self.map_route is not None:
+            self.starts = None
+            self.route_speed = speed
+            self.recording_paths = None
+            for bot in self.bots:
+                bot.restart()
+            return
+
+        segment = Segment.instance()
+        if not segment.is_valid():
+            raise ValueError("No start and end zone")
+        self.set_starts(RouteStarts(segment.get_route().points, speed))
+        self.route_speed = speed
+
+    def set_recording_starts(self, paths):
+        """Start episodes from states recorded on the map in paths,
+        see starts.RecordingStarts. When training stages each stage
+        has its own from recordings of that stage, see
+        get_recording_meta. Raises ValueError if a stage has no
+        recorded states, or OSError."""
+        if self.map_route is not None:
+            # refuse up front rather than when a bot is put on the stage
+            for stage in self.map_route.stages:
+                self.map_route.get_recording_starts(stage, paths)
+            self.starts = None
+            self.route_speed = None
+            self.recording_paths = paths
+            for bot in self.bots:
+                bot.restart()
+            return
+
+        self.set_starts(RecordingStarts(paths, server.map_name))
+        self.recording_paths = paths
+
+    def set_stages(self, map_route, mode="weak"):
+        """Train and run bots on the stages of a zone.MapRoute, picking
+        the stage of each episode in mode, see stages.py. None for
+        Segment.instance(). Raises ValueError for invalid modes."""
+        if map_route is None:
+            self.map_route = None
+            self.stage_sampler = None
+            for bot in self.bots:
+                bot.stage_picker = None
+                bot.stage = None
+                bot.segment = Segment.instance()
+                bot.starts = self.starts
+            if not Segment.instance().is_valid():
+                # nothing to train or run on
+                self.route_speed = None
+                self.recording_paths = None
+                for bot in self.bots:
+                    if bot.training or bot.running:
+                        bot.stop()
+            elif self.route_speed is not None:
+                self.set_route_starts(self.route_speed)
+            elif self.recording_paths is not None:
+                self.reload_recording_starts()
+            else:
+                for bot in self.bots:
+                    bot.restart()
+            return
+
+        self.stage_sampler = StageSampler(map_route.stages, mode)
+        self.map_route = map_route
+        if self.recorder is not None:
+            # the stages are in the meta, see get_recording_meta
+            self.recorder.split()
+        if self.recording_paths is not None:
+            self.reload_recording_starts()
+        try:
+            self.fetch_stage_weights()
+        except LearnerUnavailable:
+            # fetched once connected
+            pass
+        for bot in self.bots:
+            bot.stage_picker = self.pick_stage
+            bot.stage = None
+            bot.restart()
+
+    def pick_stage(self, bot, ended):
+        """Put bot on the stage of its next episode, see Bot.reset."""
+        map_route = self.map_route
+        sampler = self.stage_sampler
+        if ended and bot.stage in map_route:
+            sampler.add_result(bot.stage, bot.episode_progress, bot.episode_completed)
+
+        if bot.fixed_stage in map_route:
+            stage = bot.fixed_stage
+        elif ended:
+            stage = sampler.pick(bot.stage, bot.episode_completed)
+        elif bot.stage in map_route:
+            # e.g. settings changed, stay on the stage
+            stage = bot.stage
+        else:
+            stage = sampler.pick()
+
+        bot.stage = stage
+        bot.segment = map_route.get(stage)
+        if self.route_speed is not None:
+            bot.starts = map_route.get_route_starts(stage, self.route_speed)
+        elif self.recording_paths is not None:
+            bot.starts = map_route.get_recording_starts(stage, self.recording_paths)
+        else:
+            bot.starts = self.starts
+
+        recorder = self.recorder
+        if (
+            recorder is not None
+            and recorder.file is not None
+            and recorder.file.meta.get("stage") not in (None, stage)
+        ):
+            # files of a stage only hold that stage, e.g. after dps_stage
+            recorder.split()
+
+    def reload_recording_starts(self):
+        """Set the recording starts again, e.g. for other stages,
+        falling back to the start zone without recorded states."""
+        try:
+            self.set_recording_starts(self.recording_paths)
+        except (OSError, ValueError) as e:
+            print(f"[deepsurf] Starting episodes in the start zone: {e}")
+            self.set_starts(None)
+
+    def fetch_stage_weights(self):
+        """Pick stages with the weights of learners implementing
+        get_stage_weights."""
+        self.stage_weights_episodes = 100
+        if self.stage_sampler is None or not self.network.has("get_stage_weights"):
+            return
+        weights = self.network.get_stage_weights(
+            self.map_route.map_name, self.stage_sampler.stages
+        )
+        try:
+            self.stage_sampler.set_weights(weights)
+        except ValueError as e:
+            print(f"[deepsurf] Ignoring the learner's stage weights: {e}")
+
+    def get_segments(self):
+        """Get the segments the bots are on."""
+        segments = []
+        for bot in self.bots:
+            if bot.segment not in segments:
+                segments.append(bot.segment)
+        return segments
+
+    def set_fast_reset(self, enabled):
+        """See Bot.set_fast_reset."""
+        self.fast_reset = enabled
+        for bot in self.bots:
+            bot.set_fast_reset(enabled)
+            bot.reset_reset_stats()
+
+    def set_action_repeat(self, ticks):
+        """Apply each action for ticks ticks, see Bot.set_action_repeat."""
+        self.action_repeat = max(1, ticks)
+        for bot in self.bots:
+            bot.set_action_repeat(ticks)
+        self.reset_env_stats()
+
+    def set_profiling(self, enabled):
+        """Time the phases of a tick, see profiler.py."""
+        if not enabled:
+            profiler.disable()
+            return
+
+        module = sys.modules[__name__]
+        profiler.enable(
+            (
+                (Bots, "tick", "tick", False),
+                (Bots, "request", "request", False),
+                (Bots, "request_actions", "request_actions", False),
+                (Bots, "dispatch", "dispatch", False),
+                (Bots, "flush", "flush", False),
+                (Bots, "run_policy", "run_policy", False),
+                (ActionPipeline, "collect", "collect", False),
+                (NetworkClient, "call", "rpc_call", False),
+                (NetworkClient, "request", "rpc_request", False),
+                (Bot, "train_tick", "train_tick", True),
+                (Bot, "observe", "observe", True),
+                (Bot, "act", "act", True),
+                (Bot, "apply_action", "apply_action", True),
+                (Bot, "capture", "capture", True),
+                (Bot, "get_reward", "get_reward", True),
+                (Bot, "get_state", "get_state", True),
+                (Bot, "record", "record", True),
+                (RaySensor, "sense", "sense", False),
+                (RaySensor, "trace", "trace_rays", False),
+                (RaySensor, "sense_teleports", "sense_teleports", False),
+                (Observation, "encode", "encode", False),
+                (module, "draw_hud", "hud", False),
+                (Segment, "draw", "draw_zones", False),
+            )
+        )
+
+    def get_recording_meta(self):
+        """Get the meta of new recording files"""
+        return {
+            "map": server.map_name,
+            "segment": Segment.instance().serialize(),
+            "stages": list(self.map_route.stages) if self.map_route is not None else [],
+            "stage": self.get_recording_stage(),
+            "layouts": sorted({bot.sensor_layout for bot in self.bots}),
+            "created": time.time(),
+        }
+
+    def get_recording_stage(self):
+        """Get the stage every bot is kept on, None if there are no
+        stages or bots may be on different ones."""
+        map_route = self.map_route
+        if map_route is None:
+            return None
+        if len(map_route) == 1:
+            return map_route.stages[0]
+        stages = {bot.fixed_stage for bot in self.bots}
+        if len(stages) == 1:
+            stage = stages.pop()
+            if stage in map_route:
+                return stage
+        return None
+
+    def request(self, steps, observations):
+        """Send this tick's entries to the learner, see Bot.train_tick
+        and Bot.observe."""
+        if self.chunk_size > 0:
+            # transitions are sent by flush, only ask for actions
+            return self.request_actions(
+                [(env_id, state) for env_id, _, state, done in steps if not done],
+                observations,
+            )
+
+        if self.pipeline is None:
+            actions = ()
+            if steps:
+                actions += tuple(self.network.step_batch(steps))
+            if observations:
+                actions += tuple(self.network.get_action_run_batch(observations))
+            self.dispatch(actions)
+            return
+
+        parts = []
+        if steps:
+            parts.append((None, self.network.request_step_batch(steps)))
+        if observations:
+            parts.append((None, self.network.request_action_run_batch(observations)))
+        result = parts[0][1] if len(parts) == 1 else BatchResult(parts)
+        # applied on a later tick, see ActionPipeline
+        episodes = {bot.slot: bot.episode for bot in self.bots}
+        self.pipeline.submit(server.tick, result, episodes)
+
+    def request_actions(self, entries, observations):
+        """Request training actions for (env_id, state) entries and
+        greedy actions for observations."""
+        if self.pipeline is None:
+            actions = ()
+            if entries:
+                actions += tuple(self.network.get_action_batch(entries))
+            if observations:
+                actions += tuple(self.network.get_action_run_batch(observations))
+            self.dispatch(actions)
+            return
+
+        parts = []
+        if entries:
+            parts.append((None, self.network.request_action_batch(entries)))
+        if observations:
+            parts.append((None, self.network.request_action_run_batch(observations)))
+        if not parts:
+            return
+        result = parts[0][1] if len(parts) == 1 else BatchResult(parts)
+        episodes = {bot.slot: bot.episode for bot in self.bots}
+        self.pipeline.submit(server.tick, result, episodes)
+
+    def flush(self, bots):
+        """Send buffered transitions in chunks of chunk_size,
+        and the rest of ended episodes."""
+        for bot in bots:
+            buffer = bot.buffer
+            if buffer is None:
+                continue
+
+            # a full buffer can hold less than a chunk after partial sends
+            ended = bot.state is None or not bot.training or buffer.is_full()
+            while len(buffer) >= self.chunk_size or (len(buffer) > 0 and ended):
+                chunk = buffer.chunk(self.chunk_size)
+                if self.pipeline is not None:
+                    self.network.request_post_transitions(bot.slot, chunk)
+                else:
+                    self.network.post_transitions(bot.slot, chunk)
+                buffer.consume(self.chunk_size)
+
+    def set_buffer(self, capacity, chunk_size):
+        """Buffer up to capacity transitions per bot and send them
+        in chunks of chunk_size, 0 to post them every tick."""
+        self.chunk_size = min(chunk_size, capacity)
+        self.buffer_capacity = capacity if self.chunk_size > 0 else 0
+        for bot in self.bots:
+            bot.set_buffer(self.buffer_capacity)
+            bot.restart()
+
+    def get_buffered(self):
+        """Get the number of transitions waiting to be sent."""
+        return sum(len(bot.buffer) for bot in self.bots if bot.buffer is not None)
+
+    def dispatch(self, actions, episodes=None):
+        """Hand out (env_id, action) pairs from the learner.
+
+        Actions requested during an episode that has since
+        ended are dropped when episodes is given.
+        """
+        for env_id, action in actions:
+            bot = self.get(env_id)
+            if bot is None:
+                continue
+            if episodes is not None and episodes.get(env_id) != bot.episode:
+                continue
+            bot.set_action(action)
+
+    def end_episode(self, bot):
+        if self.pipeline is not None:
+            self.network.request_end_episode(bot.episode_reward, bot.slot)
+        else:
+            self.network.end_episode(bot.episode_reward, bot.slot)
+        if self.network.has("post_reward_components"):
+            self.network.post_reward_components(bot.slot, bot.reward.episode_totals)
+        if bot.episode_stage is not None:
+            if self.network.has("post_stage_result"):
+                self.network.post_stage_result(
+                    bot.slot,
+                    bot.episode_stage,
+                    bot.episode_progress,
+                    bot.episode_completed,
+                )
+            self.stage_weights_episodes -= 1
+            if self.stage_weights_episodes <= 0:
+                self.fetch_stage_weights()
+
+    def set_async(self, enabled: bool, delay: int = 1, deadline: float = 0.002):
+        """Toggle pipelined action requests.
+
+        Actions are applied `delay` ticks after being requested and
+        a tick waits at most `deadline` seconds for them.
+        """
+        if enabled:
+            self.pipeline = ActionPipeline(self.network, delay, deadline)
+        else:
+            self.pipeline = None
+        for bot in self.bots:
+            bot.reset()
+
+    def set_call_deadline(self, ticks):
+        """Drop the learner connection and pause training if a blocking
+        call takes over ticks ticks, see NetworkClient.call."""
+        self.call_deadline = max(ticks, 0.0)
+
+    def get_async_stats(self):
+        """Get (late, missed, failed) action counts of the pipeline
+        and the learner's last error."""
+        if self.pipeline is None:
+            return 0, 0, 0, None
+        pipeline = self.pipeline
+        return pipeline.late, pipeline.missed, pipeline.failed, pipeline.error
+
+    def get_env_stats(self):
+        """Get environment steps, decisions and learner round-trips
+        per second since the last reset_env_stats."""
+        elapsed = time.monotonic() - self.stats_start
+        if elapsed <= 0:
+            return 0.0, 0.0, 0.0
+        round_trips = self.network.round_trips - self.stats_round_trips
+        return (
+            self.env_steps / elapsed,
+            self.decisions / elapsed,
+            round_trips / elapsed,
+        )
+
+    def get_learner_stats(self):
+        """Get NetworkClient.get_stats and the ticks paused waiting
+        for the learner."""
+        return self.network.get_stats(), self.paused_ticks
+
+    def set_learner(self, endpoints, pool_size=1):
+        """Connect to the learner at (host, port) endpoints instead."""
+        self.network.close()
+        self.network = NetworkClient(endpoints, pool_size)
+        if self.pipeline is not None:
+            self.pipeline = ActionPipeline(
+                self.network, self.pipeline.delay, self.pipeline.deadline
+            )
+        self.reset_env_stats()
+
+    def reset_env_stats(self):
+        self.env_steps = 0
+        self.decisions = 0
+        self.stats_start = time.monotonic()
+        self.stats_round_trips = self.network.round_trips
+        self.paused_ticks = 0
+
     def explore(self):
         self.network.explore()
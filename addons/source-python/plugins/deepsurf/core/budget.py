@@ -0,0 +1,112 @@
+"""Module for keeping the tick within its frame budget.
+
+FrameBudget picks a quality level from the smoothed cost of recent
+ticks. Each level drops more work than the one before it, see
+QUALITY_LEVELS. The level is raised after patience ticks over budget
+and lowered again after recovery ticks with headroom, so it doesn't
+flap around the budget.
+This module doesn't depend on Source.Python.
+"""
+
+# =============================================================================
+# >> IMPORTS
+# =============================================================================
+# Python
+import time
+from collections import deque, namedtuple
+
+# =============================================================================
+# >> ALL DECLARATION
+# =============================================================================
+__all__ = (
+    "QualityLevel",
+    "QUALITY_LEVELS",
+    "FrameBudget",
+)
+
+# =============================================================================
+# >> GLOBAL VARIABLES
+# =============================================================================
+# draw: draw the HUD and zones
+# teleports: sense trigger_teleports, by enumeration or the teleport index
+# ray_fraction: fraction of the sensor's rays traced per tick
+QualityLevel = namedtuple("QualityLevel", ("draw", "teleports", "ray_fraction"))
+
+# by the level stored in observation headers, 0 is full quality
+QUALITY_LEVELS = (
+    QualityLevel(True, True, 1.0),
+    QualityLevel(False, True, 1.0),
+    QualityLevel(False, False, 1.0),
+    QualityLevel(False, False, 0.5),
+    QualityLevel(False, False, 0.25),
+)
+
+
+# =============================================================================
+# >> CLASSES
+# =============================================================================
+class FrameBudget:
+    """Tracks tick cost against a fraction of the tick interval."""
+
+    def __init__(
+        self, fraction=0.5, smoothing=0.1, patience=10, recovery=200, headroom=0.6
+    ):
+        # share of the tick interval the bots may use
+        self.fraction = fraction
+        # weight of the newest tick in the moving average
+        self.smoothing = smoothing
+        # ticks over budget before degrading
+        self.patience = patience
+        # ticks below headroom times the budget before restoring
+        self.recovery = recovery
+        self.headroom = headroom
+        self.level = 0
+        self.average = 0.0
+        self.over = 0
+        self.under = 0
+        # (time, old level, new level, average ms, budget ms), newest last
+        self.events = deque(maxlen=64)
+        self.level_ticks = [0] * len(QUALITY_LEVELS)
+
+    def update(self, elapsed, tick_interval):
+        """Add a tick that took elapsed seconds, get the quality level
+        for the next tick."""
+        self.average += self.smoothing * (elapsed - self.average)
+        self.level_ticks[self.level] += 1
+        budget = self.get_budget(tick_interval)
+
+        if self.average > budget:
+            self.under = 0
+            self.over += 1
+            if self.over >= self.patience and self.level < len(QUALITY_LEVELS) - 1:
+                self.change(self.level + 1, budget)
+        elif self.average < budget * self.headroom:
+            self.over = 0
+            self.under += 1
+            if self.under >= self.recovery and self.level > 0:
+                self.change(self.level - 1, budget)
+        else:
+            self.over = 0
+            self.under = 0
+
+        return self.level
+
+    def change(self, level, budget):
+        self.events.append(
+            (time.time(), self.level, level, self.average * 1000.0, budget * 1000.0)
+        )
+        self.level = level
+        self.over = 0
+        self.under = 0
+
+    def get_budget(self, tick_interval):
+        """Get the budget in seconds for tick_interval."""
+        return tick_interval * self.fraction
+
+    def reset(self):
+        self.level = 0
+        self.average = 0.0
+        self.over = 0
+        self.under = 0
+        self.events.clear()
+        self.level_ticks = [0] * len(QUALITY_LEVELS)
@@ -0,0 +1,147 @@
+"""Module for buffering transitions before sending them to the learner.
+
+A chunk of K transitions is sent as 4 byte strings:
+    observations    K + 1 concatenated observations, see state.py,
+                    transition i goes from observation i to i + 1
+    actions         int16[K, 5]
+    rewards         float32[K]
+    dones           uint8[K]
+
+This module doesn't depend on Source.Python so the learner can import it.
+"""
+
+# =============================================================================
+# >> IMPORTS
+# =============================================================================
+# Python
+import numpy as np
+
+# deepsurf
+from .state import decode_batch
+
+# =============================================================================
+# >> ALL DECLARATION
+# =============================================================================
+__all__ = (
+    "TransitionBuffer",
+    "decode_transitions",
+)
+
+# =============================================================================
+# >> GLOBAL VARIABLES
+# =============================================================================
+NUM_ACTIONS = 5
+
+
+# =============================================================================
+# >> CLASSES
+# =============================================================================
+class TransitionBuffer:
+    """Transitions of a single bot in preallocated arrays.
+
+    Each observation is stored once, as the next observation of one
+    transition and the observation of the following one.
+    The buffer is linear, not a ring: writing only starts over from
+    the beginning once everything has been sent, so a chunk is always
+    a contiguous view of the arrays. Transitions can't be added while
+    the buffer is full, even if part of it has been sent, and a new
+    episode can't begin before the previous one has been sent.
+    """
+
+    def __init__(self, capacity, observation_size):
+        self.capacity = capacity
+        self.observation_size = observation_size
+        self.observations = np.zeros((capacity + 1, observation_size), dtype=np.uint8)
+        self.actions = np.zeros((capacity, NUM_ACTIONS), dtype="<i2")
+        self.rewards = np.zeros(capacity, dtype="<f4")
+        self.dones = np.zeros(capacity, dtype=np.uint8)
+        # first transition not sent yet
+        self.start = 0
+        # next transition to write
+        self.end = 0
+        # is observations[end] the current observation?
+        self.observed = False
+
+    def __len__(self):
+        """Number of transitions not sent yet"""
+        return self.end - self.start
+
+    def is_full(self):
+        return self.end >= self.capacity
+
+    def can_begin(self):
+        return self.end == self.start
+
+    def begin(self, observation):
+        """Start an episode from observation bytes."""
+        if not self.can_begin():
+            raise ValueError("Transitions of the previous episode haven't been sent")
+
+        self.start = 0
+        self.end = 0
+        self.observations[0] = np.frombuffer(observation, dtype=np.uint8)
+        self.observed = True
+
+    def add(self, action, reward, done, observation):
+        """Add the transition from the current observation to observation."""
+        if not self.observed:
+            raise ValueError("Transition added before beginning an episode")
+        if self.is_full():
+            raise ValueError("Transition buffer is full")
+
+        end = self.end
+        self.actions[end] = action
+        self.rewards[end] = reward
+        self.dones[end] = done
+        self.observations[end + 1] = np.frombuffer(observation, dtype=np.uint8)
+        self.end = end + 1
+        self.observed = not done
+
+    def chunk(self, count=None):
+        """Get memoryviews of the next count transitions, all by default.
+
+        The views are only valid until `consume` is called, the
+        buffer isn't copied until they are sent.
+        """
+        start = self.start
+        end = self.end if count is None else min(self.end, start + count)
+        return (
+            memoryview(self.observations[start : end + 1]).cast("B"),
+            memoryview(self.actions[start:end]).cast("B"),
+            memoryview(self.rewards[start:end]).cast("B"),
+            memoryview(self.dones[start:end]).cast("B"),
+        )
+
+    def consume(self, count=None):
+        """Mark the next count transitions, all by default, as sent."""
+        self.start = self.end if count is None else min(self.end, self.start + count)
+        if self.start < self.end:
+            return
+
+        # start over, keeping the current observation if mid-episode
+        if self.observed and self.end > 0:
+            self.observations[0] = self.observations[self.end]
+        self.start = 0
+        self.end = 0
+
+    def clear(self):
+        self.start = 0
+        self.end = 0
+        self.observed = False
+
+
+# =============================================================================
+# >> FUNCTIONS
+# =============================================================================
+def decode_transitions(observations, actions, rewards, dones):
+    """Decode a chunk of transitions.
+
+    Returns (states, actions, rewards, dones, next_states) arrays,
+    states and next_states are overlapping views of the decoded
+    observations, see state.decode_batch.
+    """
+    decoded = decode_batch(observations)
+    actions = np.frombuffer(actions, dtype="<i2").reshape(-1, NUM_ACTIONS)
+    rewards = np.frombuffer(rewards, dtype="<f4")
+    dones = np.frombuffer(dones, dtype=np.uint8).astype(bool)
+    return decoded[:-1], actions, rewards, dones, decoded[1:]
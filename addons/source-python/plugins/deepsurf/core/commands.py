@@ -4,8 +4,8 @@
 # >> IMPORTS
 # =============================================================================
 # Python
-import json
 import pathlib
+import time
 
 # Source.Python
 from commands.typed import TypedSayCommand, TypedClientCommand, TypedServerCommand
@@ -15,8 +15,12 @@ from messages import SayText2
 from players.entity import Player
 
 # deepsurf
-from .zone import Segment, Zone, Checkpoint
-from .bot import Bot
+from .zone import Segment, Zone, Checkpoint, MapRoute, segment_store
+from .bot import Bots
+from .network import LearnerUnavailable
+from .profiler import profiler
+from .recording import list_recordings
+from .reward import COMPONENTS
 from .helpers import CustomEntEnum
 
 
@@ -28,6 +32,27 @@ def respond(text, index):
         SayText2(text).send(index)
 
 
+# Helper for getting the bots addressed by slot, -1 for all bots
+def get_bots(slot, index):
+    if slot < 0:
+        bots = list(Bots.instance())
+    else:
+        bot = Bots.instance().get(slot)
+        bots = [] if bot is None else [bot]
+
+    if not bots:
+        respond(f"[deepsurf] No bot in slot {slot}", index)
+    return bots
+
+
+# Helper for checking the segments of the map are loaded, see store.py
+def segments_loaded(index):
+    if segment_store.is_loaded():
+        return True
+    respond(f"[deepsurf] Segments of {server.map_name} are still loading", index)
+    return False
+
+
 # =============================================================================
 # >> COMMANDS
 # =============================================================================
@@ -94,75 +119,305 @@ def _savecfg_handler(command, index: int = 0):
         respond(f"[deepsurf] Could not serialize segment", command.index)
         return
 
-    # Relative to tf2 folder
-    path = "./tf/resource/source-python/deepsurf/"
-    pathlib.Path(path).mkdir(parents=True, exist_ok=True)
-    path += f"{server.map_name}_{index}.json"
-
-    with open(path, "w") as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
-
-    respond(f"[deepsurf] Saved segment to '{path}'", command.index)
+    if not segments_loaded(command.index):
+        return
+    segment_store.save(index, data)
+    respond(f"[deepsurf] Saved segment as stage {index}", command.index)
 
 
 @TypedSayCommand("!loadcfg")
 @TypedClientCommand("dps_loadcfg")
 @TypedServerCommand("dps_loadcfg")
 def _loadcfg_handler(command, index: int = 0):
-    path = f"./tf/resource/source-python/deepsurf/{server.map_name}_{index}.json"
-    with open(path) as f:
-        data = json.load(f)
-        Segment.instance().deserialize(data)
-    respond(f"[deepsurf] Loaded segment from '{path}'", command.index)
+    if not segments_loaded(command.index):
+        return
+
+    data = segment_store.get(index)
+    if data is None:
+        respond(f"[deepsurf] No segment for stage {index}", command.index)
+        return
+    Segment.instance().deserialize(data)
+    respond(f"[deepsurf] Loaded segment of stage {index}", command.index)
+
+
+@TypedSayCommand("!segments")
+@TypedClientCommand("dps_segments")
+@TypedServerCommand("dps_segments")
+def _segments_handler(command):
+    if not segments_loaded(command.index):
+        return
+
+    stages = segment_store.get_stages()
+    respond(
+        f"[deepsurf] {len(stages)} segments of {server.map_name}: "
+        f"stages {', '.join(str(stage) for stage in stages) or 'none'}",
+        command.index,
+    )
+
+
+@TypedSayCommand("!importcfg")
+@TypedClientCommand("dps_importcfg")
+@TypedServerCommand("dps_importcfg")
+def _importcfg_handler(command):
+    if not segments_loaded(command.index):
+        return
+    segment_store.import_json()
+    respond(
+        f"[deepsurf] Importing segments from '{segment_store.json_directory}'",
+        command.index,
+    )
+
+
+@TypedSayCommand("!exportcfg")
+@TypedClientCommand("dps_exportcfg")
+@TypedServerCommand("dps_exportcfg")
+def _exportcfg_handler(command):
+    if not segments_loaded(command.index):
+        return
+    segment_store.export_json()
+    respond(
+        f"[deepsurf] Exporting segments to '{segment_store.json_directory}'",
+        command.index,
+    )
+
+
+@TypedSayCommand("!stages")
+@TypedClientCommand("dps_stages")
+@TypedServerCommand("dps_stages")
+def _stages_handler(command, mode: str = "weak"):
+    if mode == "off":
+        Bots.instance().set_stages(None)
+        respond("[deepsurf] Bots are on the current segment", command.index)
+        return
+
+    if not segments_loaded(command.index):
+        return
+    stages = segment_store.get_stages()
+    if not stages:
+        respond(f"[deepsurf] No segments saved for {server.map_name}", command.index)
+        return
+    map_route = MapRoute(
+        server.map_name, {stage: segment_store.get(stage) for stage in stages}
+    )
+    try:
+        Bots.instance().set_stages(map_route, mode)
+    except ValueError as e:
+        respond(f"[deepsurf] {e}, or off", command.index)
+        return
+    respond(
+        f"[deepsurf] Picking stages {', '.join(str(stage) for stage in stages)} "
+        f"in {mode} mode",
+        command.index,
+    )
+
+
+@TypedSayCommand("!stage")
+@TypedClientCommand("dps_stage")
+@TypedServerCommand("dps_stage")
+def _stage_handler(command, stage: int = -1, slot: int = -1):
+    for bot in get_bots(slot, command.index):
+        bot.set_fixed_stage(stage)
+    if stage < 0:
+        respond(f"[deepsurf] Bots can be on any stage", command.index)
+    else:
+        respond(f"[deepsurf] Keeping bots on stage {stage}", command.index)
+
+
+@TypedSayCommand("!stagestats")
+@TypedClientCommand("dps_stagestats")
+@TypedServerCommand("dps_stagestats")
+def _stagestats_handler(command):
+    sampler = Bots.instance().stage_sampler
+    if sampler is None:
+        respond("[deepsurf] Not training stages, see dps_stages", command.index)
+        return
+
+    for i, stage in enumerate(sampler.stages):
+        bots = sum(1 for bot in Bots.instance() if bot.stage == stage)
+        respond(
+            f"[deepsurf] Stage {stage}: {bots} bots, {sampler.episodes[i]} episodes, "
+            f"{sampler.completed[i]} completed, score {round(sampler.scores[i], 2)}, "
+            f"picked {round(sampler.probabilities[i] * 100.0, 1)}%",
+            command.index,
+        )
 
 
 @TypedSayCommand("!spawn")
 @TypedClientCommand("dps_spawn")
 @TypedServerCommand("dps_spawn")
-def _train_handler(command):
-    Bot.instance().spawn()
+def _spawn_handler(command, count: int = 0):
+    Bots.instance().spawn(count)
+    respond(f"[deepsurf] {len(Bots.instance())} bots", command.index)
 
 
 @TypedSayCommand("!train")
 @TypedClientCommand("dps_train")
 @TypedServerCommand("dps_train")
-def _train_handler(command):
-    if Segment.instance().is_valid() is False:
+def _train_handler(command, slot: int = -1):
+    if Bots.instance().map_route is None and Segment.instance().is_valid() is False:
         respond("[deepsurf] Invalid segment", command.index)
         return
 
-    Bot.instance().train()
+    for bot in get_bots(slot, command.index):
+        bot.train()
 
 
 @TypedSayCommand("!run")
 @TypedClientCommand("dps_run")
 @TypedServerCommand("dps_run")
-def _run_handler(command):
-    if Segment.instance().is_valid() is False:
+def _run_handler(command, slot: int = -1):
+    if Bots.instance().map_route is None and Segment.instance().is_valid() is False:
         respond("[deepsurf] Invalid segment", command.index)
         return
 
-    Bot.instance().run()
+    for bot in get_bots(slot, command.index):
+        bot.run()
 
 
 @TypedSayCommand("!stop")
 @TypedClientCommand("dps_stop")
 @TypedServerCommand("dps_stop")
-def _run_handler(command):
-    Bot.instance().stop()
+def _run_handler(command, slot: int = -1):
+    for bot in get_bots(slot, command.index):
+        bot.stop()
 
 
 @TypedSayCommand("!timelimit")
 @TypedClientCommand("dps_timelimit")
 @TypedServerCommand("dps_timelimit")
-def _run_handler(command, value: int = 10):
-    Bot.instance().set_time_limit(value)
+def _run_handler(command, value: int = 10, slot: int = -1):
+    for bot in get_bots(slot, command.index):
+        bot.set_time_limit(value)
     respond(f"[deepsurf] Time limit set to {value}", command.index)
 
 
+@TypedSayCommand("!rewardweight")
+@TypedClientCommand("dps_rewardweight")
+@TypedServerCommand("dps_rewardweight")
+def _rewardweight_handler(command, name: str, weight: float, slot: int = -1):
+    try:
+        for bot in get_bots(slot, command.index):
+            bot.reward.set_weight(name, weight)
+    except ValueError as e:
+        respond(f"[deepsurf] {e}", command.index)
+        return
+    respond(f"[deepsurf] Reward weight of {name} set to {weight}", command.index)
+
+
+@TypedSayCommand("!rewardstats")
+@TypedClientCommand("dps_rewardstats")
+@TypedServerCommand("dps_rewardstats")
+def _rewardstats_handler(command, slot: int = -1):
+    for bot in get_bots(slot, command.index):
+        reward = bot.reward
+        components = ", ".join(
+            f"{name} {round(total, 2)} (x{weight})"
+            for name, total, weight in zip(
+                COMPONENTS, reward.episode_totals.tolist(), reward.weights.tolist()
+            )
+        )
+        respond(
+            f"[deepsurf] Bot {bot.slot} last episode reward "
+            f"{round(bot.episode_reward, 2)}: {components}",
+            command.index,
+        )
+
+
+@TypedSayCommand("!startoffset")
+@TypedClientCommand("dps_startoffset")
+@TypedServerCommand("dps_startoffset")
+def _startoffset_handler(
+    command, x: float = 0.0, y: float = 0.0, z: float = 0.0, slot: int = -1
+):
+    for bot in get_bots(slot, command.index):
+        bot.set_start_offset(Vector(x, y, z))
+    respond(f"[deepsurf] Start offset set to ({x}, {y}, {z})", command.index)
+
+
+@TypedSayCommand("!starts")
+@TypedClientCommand("dps_starts")
+@TypedServerCommand("dps_starts")
+def _starts_handler(command, mode: str = "zone", speed: float = 0.0):
+    if mode == "zone":
+        Bots.instance().set_starts(None)
+        respond("[deepsurf] Starting episodes in the start zone", command.index)
+        return
+
+    if mode == "route":
+        try:
+            Bots.instance().set_route_starts(speed)
+        except ValueError as e:
+            respond(f"[deepsurf] {e}", command.index)
+            return
+        respond(
+            f"[deepsurf] Starting episodes at route points at speed {speed}",
+            command.index,
+        )
+        return
+
+    if mode == "recordings":
+        # Relative to tf2 folder
+        path = "./tf/resource/source-python/deepsurf/recordings/"
+        bots = Bots.instance()
+        try:
+            bots.set_recording_starts(list_recordings(path))
+        except (OSError, ValueError) as e:
+            respond(
+                f"[deepsurf] Failed to load starts from '{path}': {e}", command.index
+            )
+            return
+        if bots.map_route is not None:
+            respond(
+                "[deepsurf] Starting episodes at recorded states of each stage",
+                command.index,
+            )
+        else:
+            respond(
+                f"[deepsurf] Starting episodes at {len(bots.starts)} recorded states",
+                command.index,
+            )
+        return
+
+    respond(
+        f"[deepsurf] Unknown start mode '{mode}', use zone, route or recordings",
+        command.index,
+    )
+
+
+@TypedSayCommand("!fastreset")
+@TypedClientCommand("dps_fastreset")
+@TypedServerCommand("dps_fastreset")
+def _fastreset_handler(command, enabled: int = 1):
+    Bots.instance().set_fast_reset(enabled != 0)
+    if enabled != 0:
+        respond("[deepsurf] Fast resets enabled", command.index)
+    else:
+        respond("[deepsurf] Fast resets disabled", command.index)
+
+
+@TypedSayCommand("!resetstats")
+@TypedClientCommand("dps_resetstats")
+@TypedServerCommand("dps_resetstats")
+def _resetstats_handler(command, slot: int = -1):
+    for bot in get_bots(slot, command.index):
+        resets, wasted_ticks, reset_ms = bot.get_reset_stats()
+        respond(
+            f"[deepsurf] Bot {bot.slot}: {resets} resets, "
+            f"{round(wasted_ticks, 2)} ticks wasted before the first action, "
+            f"{round(reset_ms, 3)} ms per reset",
+            command.index,
+        )
+        bot.reset_reset_stats()
+
+
 @TypedSayCommand("!place")
 @TypedClientCommand("dps_place")
-def _place_handler(command):
+def _place_handler(command, slot: int = 0):
+    bot = Bots.instance().get(slot)
+    if bot is None or bot.bot is None:
+        respond(f"[deepsurf] No bot in slot {slot}", command.index)
+        return
+
     player = Player(command.index)
     origin = player.get_property_vector("m_vecOrigin")
     orientation = player.get_view_angle()
@@ -174,7 +429,7 @@ def _place_handler(command):
         origin,
         destination,
         (
-            Bot.instance().bot,
+            bot.bot,
             player,
         ),
     )
@@ -183,7 +438,7 @@ def _place_handler(command):
     entity_enum.normal_trace()
 
     if entity_enum.did_hit:
-        Bot.instance().bot.snap_to_position(
+        bot.bot.snap_to_position(
             entity_enum.point,
             orientation,
         )
@@ -196,5 +451,453 @@ def _place_handler(command):
 @TypedClientCommand("dps_explore")
 @TypedServerCommand("dps_explore")
 def _run_handler(command):
-    Bot.instance().explore()
+    try:
+        Bots.instance().explore()
+    except LearnerUnavailable as e:
+        respond(f"[deepsurf] Learner unavailable: {e}", command.index)
+        return
     respond(f"[deepsurf] Exploring", command.index)
+
+
+@TypedSayCommand("!async")
+@TypedClientCommand("dps_async")
+@TypedServerCommand("dps_async")
+def _async_handler(command, enabled: int = 1, delay: int = 1, deadline: float = 2.0):
+    Bots.instance().set_async(enabled != 0, delay, deadline / 1000.0)
+    if enabled != 0:
+        respond(
+            f"[deepsurf] Async actions enabled, delay {delay} ticks, deadline {deadline} ms",
+            command.index,
+        )
+    else:
+        respond(f"[deepsurf] Async actions disabled", command.index)
+
+
+@TypedSayCommand("!calldeadline")
+@TypedClientCommand("dps_calldeadline")
+@TypedServerCommand("dps_calldeadline")
+def _calldeadline_handler(command, ticks: float = 4.0):
+    Bots.instance().set_call_deadline(ticks)
+    respond(
+        f"[deepsurf] Dropping the learner after blocking calls of {ticks} ticks",
+        command.index,
+    )
+
+
+@TypedSayCommand("!asyncstats")
+@TypedClientCommand("dps_asyncstats")
+@TypedServerCommand("dps_asyncstats")
+def _asyncstats_handler(command):
+    late, missed, failed, error = Bots.instance().get_async_stats()
+    respond(
+        f"[deepsurf] Late actions: {late}, missed actions: {missed}, "
+        f"failed requests: {failed}",
+        command.index,
+    )
+    if error is not None:
+        respond(f"[deepsurf] Last learner error: {error!r}", command.index)
+
+
+@TypedSayCommand("!envstats")
+@TypedClientCommand("dps_envstats")
+@TypedServerCommand("dps_envstats")
+def _envstats_handler(command):
+    steps, decisions, round_trips = Bots.instance().get_env_stats()
+    respond(
+        f"[deepsurf] {len(Bots.instance())} bots, {round(steps, 1)} env steps/s, "
+        f"{round(decisions, 1)} decisions/s, "
+        f"{round(round_trips, 1)} learner round-trips/s, "
+        f"{Bots.instance().get_buffered()} transitions buffered",
+        command.index,
+    )
+    Bots.instance().reset_env_stats()
+
+
+@TypedSayCommand("!repeat")
+@TypedClientCommand("dps_repeat")
+@TypedServerCommand("dps_repeat")
+def _repeat_handler(command, ticks: int = 1):
+    Bots.instance().set_action_repeat(ticks)
+    ticks = max(1, ticks)
+    respond(
+        f"[deepsurf] Applying each action for {ticks} ticks, "
+        f"{round(1.0 / (server.tick_interval * ticks), 1)} decisions/s per bot",
+        command.index,
+    )
+
+
+@TypedSayCommand("!actionspace")
+@TypedClientCommand("dps_actionspace")
+@TypedServerCommand("dps_actionspace")
+def _actionspace_handler(
+    command,
+    move_speed: float = 400.0,
+    turn_values: int = 200,
+    turn_step: float = 0.05,
+    buttons: str = "jump,duck",
+):
+    try:
+        Bots.instance().set_action_space(
+            move_speed, turn_values, turn_step, tuple(filter(None, buttons.split(",")))
+        )
+    except ValueError as e:
+        respond(f"[deepsurf] {e}", command.index)
+        return
+
+    action_space = Bots.instance().action_space
+    respond(
+        f"[deepsurf] Action space heads {action_space.heads}, move speed "
+        f"{action_space.move_speed}, turns up to "
+        f"{round(action_space.turn_values // 2 * action_space.turn_step, 2)} "
+        f"degrees per tick, buttons {', '.join(action_space.buttons) or 'none'}",
+        command.index,
+    )
+
+
+@TypedSayCommand("!learner")
+@TypedClientCommand("dps_learner")
+@TypedServerCommand("dps_learner")
+def _learner_handler(command, endpoints: str = "localhost:18811", pool_size: int = 1):
+    parsed = []
+    for endpoint in endpoints.split(","):
+        host, _, port = endpoint.strip().rpartition(":")
+        if not host or not port.isdigit():
+            respond(
+                f"[deepsurf] Invalid endpoint '{endpoint}', use host:port",
+                command.index,
+            )
+            return
+        parsed.append((host, int(port)))
+
+    Bots.instance().set_learner(parsed, pool_size)
+    respond(
+        f"[deepsurf] Connecting to learner at {endpoints} with {pool_size} connections",
+        command.index,
+    )
+
+
+@TypedSayCommand("!learnerstats")
+@TypedClientCommand("dps_learnerstats")
+@TypedServerCommand("dps_learnerstats")
+def _learnerstats_handler(command):
+    links, paused_ticks = Bots.instance().get_learner_stats()
+    for endpoint, connected, latency, max_latency, connects, failures in links:
+        state = "connected" if connected else "disconnected"
+        latency = "-" if latency is None else round(latency, 2)
+        respond(
+            f"[deepsurf] {endpoint} {state}, latency {latency} ms "
+            f"(max {round(max_latency, 2)} ms), {connects} connects, "
+            f"{failures} failures",
+            command.index,
+        )
+    respond(
+        f"[deepsurf] Paused {paused_ticks} ticks waiting for the learner",
+        command.index,
+    )
+
+
+@TypedSayCommand("!buffer")
+@TypedClientCommand("dps_buffer")
+@TypedServerCommand("dps_buffer")
+def _buffer_handler(command, capacity: int = 1024, chunk_size: int = 256):
+    Bots.instance().set_buffer(capacity, chunk_size)
+    if Bots.instance().chunk_size > 0:
+        respond(
+            f"[deepsurf] Buffering {capacity} transitions per bot, "
+            f"sending {Bots.instance().chunk_size} at a time",
+            command.index,
+        )
+    else:
+        respond(f"[deepsurf] Posting transitions every tick", command.index)
+
+
+@TypedSayCommand("!policy")
+@TypedClientCommand("dps_policy")
+@TypedServerCommand("dps_policy")
+def _policy_handler(command, name: str = ""):
+    if not name:
+        Bots.instance().set_policy(None)
+        respond("[deepsurf] Getting run actions from the learner", command.index)
+        return
+
+    # Relative to tf2 folder
+    path = f"./tf/resource/source-python/deepsurf/{name}.npz"
+    try:
+        Bots.instance().set_policy(path)
+    except (OSError, ValueError, KeyError) as e:
+        respond(f"[deepsurf] Failed to load policy '{path}': {e}", command.index)
+        return
+    respond(f"[deepsurf] Running bots with policy '{path}'", command.index)
+
+
+@TypedSayCommand("!record")
+@TypedClientCommand("dps_record")
+@TypedServerCommand("dps_record")
+def _record_handler(
+    command, enabled: int = 1, max_mb: int = 256, max_episodes: int = 0
+):
+    if enabled == 0:
+        recorder = Bots.instance().recorder
+        Bots.instance().set_recording(None)
+        if recorder is not None:
+            respond(
+                f"[deepsurf] Recorded {recorder.rows} ticks of {recorder.episodes} "
+                f"episodes to {recorder.files} files",
+                command.index,
+            )
+        return
+
+    # Relative to tf2 folder
+    path = "./tf/resource/source-python/deepsurf/recordings/"
+    Bots.instance().set_recording(path, max_mb << 20, max_episodes)
+    respond(f"[deepsurf] Recording to '{path}'", command.index)
+
+
+@TypedSayCommand("!tracelog")
+@TypedClientCommand("dps_tracelog")
+@TypedServerCommand("dps_tracelog")
+def _tracelog_handler(command, enabled: int = 1, slot: int = -1):
+    for bot in get_bots(slot, command.index):
+        if enabled != 0:
+            bot.log_traces()
+            respond(f"[deepsurf] Logging traces of bot {bot.slot}", command.index)
+            continue
+
+        # Relative to tf2 folder
+        path = "./tf/resource/source-python/deepsurf/"
+        pathlib.Path(path).mkdir(parents=True, exist_ok=True)
+        path += f"traces_{server.map_name}_{bot.slot}.npz"
+        count = bot.log_traces(path)
+        respond(f"[deepsurf] Saved {count} traces to '{path}'", command.index)
+
+
+@TypedSayCommand("!profile")
+@TypedClientCommand("dps_profile")
+@TypedServerCommand("dps_profile")
+def _profile_handler(command, enabled: int = 1):
+    Bots.instance().set_profiling(enabled != 0)
+    if enabled != 0:
+        respond("[deepsurf] Profiling tick phases", command.index)
+    else:
+        respond("[deepsurf] Stopped profiling", command.index)
+
+
+@TypedSayCommand("!profilestats")
+@TypedClientCommand("dps_profilestats")
+@TypedServerCommand("dps_profilestats")
+def _profilestats_handler(command, slot: int = -1):
+    rows = profiler.summary(slot)
+    if not rows:
+        respond("[deepsurf] No profiled phases, see dps_profile", command.index)
+        return
+
+    respond(
+        f"[deepsurf] {'phase':<16}{'bot':>4}{'count':>8}{'mean':>9}"
+        f"{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9} (us)",
+        command.index,
+    )
+    for phase, bot_slot, count, mean, p50, p95, p99, maximum in rows:
+        bot = "all" if bot_slot is None else bot_slot
+        respond(
+            f"[deepsurf] {phase:<16}{bot:>4}{count:>8}{mean:>9.1f}"
+            f"{p50:>9.1f}{p95:>9.1f}{p99:>9.1f}{maximum:>9.1f}",
+            command.index,
+        )
+
+
+@TypedSayCommand("!profilereset")
+@TypedClientCommand("dps_profilereset")
+@TypedServerCommand("dps_profilereset")
+def _profilereset_handler(command):
+    profiler.reset()
+    respond("[deepsurf] Reset profile stats", command.index)
+
+
+@TypedSayCommand("!profileexport")
+@TypedClientCommand("dps_profileexport")
+@TypedServerCommand("dps_profileexport")
+def _profileexport_handler(command, interval: float = 10.0, format: str = "jsonl"):
+    if interval <= 0.0:
+        profiler.set_export(None, 0.0)
+        respond("[deepsurf] Stopped exporting profile stats", command.index)
+        return
+    if format not in ("jsonl", "csv"):
+        respond("[deepsurf] Export format must be jsonl or csv", command.index)
+        return
+
+    # Relative to tf2 folder
+    path = "./tf/resource/source-python/deepsurf/"
+    pathlib.Path(path).mkdir(parents=True, exist_ok=True)
+    path += f"profile.{format}"
+    profiler.set_export(path, interval)
+    respond(
+        f"[deepsurf] Exporting profile stats to '{path}' every {interval} s",
+        command.index,
+    )
+
+
+@TypedSayCommand("!budget")
+@TypedClientCommand("dps_budget")
+@TypedServerCommand("dps_budget")
+def _budget_handler(command, enabled: int = 1, fraction: float = 0.5):
+    if enabled != 0 and not 0.0 < fraction <= 1.0:
+        respond("[deepsurf] Budget fraction must be in (0, 1]", command.index)
+        return
+    Bots.instance().set_budget(enabled != 0, fraction)
+    if enabled != 0:
+        budget = Bots.instance().budget.get_budget(server.tick_interval)
+        respond(
+            f"[deepsurf] Degrading sensing over {round(budget * 1000.0, 2)} ms per tick",
+            command.index,
+        )
+    else:
+        respond("[deepsurf] Tick budget disabled, full quality", command.index)
+
+
+@TypedSayCommand("!budgetstats")
+@TypedClientCommand("dps_budgetstats")
+@TypedServerCommand("dps_budgetstats")
+def _budgetstats_handler(command):
+    budget = Bots.instance().budget
+    if budget is None:
+        respond("[deepsurf] Tick budget disabled, see dps_budget", command.index)
+        return
+
+    limit = budget.get_budget(server.tick_interval)
+    respond(
+        f"[deepsurf] Quality {budget.level}, tick {round(budget.average * 1000.0, 2)}"
+        f"/{round(limit * 1000.0, 2)} ms, ticks per level {budget.level_ticks}",
+        command.index,
+    )
+    for timestamp, old, new, average, limit in list(budget.events)[-5:]:
+        respond(
+            f"[deepsurf] {time.strftime('%H:%M:%S', time.localtime(timestamp))} "
+            f"quality {old} -> {new} at {round(average, 2)}/{round(limit, 2)} ms",
+            command.index,
+        )
+
+
+@TypedSayCommand("!sensors")
+@TypedClientCommand("dps_sensors")
+@TypedServerCommand("dps_sensors")
+def _sensors_handler(
+    command, layout: str = "grid", budget: int = 92, fov: float = 180.0, slot: int = -1
+):
+    bots = get_bots(slot, command.index)
+    try:
+        for bot in bots:
+            bot.set_sensor_layout(layout, budget, fov)
+    except ValueError as e:
+        respond(f"[deepsurf] {e}", command.index)
+        return
+
+    for bot in bots:
+        observation = bot.observation
+        respond(
+            f"[deepsurf] Bot {bot.slot} sensor layout '{layout}' with "
+            f"{observation.num_rays} rays, observation size {observation.size} bytes",
+            command.index,
+        )
+
+
+@TypedSayCommand("!tracecache")
+@TypedClientCommand("dps_tracecache")
+@TypedServerCommand("dps_tracecache")
+def _tracecache_handler(
+    command, grid_size: float = 16.0, capacity: int = 65536, slot: int = -1
+):
+    for bot in get_bots(slot, command.index):
+        bot.set_trace_cache(grid_size, capacity)
+    if grid_size > 0 and capacity > 0:
+        respond(
+            f"[deepsurf] Caching traces, grid size {grid_size}, capacity {capacity}",
+            command.index,
+        )
+    else:
+        respond(f"[deepsurf] Trace cache disabled", command.index)
+
+
+@TypedSayCommand("!tracereuse")
+@TypedClientCommand("dps_tracereuse")
+@TypedServerCommand("dps_tracereuse")
+def _tracereuse_handler(command, distance: float = 0.0, slot: int = -1):
+    for bot in get_bots(slot, command.index):
+        bot.set_trace_reuse(distance)
+    respond(f"[deepsurf] Reusing traces within {distance} units", command.index)
+
+
+@TypedSayCommand("!tracestats")
+@TypedClientCommand("dps_tracestats")
+@TypedServerCommand("dps_tracestats")
+def _tracestats_handler(command, slot: int = -1):
+    for bot in get_bots(slot, command.index):
+        cache = bot.sensor.cache
+        if cache is None:
+            respond(f"[deepsurf] Bot {bot.slot} trace cache disabled", command.index)
+            continue
+
+        respond(
+            f"[deepsurf] Bot {bot.slot} trace cache hits: {cache.hits}, "
+            f"misses: {cache.misses}, "
+            f"hit rate: {round(cache.get_hit_rate() * 100, 1)}%, "
+            f"entries: {len(cache.entries)}",
+            command.index,
+        )
+        cache.reset_stats()
+
+
+@TypedSayCommand("!teleportindex")
+@TypedClientCommand("dps_teleportindex")
+@TypedServerCommand("dps_teleportindex")
+def _teleportindex_handler(command, enabled: int = 1, slot: int = -1):
+    for bot in get_bots(slot, command.index):
+        bot.set_teleport_index(enabled != 0)
+    if enabled != 0:
+        respond(f"[deepsurf] Using teleport index", command.index)
+    else:
+        respond(f"[deepsurf] Enumerating teleports per ray", command.index)
+
+
+@TypedSayCommand("!stagger")
+@TypedClientCommand("dps_stagger")
+@TypedServerCommand("dps_stagger")
+def _stagger_handler(
+    command,
+    refresh_count: int = 0,
+    forward_bias: float = 0.0,
+    ages: int = 0,
+    slot: int = -1,
+):
+    for bot in get_bots(slot, command.index):
+        bot.set_stagger(refresh_count, forward_bias, ages != 0)
+    if refresh_count > 0:
+        respond(
+            f"[deepsurf] Tracing {refresh_count} rays per tick, forward bias {forward_bias}",
+            command.index,
+        )
+    else:
+        respond(f"[deepsurf] Tracing all rays every tick", command.index)
+
+
+@TypedSayCommand("!sensorstats")
+@TypedClientCommand("dps_sensorstats")
+@TypedServerCommand("dps_sensorstats")
+def _sensorstats_handler(command, slot: int = -1):
+    for bot in get_bots(slot, command.index):
+        sensor = bot.sensor
+        traced, age, ms = sensor.get_stats()
+        respond(
+            f"[deepsurf] Bot {bot.slot} per tick: {round(traced, 1)}/{len(sensor)} "
+            f"rays traced, mean ray age {round(age, 2)} ticks, {round(ms, 3)} ms",
+            command.index,
+        )
+        sensor.reset_stats()
+
+
+@TypedSayCommand("!countreads")
+@TypedClientCommand("dps_countreads")
+@TypedServerCommand("dps_countreads")
+def _countreads_handler(command, ticks: int = 67, slot: int = 0):
+    for bot in get_bots(slot, command.index):
+        bot.count_reads(ticks)
+    respond(f"[deepsurf] Counting engine reads for {ticks} ticks", command.index)
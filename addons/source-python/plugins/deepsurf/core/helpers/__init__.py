@@ -1 +1 @@
-from .trace import CustomEntEnum
\ No newline at end of file
+from .trace import CustomEntEnum, EngineTracer, teleport_index
\ No newline at end of file
@@ -15,20 +15,13 @@ def closest_point_on_line(start: Vector, end: Vector, point: Vector) -> Vector:
 
 def closest_point_on_line_segment(start: Vector, end: Vector, point: Vector) -> Vector:
     """Get the closest position on line segment (start, end) to point"""
-    closest = closest_point_on_line(start, end, point)
+    line = end - start
+    length_sq = line.dot(line)
+    if length_sq == 0:
+        return start
 
-    # closest is a point projected onto the line
-    # and can be outside the line segment, clamp.
-    line_dot = start.dot(end)
-    closest_dot = closest.dot(end)
-
-    if line_dot * closest_dot > 0:
-        # same direction
-        if start.get_distance(end) < closest.get_distance(end):
-            closest = start
-    else:
-        # opposite
-        if end.get_distance(start) < closest.get_distance(start):
-            closest = end
-
-    return closest
+    # project onto the line and clamp to the segment,
+    # see zone.route.Route for the vectorized version
+    frac = (point - start).dot(line) / length_sq
+    frac = min(max(frac, 0.0), 1.0)
+    return start + line * frac
@@ -13,6 +13,10 @@ from entities import HandleEntity
 from entities.helpers import index_from_basehandle
 from mathlib import Vector, NULL_VECTOR
 from engines.trace import ContentMasks
+from filters.entities import EntityIter
+
+# deepsurf
+from ..tracing import Tracer, TeleportIndex
 
 
 # =============================================================================
@@ -77,3 +81,61 @@ class CustomEntEnum(EntityEnumerator):
             self.normal = trace.plane.normal
             self.entity = trace.entity
             self.distance = Vector.get_distance(self.origin, trace.end_position)
+
+
+class EngineTracer(Tracer):
+    """Traces rays against the engine, including trigger_teleports
+    unless enumerate_teleports is False (see teleport_index)."""
+
+    def __init__(self, filter=(), enumerate_teleports=True):
+        self.filter = filter
+        self.enumerate_teleports = enumerate_teleports
+
+    def trace(self, start, end):
+        entity_enum = CustomEntEnum(Vector(*start), Vector(*end), self.filter)
+
+        # Check for normal geometry
+        entity_enum.normal_trace()
+
+        # Check for trigger_teleports
+        if self.enumerate_teleports:
+            engine_trace.enumerate_entities(entity_enum.ray, True, entity_enum)
+
+        if not entity_enum.did_hit:
+            return None, False
+
+        point = entity_enum.point
+        return (point.x, point.y, point.z), bool(entity_enum.is_teleport)
+
+    def clip(self, start, end, entity):
+        trace = GameTrace()
+        engine_trace.clip_ray_to_entity(
+            Ray(Vector(*start), Vector(*end)), ContentMasks.ALL, entity, trace
+        )
+
+        if not trace.did_hit():
+            return None
+
+        point = trace.end_position
+        return point.x, point.y, point.z
+
+
+# =============================================================================
+# >> FUNCTIONS
+# =============================================================================
+def collect_teleports():
+    """Get world space bounds of all trigger_teleports."""
+    boxes = []
+    for entity in EntityIter("trigger_teleport"):
+        origin = entity.origin
+        mins = origin + entity.get_property_vector("m_Collision.m_vecMins")
+        maxs = origin + entity.get_property_vector("m_Collision.m_vecMaxs")
+        boxes.append(((mins.x, mins.y, mins.z), (maxs.x, maxs.y, maxs.z), entity))
+    return boxes
+
+
+# =============================================================================
+# >> GLOBAL VARIABLES
+# =============================================================================
+# rebuilt when teleports spawn or are deleted, see deepsurf.py
+teleport_index = TeleportIndex(collect_teleports)
@@ -6,6 +6,9 @@
 # Source.Python
 from messages import HintText
 
+# deepsurf
+from .reward import COMPONENTS
+
 # =============================================================================
 # >> GLOBAL VARIABLES
 # =============================================================================
@@ -15,24 +18,33 @@ buffer_white_space = "\n\n\n\n\n\n"
 # =============================================================================
 # >> FUNCTIONS
 # =============================================================================
-def draw_hud(bot, time, training, reward):
-    """Draw hud to players."""
-    _draw_timer(bot.spectators, time, training, reward)
+def draw_hud(bot, snapshot, time, training, reward, components=None):
+    """Draw hud to players.
+
+    components is the bot's reward.RewardEngine, its episode
+    totals are shown while training.
+    """
+    _draw_timer(bot.spectators, snapshot, time, training, reward, components)
 
 
-def _draw_timer(spectators, time, training, reward):
+def _draw_timer(spectators, snapshot, time, training, reward, components=None):
     """Draw timer for bot."""
 
     # lines for timer hud
     time_line = f"{round(time, 2)}"
+    speed_line = f"Speed: {round(snapshot.velocity.length_2D)}"
     reward_line = f"Total reward: {round(reward, 2)}"
 
     # combine lines
     combined = time_line + "\n"
+    combined += speed_line + "\n"
 
     if training is True:
         combined += "Training\n"
         combined += reward_line
+        if components is not None:
+            for name, total in zip(COMPONENTS, components.totals.tolist()):
+                combined += f"\n{name}: {round(total, 2)}"
     else:
         combined += "Running"
 
@@ -0,0 +1,727 @@
+"""Module for communicating with the learner network."""
+
+# =============================================================================
+# >> IMPORTS
+# =============================================================================
+# Python
+import threading
+import time
+from collections import deque
+
+import rpyc
+from rpyc.core import consts
+
+# deepsurf
+from .reward import COMPONENTS
+
+# =============================================================================
+# >> GLOBAL VARIABLES
+# =============================================================================
+# raised by calls over a broken connection
+connection_errors = (EOFError, OSError, rpyc.AsyncResultTimeout)
+# learner methods that are used when available
+optional_methods = (
+    "step",
+    "step_batch",
+    "get_action_batch",
+    "get_action_stacked",
+    "get_action_run_batch",
+    "get_action_run_stacked",
+    "post_transitions",
+    "post_reward_components",
+    "set_action_space",
+    "post_stage_result",
+    "get_stage_weights",
+)
+
+
+# =============================================================================
+# >> CLASSES
+# =============================================================================
+class LearnerUnavailable(Exception):
+    """There is no working connection to the learner."""
+
+
+class LearnerLink:
+    """Connection to a single learner endpoint.
+
+    Connects in a background thread so the game thread never blocks
+    on it, reconnects with exponential backoff and sends a heartbeat
+    ping to measure latency and detect a learner that stopped
+    responding.
+    """
+
+    # seconds between heartbeats
+    heartbeat_interval = 1.0
+    # drop the connection if a heartbeat isn't answered in time
+    heartbeat_timeout = 5.0
+    # seconds to wait for a reply to a blocking request, e.g. when
+    # connecting, calls wait for NetworkClient.call_deadline instead
+    call_timeout = 10.0
+    min_backoff = 0.5
+    max_backoff = 30.0
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.conn = None
+        self.network = None
+        # optional_methods the learner implements
+        self.methods = frozenset()
+        self.thread = None
+        self.result = None
+        self.next_attempt = 0.0
+        self.backoff = self.min_backoff
+        self.ping = None
+        self.ping_sent = 0.0
+        # heartbeat round-trip in seconds, None until measured
+        self.latency = None
+        self.max_latency = 0.0
+        self.connects = 0
+        self.failures = 0
+        self.error = None
+
+    def __str__(self):
+        return f"{self.host}:{self.port}"
+
+    @property
+    def connected(self):
+        return self.network is not None
+
+    def poll(self, now):
+        """Advance connecting and the heartbeat, return whether connected."""
+        if self.thread is not None:
+            if self.thread.is_alive():
+                return False
+            self.thread = None
+            self.on_connect(now)
+        elif self.network is None:
+            if now >= self.next_attempt:
+                self.thread = threading.Thread(target=self.connect, daemon=True)
+                self.thread.start()
+            return False
+
+        if self.network is not None:
+            self.heartbeat(now)
+        return self.network is not None
+
+    def connect(self):
+        """Connect and check what the learner supports, in the background."""
+        try:
+            conn = rpyc.connect(
+                self.host, self.port, config={"sync_request_timeout": self.call_timeout}
+            )
+            network = conn.root.Network()
+            methods = frozenset(
+                name for name in optional_methods if hasattr(network, name)
+            )
+            self.result = (conn, network, methods)
+        except Exception as e:
+            self.result = e
+
+    def on_connect(self, now):
+        result = self.result
+        self.result = None
+        if isinstance(result, Exception):
+            self.on_failure(now, result)
+            return
+
+        self.conn, self.network, self.methods = result
+        self.connects += 1
+        self.backoff = self.min_backoff
+        self.error = None
+        self.ping = None
+        self.ping_sent = now
+        print(f"[deepsurf] Connected to learner at {self}")
+
+    def heartbeat(self, now):
+        try:
+            # handle replies that arrived since the last tick
+            self.conn.poll_all(0)
+            if self.ping is not None:
+                if now - self.ping_sent > self.heartbeat_timeout:
+                    raise LearnerUnavailable("heartbeat timed out")
+            elif now - self.ping_sent >= self.heartbeat_interval:
+                self.ping_sent = now
+                self.ping = self.conn.async_request(consts.HANDLE_PING, b"")
+                self.ping.add_callback(self.on_pong)
+        except connection_errors + (LearnerUnavailable,) as e:
+            self.disconnect(e)
+
+    def on_pong(self, result):
+        # called while serving the connection, so the latency is
+        # only as accurate as how often the connection is served
+        latency = time.monotonic() - self.ping_sent
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += 0.1 * (latency - self.latency)
+        self.max_latency = max(self.max_latency, latency)
+        self.ping = None
+
+    def disconnect(self, error=None):
+        """Drop the connection, reconnecting later if error is given."""
+        if self.conn is not None:
+            if error is None:
+                close_connection(self.conn)
+            else:
+                # closing waits for the learner to reply, which
+                # a stalled one won't
+                threading.Thread(
+                    target=close_connection, args=(self.conn,), daemon=True
+                ).start()
+        self.conn = None
+        self.network = None
+        self.ping = None
+        if error is not None:
+            print(f"[deepsurf] Lost learner connection to {self}: {error}")
+            self.on_failure(time.monotonic(), error)
+
+    def on_failure(self, now, error):
+        self.failures += 1
+        self.error = error
+        self.next_attempt = now + self.backoff
+        self.backoff = min(self.backoff * 2.0, self.max_backoff)
+
+    def close(self):
+        self.disconnect()
+        # never reconnect
+        self.next_attempt = float("inf")
+
+
+class NetworkClient:
+    """Client for the remote learner network.
+
+    Keeps a pool of LearnerLinks to the endpoints and sends calls over
+    the first one that is connected, so a learner restart or a slow
+    start never blocks the game thread. `poll` needs to be called
+    every tick, calls raise LearnerUnavailable while not connected.
+
+    Counts round-trips so the per-tick cost of talking to the learner
+    can be measured. States are sent as encoded observation bytes,
+    see state.py.
+    """
+
+    def __init__(self, endpoints=(("localhost", 18811),), pool_size=1):
+        """Connect to the learner at (host, port) endpoints in the
+        background, with pool_size connections spread over them."""
+        self.endpoints = tuple(endpoints)
+        self.links = [
+            LearnerLink(*self.endpoints[i % len(self.endpoints)])
+            for i in range(max(pool_size, len(self.endpoints)))
+        ]
+        self.link = None
+        self.conn = None
+        self.network = None
+        self.methods = frozenset()
+        self.use_step = False
+        self.use_batch = False
+        self.use_stacked = False
+        # name -> async method of the connected learner, see request
+        self.async_methods = {}
+        # seconds call waits for a reply before dropping the link
+        self.call_deadline = LearnerLink.call_timeout
+        # incremented when switching connections, replies and
+        # transitions in flight on the old one are lost
+        self.generation = 0
+        self.round_trips = 0
+
+    def poll(self):
+        """Keep the links alive, return whether the learner is available."""
+        now = time.monotonic()
+        for link in self.links:
+            link.poll(now)
+
+        if self.link is not None and self.link.connected:
+            return True
+
+        for link in self.links:
+            if link.connected:
+                self.use_link(link)
+                return True
+
+        self.use_link(None)
+        return False
+
+    def use_link(self, link):
+        if link is self.link:
+            return
+        self.link = link
+        self.generation += 1
+        self.async_methods = {}
+        if link is None:
+            self.conn = None
+            self.network = None
+            return
+
+        self.conn = link.conn
+        self.network = link.network
+        self.methods = link.methods
+        # use the single round-trip step call if the learner supports it
+        self.use_step = "step" in self.methods
+        # send all bots in one message per tick if the learner supports it
+        self.use_batch = "step_batch" in self.methods
+        # send action requests as one stacked buffer if supported,
+        # see can_stack
+        self.use_stacked = any(
+            f"{name}_stacked" in self.methods
+            for name in ("get_action", "get_action_run")
+        )
+
+    def wait_connected(self, timeout):
+        """Block until connected or timeout seconds have passed,
+        for scripts that don't poll every tick."""
+        deadline = time.monotonic() + timeout
+        while not self.poll():
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self):
+        for link in self.links:
+            link.close()
+        self.use_link(None)
+
+    def get_stats(self):
+        """Get (endpoint, connected, latency ms, max latency ms,
+        connects, failures) of each link."""
+        return [
+            (
+                str(link),
+                link.connected,
+                None if link.latency is None else link.latency * 1000.0,
+                link.max_latency * 1000.0,
+                link.connects,
+                link.failures,
+            )
+            for link in self.links
+        ]
+
+    def on_error(self, error):
+        link = self.link
+        link.disconnect(error)
+        self.use_link(None)
+        raise LearnerUnavailable(f"{link}: {error}") from error
+
+    def call(self, name, *args):
+        """Call name on the learner and wait for the result.
+
+        A learner that doesn't reply within call_deadline seconds
+        is dropped like a broken connection, so training pauses
+        until it's back instead of the tick blocking on it.
+        """
+        result = self.request(name, *args)
+        if not self.wait(result, self.call_deadline):
+            self.on_error(
+                rpyc.AsyncResultTimeout(
+                    f"{name} took over {round(self.call_deadline * 1000.0, 1)} ms"
+                )
+            )
+        try:
+            return result.value
+        except connection_errors as e:
+            self.on_error(e)
+
+    def request(self, name, *args):
+        """Call name on the learner without waiting, returns an AsyncResult."""
+        if self.network is None:
+            raise LearnerUnavailable("Not connected to the learner")
+        self.round_trips += 1
+        try:
+            method = self.async_methods.get(name)
+            if method is None:
+                # looking up a remote method is a round-trip of its own
+                method = rpyc.async_(getattr(self.network, name))
+                self.async_methods[name] = method
+            return method(*args)
+        except connection_errors as e:
+            self.on_error(e)
+
+    def get_action(self, state):
+        """Get a training action for state."""
+        return self.call("get_action", state)
+
+    def get_action_run(self, state):
+        """Get a greedy action for state."""
+        return self.call("get_action_run", state)
+
+    def has(self, name):
+        """Does the connected learner implement the optional method name?"""
+        return name in self.methods
+
+    def post_action(self, reward, state, done):
+        """Post the result of the previous action."""
+        self.call("post_action", reward, state, done)
+
+    def step(self, reward, state, done):
+        """Post the result of the previous action and get the next one.
+
+        Uses a single round-trip when the learner implements `step`,
+        otherwise falls back to `post_action` + `get_action`.
+        """
+        if self.use_step:
+            return self.call("step", reward, state, done)
+
+        self.post_action(reward, state, done)
+        return self.get_action(state)
+
+    def step_batch(self, entries):
+        """Post the transitions of several bots and get their next actions.
+
+        entries is a sequence of (env_id, reward, state, done) tuples,
+        reward is None for the first state of an episode.
+        Returns a tuple of (env_id, action) for the entries not done.
+        Uses a single round-trip when the learner implements
+        `step_batch`, otherwise falls back to a call per entry.
+        """
+        if self.use_batch:
+            return self.call("step_batch", tuple(entries))
+
+        actions = []
+        for env_id, reward, state, done in entries:
+            if reward is None:
+                actions.append((env_id, self.get_action(state)))
+            elif done:
+                self.post_action(reward, state, done)
+            else:
+                actions.append((env_id, self.step(reward, state, done)))
+        return tuple(actions)
+
+    def get_action_batch(self, entries):
+        """Get training actions for several bots without posting
+        transitions, see TransitionBuffer.
+
+        entries is a sequence of (env_id, state) tuples.
+        Returns a tuple of (env_id, action).
+        """
+        return self.get_actions(entries, "get_action")
+
+    def get_action_run_batch(self, entries):
+        """Get greedy actions for several bots, see get_action_batch."""
+        return self.get_actions(entries, "get_action_run")
+
+    def get_actions(self, entries, name):
+        """Get actions for entries from the learner method name.
+
+        Observations of the same size are sent as one stacked buffer
+        when the learner implements `<name>_stacked`, see
+        state.decode_batch, otherwise as a tuple of entries to
+        `<name>_batch` or one call per entry.
+        """
+        if self.can_stack(entries, name):
+            env_ids, data = self.stack(entries)
+            return tuple(zip(env_ids, self.call(f"{name}_stacked", data)))
+
+        if self.use_batch and f"{name}_batch" in self.methods:
+            return self.call(f"{name}_batch", tuple(entries))
+
+        return tuple((env_id, self.call(name, state)) for env_id, state in entries)
+
+    def can_stack(self, entries, name):
+        if not self.use_stacked or f"{name}_stacked" not in self.methods:
+            return False
+        if not entries:
+            return False
+        size = len(entries[0][1])
+        return all(len(state) == size for _, state in entries)
+
+    def stack(self, entries):
+        """Get the env ids and concatenated states of entries."""
+        env_ids = tuple(env_id for env_id, _ in entries)
+        return env_ids, b"".join(state for _, state in entries)
+
+    def post_transitions(self, env_id, chunk):
+        """Post a chunk of transitions of a bot, see TransitionBuffer.chunk.
+
+        Needs a learner implementing `post_transitions`. Each view is
+        copied once into the bytes sent, rpyc can't send memoryviews.
+        """
+        self.call("post_transitions", env_id, *(bytes(view) for view in chunk))
+
+    def post_reward_components(self, env_id, totals):
+        """Post the reward component totals of a bot's last episode
+        without waiting, named as in reward.COMPONENTS.
+
+        Needs a learner implementing `post_reward_components`.
+        """
+        self.request(
+            "post_reward_components", env_id, COMPONENTS, tuple(totals.tolist())
+        )
+
+    def set_action_space(self, descriptor):
+        """Tell the learner the actions.ActionSpace.descriptor of the
+        actions it should send.
+
+        Needs a learner implementing `set_action_space`.
+        """
+        self.call("set_action_space", descriptor)
+
+    def post_stage_result(self, env_id, stage, progress, completed):
+        """Post the stage of a bot's last episode, the fraction of its
+        route it got along and whether it reached the end, without
+        waiting.
+
+        Needs a learner implementing `post_stage_result`.
+        """
+        self.request("post_stage_result", env_id, stage, progress, completed)
+
+    def get_stage_weights(self, map_name, stages):
+        """Get the learner's weights for picking each of stages of
+        map_name, see stages.StageSampler, None to leave it to the
+        plugin.
+
+        Needs a learner implementing `get_stage_weights`.
+        """
+        weights = self.call("get_stage_weights", map_name, tuple(stages))
+        if weights is None:
+            return None
+        return tuple(float(weight) for weight in weights)
+
+    def request_action(self, state):
+        """Request a training action for state without waiting for it."""
+        return self.request("get_action", state)
+
+    def request_step(self, reward, state, done):
+        """Post the previous transition and request the next action
+        without waiting for it."""
+        if self.use_step:
+            return self.request("step", reward, state, done)
+
+        self.request("post_action", reward, state, done)
+        return self.request_action(state)
+
+    def request_post_action(self, reward, state, done):
+        """Post the result of the previous action without waiting."""
+        return self.request("post_action", reward, state, done)
+
+    def request_step_batch(self, entries):
+        """Request step_batch without waiting for it."""
+        if self.use_batch:
+            return self.request("step_batch", tuple(entries))
+
+        parts = []
+        for env_id, reward, state, done in entries:
+            if reward is None:
+                parts.append((env_id, self.request_action(state)))
+            elif done:
+                self.request_post_action(reward, state, done)
+            else:
+                parts.append((env_id, self.request_step(reward, state, done)))
+        return BatchResult(parts)
+
+    def request_action_batch(self, entries):
+        """Request get_action_batch without waiting for it."""
+        return self.request_actions(entries, "get_action")
+
+    def request_action_run_batch(self, entries):
+        """Request get_action_run_batch without waiting for it."""
+        return self.request_actions(entries, "get_action_run")
+
+    def request_actions(self, entries, name):
+        """Request get_actions without waiting for it."""
+        if self.can_stack(entries, name):
+            env_ids, data = self.stack(entries)
+            return StackedResult(env_ids, self.request(f"{name}_stacked", data))
+
+        if self.use_batch and f"{name}_batch" in self.methods:
+            return self.request(f"{name}_batch", tuple(entries))
+
+        return BatchResult(
+            [(env_id, self.request(name, state)) for env_id, state in entries]
+        )
+
+    def request_post_transitions(self, env_id, chunk):
+        """Post a chunk of transitions without waiting, copied as in
+        post_transitions."""
+        return self.request(
+            "post_transitions", env_id, *(bytes(view) for view in chunk)
+        )
+
+    def request_end_episode(self, total_reward, env_id=0):
+        """Notify the learner of an episode ending without waiting."""
+        if self.use_batch:
+            return self.request("end_episode", total_reward, env_id)
+        return self.request("end_episode", total_reward)
+
+    def wait(self, result, timeout):
+        """Serve the connection until result is ready or timeout
+        seconds have passed, return whether result is ready."""
+        deadline = time.monotonic() + timeout
+        try:
+            while not result.ready:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                if self.conn is None:
+                    raise LearnerUnavailable("Not connected to the learner")
+                self.conn.serve(remaining)
+        except connection_errors as e:
+            self.on_error(e)
+        return True
+
+    def end_episode(self, total_reward, env_id=0):
+        """Notify the learner of an episode ending.
+
+        env_id is only sent to learners implementing `step_batch`.
+        """
+        if self.use_batch:
+            self.call("end_episode", total_reward, env_id)
+        else:
+            self.call("end_episode", total_reward)
+
+    def explore(self):
+        """Tell the learner to explore."""
+        self.call("explore")
+
+
+class BatchResult:
+    """Joins async results into a single batch result.
+
+    parts is a list of (env_id, result) where the value of result is
+    the action for env_id, or (None, result) where the value already
+    is a tuple of (env_id, action).
+    """
+
+    def __init__(self, parts):
+        self.parts = parts
+
+    @property
+    def ready(self):
+        return all(result.ready for _, result in self.parts)
+
+    @property
+    def value(self):
+        actions = []
+        for env_id, result in self.parts:
+            if env_id is None:
+                actions.extend(result.value)
+            else:
+                actions.append((env_id, result.value))
+        return tuple(actions)
+
+
+class StackedResult:
+    """Pairs the actions of a stacked request with their env ids."""
+
+    def __init__(self, env_ids, result):
+        self.env_ids = env_ids
+        self.result = result
+
+    @property
+    def ready(self):
+        return self.result.ready
+
+    @property
+    def value(self):
+        return tuple(zip(self.env_ids, self.result.value))
+
+
+class ActionPipeline:
+    """Pipelined action requests so ticks don't block on the learner.
+
+    A batch of actions requested at the end of tick t is applied on
+    tick t + delay, so the smallest possible delay is 1.
+    If it hasn't arrived by then, the tick waits at most `deadline`
+    seconds for it before the bots keep their most recent actions.
+    """
+
+    def __init__(self, client, delay=1, deadline=0.002):
+        self.client = client
+        self.delay = max(1, delay)
+        self.deadline = deadline
+        # drop requests once this many are waiting
+        self.max_pending = self.delay + 8
+        self.pending = deque()
+        # ticks where the due reply wasn't ready within the deadline
+        self.late = 0
+        # actions superseded by a newer reply before being applied,
+        # and requests dropped unanswered
+        self.missed = 0
+        # replies the learner raised an exception for, and the last one
+        self.failed = 0
+        self.error = None
+
+    def submit(self, tick, result, context=None):
+        """Queue a request sent on tick.
+
+        context is returned with the reply, e.g. to drop actions
+        for episodes that have ended since.
+        """
+        self.pending.append((tick, result, context))
+        while len(self.pending) > self.max_pending:
+            self.pending.popleft()
+            self.missed += 1
+
+    def collect(self, tick):
+        """Get the (value, context) of every reply due on tick that
+        has arrived, oldest first, so newer actions of a bot replace
+        older ones when applied in order. Empty if none has."""
+        due = 0
+        for sent_tick, _, _ in self.pending:
+            if tick - sent_tick < self.delay:
+                break
+            due += 1
+
+        if due == 0:
+            return []
+
+        # replies arrive in order, so waiting for the newest
+        # due request also serves the older ones
+        newest = self.pending[due - 1][1]
+        if not self.client.wait(newest, self.deadline):
+            self.late += 1
+
+        # apply the due replies up to the newest that has arrived
+        last = -1
+        for i in range(due - 1, -1, -1):
+            if self.pending[i][1].ready:
+                last = i
+                break
+
+        replies = []
+        newer = set()
+        for _ in range(last + 1):
+            _, result, context = self.pending.popleft()
+            if not result.ready:
+                # would replace newer actions once it arrives
+                self.missed += 1
+                continue
+            try:
+                value = result.value
+            except connection_errors as e:
+                self.client.on_error(e)
+            except Exception as e:
+                # raised by the learner, the other replies still apply
+                self.failed += 1
+                self.error = e
+                continue
+            replies.append((value, context))
+
+        # bots with an action in a newer reply never apply the older one
+        for value, _ in reversed(replies):
+            for env_id, _ in value:
+                if env_id in newer:
+                    self.missed += 1
+                newer.add(env_id)
+        return replies
+
+    def clear(self):
+        """Drop pending requests."""
+        self.pending.clear()
+
+    def reset_stats(self):
+        self.late = 0
+        self.missed = 0
+        self.failed = 0
+        self.error = None
+
+
+# =============================================================================
+# >> FUNCTIONS
+# =============================================================================
+def close_connection(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
@@ -0,0 +1,186 @@
+"""Module for running an exported policy in-process.
+
+The policy is an MLP saved with `numpy.savez`:
+    w0, b0, w1, b1, ...     layer weights float32[in, out] and biases
+                            float32[out], ReLU between layers,
+                            the last layer outputs logits
+    heads                   int[5], optional, logits per action part,
+                            defaults to HEADS
+
+Inputs are observations as vectors, see state.state_to_vector.
+The greedy action takes the largest logit of each head.
+This module doesn't depend on Source.Python so the learner can import it.
+"""
+
+# =============================================================================
+# >> IMPORTS
+# =============================================================================
+# Python
+import os
+import time
+
+import numpy as np
+
+# =============================================================================
+# >> ALL DECLARATION
+# =============================================================================
+__all__ = (
+    "HEADS",
+    "Policy",
+    "save_policy",
+)
+
+# =============================================================================
+# >> GLOBAL VARIABLES
+# =============================================================================
+# move direction, yaw, pitch, jump, duck of the default
+# actions.ActionSpace
+HEADS = (9, 201, 201, 2, 2)
+
+
+# =============================================================================
+# >> CLASSES
+# =============================================================================
+class Policy:
+    """MLP policy loaded from an .npz file, reloaded when the file changes.
+
+    Activations are preallocated for `capacity` observations,
+    so acting doesn't allocate arrays unless the batch grows.
+    """
+
+    # seconds between checks for a changed file
+    reload_interval = 1.0
+
+    def __init__(self, path, capacity=1):
+        self.path = path
+        self.capacity = capacity
+        self.mtime = None
+        self.next_check = 0.0
+        self.reloads = 0
+        self.load()
+
+    @property
+    def input_size(self):
+        return self.weights[0].shape[0]
+
+    def load(self):
+        """Load the weights from path, raises if they're invalid."""
+        mtime = os.stat(self.path).st_mtime
+        with np.load(self.path) as data:
+            layers = 0
+            while f"w{layers}" in data:
+                layers += 1
+            if layers == 0:
+                raise ValueError(f"No layers in '{self.path}'")
+
+            weights = [data[f"w{i}"].astype(np.float32) for i in range(layers)]
+            biases = [data[f"b{i}"].astype(np.float32) for i in range(layers)]
+            heads = tuple(int(h) for h in data["heads"]) if "heads" in data else HEADS
+
+        for i in range(layers):
+            if weights[i].ndim != 2 or biases[i].shape != weights[i].shape[1:]:
+                raise ValueError(f"Layer {i} has mismatched weight and bias shapes")
+            if i > 0 and weights[i].shape[0] != weights[i - 1].shape[1]:
+                raise ValueError(f"Layer {i} doesn't take the previous layer's output")
+        if weights[-1].shape[1] != sum(heads):
+            raise ValueError(
+                f"Policy outputs {weights[-1].shape[1]} logits, "
+                f"heads need {sum(heads)}"
+            )
+
+        self.weights = weights
+        self.biases = biases
+        self.heads = heads
+        self.offsets = np.cumsum((0,) + heads)
+        self.mtime = mtime
+        self.allocate(self.capacity)
+
+    def allocate(self, capacity):
+        self.capacity = capacity
+        self.inputs = np.zeros((capacity, self.input_size), dtype=np.float32)
+        self.activations = [
+            np.zeros((capacity, w.shape[1]), dtype=np.float32) for w in self.weights
+        ]
+        self.actions = np.zeros((len(self.heads), capacity), dtype=np.intp)
+
+    def poll(self):
+        """Reload the weights if the file has changed, returns whether
+        they were reloaded. Keeps the old weights if loading fails."""
+        now = time.monotonic()
+        if now < self.next_check:
+            return False
+        self.next_check = now + self.reload_interval
+
+        try:
+            if os.stat(self.path).st_mtime == self.mtime:
+                return False
+            self.load()
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[deepsurf] Failed to reload policy '{self.path}': {e}")
+            return False
+
+        self.reloads += 1
+        return True
+
+    def forward(self, count):
+        """Run the first count rows of inputs through the layers,
+        returns a view of the logits."""
+        x = self.inputs[:count]
+        last = len(self.weights) - 1
+        for i, (w, b, out) in enumerate(
+            zip(self.weights, self.biases, self.activations)
+        ):
+            y = out[:count]
+            np.dot(x, w, out=y)
+            y += b
+            if i < last:
+                np.maximum(y, 0.0, out=y)
+            x = y
+        return x
+
+    def greedy(self, count):
+        """Get greedy actions for the first count rows of inputs
+        as a list of 5-tuples."""
+        logits = self.forward(count)
+        for h in range(len(self.heads)):
+            np.argmax(
+                logits[:, self.offsets[h] : self.offsets[h + 1]],
+                axis=1,
+                out=self.actions[h, :count],
+            )
+        return list(zip(*self.actions[:, :count].tolist()))
+
+    def act(self, observations):
+        """Get greedy actions for state.Observation buffers."""
+        count = len(observations)
+        if count > self.capacity:
+            self.allocate(count)
+        for i, observation in enumerate(observations):
+            if observation.vector_size != self.input_size:
+                raise ValueError(
+                    f"Policy takes {self.input_size} inputs, "
+                    f"observation has {observation.vector_size}"
+                )
+            observation.to_vector(self.inputs[i])
+        return self.greedy(count)
+
+    def act_vectors(self, vectors):
+        """Get greedy actions for a (count, D) matrix of observation
+        vectors, see state.decode_batch."""
+        count = len(vectors)
+        if count > self.capacity:
+            self.allocate(count)
+        self.inputs[:count] = vectors
+        return self.greedy(count)
+
+
+# =============================================================================
+# >> FUNCTIONS
+# =============================================================================
+def save_policy(path, weights, biases, heads=HEADS):
+    """Export MLP layers in the format Policy loads."""
+    arrays = {"heads": np.asarray(heads, dtype=np.int32)}
+    for i, (w, b) in enumerate(zip(weights, biases)):
+        arrays[f"w{i}"] = np.asarray(w, dtype=np.float32)
+        arrays[f"b{i}"] = np.asarray(b, dtype=np.float32)
+    np.savez(path, **arrays)
@@ -0,0 +1,227 @@
+"""Module for timing the phases of a tick.
+
+Phases are functions and methods wrapped with timers while profiling
+is enabled, so disabled profiling costs nothing. Each phase keeps a
+rolling window of durations in nanoseconds overall and, for methods
+of objects with a slot, per bot.
+This module doesn't depend on Source.Python.
+"""
+
+# =============================================================================
+# >> IMPORTS
+# =============================================================================
+# Python
+import json
+import time
+
+import numpy as np
+
+# =============================================================================
+# >> ALL DECLARATION
+# =============================================================================
+__all__ = (
+    "PhaseStats",
+    "Profiler",
+    "profiler",
+)
+
+# =============================================================================
+# >> GLOBAL VARIABLES
+# =============================================================================
+# perf_counter_ns is new in Python 3.7
+if hasattr(time, "perf_counter_ns"):
+    clock = time.perf_counter_ns
+else:
+
+    def clock():
+        return int(time.perf_counter() * 1e9)
+
+
+PERCENTILES = (50, 95, 99)
+CSV_COLUMNS = (
+    "time",
+    "phase",
+    "slot",
+    "count",
+    "mean_us",
+    "p50_us",
+    "p95_us",
+    "p99_us",
+    "max_us",
+)
+
+
+# =============================================================================
+# >> CLASSES
+# =============================================================================
+class PhaseStats:
+    """Durations of a phase, the last window_size kept for percentiles."""
+
+    __slots__ = ("samples", "index", "count", "total", "max")
+
+    def __init__(self, window_size=1024):
+        self.samples = [0] * window_size
+        self.reset()
+
+    def reset(self):
+        self.index = 0
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, ns):
+        samples = self.samples
+        samples[self.index] = ns
+        self.index = (self.index + 1) % len(samples)
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+
+    def summary(self):
+        """Get (count, mean, p50, p95, p99, max) in microseconds,
+        the percentiles over the window."""
+        if self.count == 0:
+            return 0, 0.0, 0.0, 0.0, 0.0, 0.0
+        window = np.array(self.samples[: min(self.count, len(self.samples))])
+        percentiles = np.percentile(window, PERCENTILES) / 1000.0
+        return (
+            self.count,
+            self.total / self.count / 1000.0,
+            *percentiles.tolist(),
+            self.max / 1000.0,
+        )
+
+
+class Profiler:
+    """Times instrumented phases while enabled, see instrument."""
+
+    def __init__(self, window_size=1024):
+        self.window_size = window_size
+        self.enabled = False
+        # (phase, slot) -> PhaseStats, slot None for all bots
+        self.stats = {}
+        # (owner, attribute, original) of wrapped functions
+        self.patches = []
+        self.export_path = None
+        self.export_interval = 0.0
+        self.next_export = 0.0
+
+    def get(self, phase, slot=None):
+        key = (phase, slot)
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = PhaseStats(self.window_size)
+        return stats
+
+    def instrument(self, owner, attribute, phase, per_bot=False):
+        """Time calls to owner.attribute, a class or module function,
+        as phase. per_bot also records methods by their object's slot."""
+        original = owner.__dict__[attribute]
+        stats = self.get(phase)
+        get = self.get
+
+        if per_bot:
+
+            def timed(obj, *args, **kwargs):
+                start = clock()
+                try:
+                    return original(obj, *args, **kwargs)
+                finally:
+                    elapsed = clock() - start
+                    stats.add(elapsed)
+                    get(phase, obj.slot).add(elapsed)
+
+        else:
+
+            def timed(*args, **kwargs):
+                start = clock()
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    stats.add(clock() - start)
+
+        timed.__wrapped__ = original
+        setattr(owner, attribute, timed)
+        self.patches.append((owner, attribute, original))
+
+    def enable(self, phases):
+        """Instrument (owner, attribute, phase, per_bot) phases."""
+        if self.enabled:
+            self.disable()
+        for owner, attribute, phase, per_bot in phases:
+            self.instrument(owner, attribute, phase, per_bot)
+        self.enabled = True
+
+    def disable(self):
+        """Restore the instrumented functions, keeping the stats."""
+        for owner, attribute, original in reversed(self.patches):
+            setattr(owner, attribute, original)
+        self.patches = []
+        self.enabled = False
+
+    def reset(self):
+        for stats in self.stats.values():
+            stats.reset()
+
+    def summary(self, slot=None):
+        """Get (phase, slot, count, mean, p50, p95, p99, max) rows in
+        microseconds for all bots, or also for slot, -1 for every bot."""
+        rows = []
+        for (phase, stats_slot), stats in sorted(self.stats.items(), key=sort_key):
+            if stats.count == 0:
+                continue
+            if stats_slot is not None and slot != -1 and stats_slot != slot:
+                continue
+            rows.append((phase, stats_slot) + stats.summary())
+        return rows
+
+    def set_export(self, path, interval):
+        """Append the summary to path every interval seconds, as JSON
+        lines or CSV by the extension of path. None to stop."""
+        self.export_path = path
+        self.export_interval = interval
+        self.next_export = time.monotonic() + interval
+        if path is not None and path.endswith(".csv"):
+            try:
+                with open(path, "x") as f:
+                    f.write(",".join(CSV_COLUMNS) + "\n")
+            except FileExistsError:
+                pass
+
+    def tick(self):
+        """Export if due, call once per tick while enabled."""
+        if self.export_path is None:
+            return
+        now = time.monotonic()
+        if now < self.next_export:
+            return
+        self.next_export = now + self.export_interval
+        self.export(time.time())
+
+    def export(self, timestamp):
+        rows = self.summary(-1)
+        with open(self.export_path, "a") as f:
+            for row in rows:
+                values = (timestamp,) + row
+                if self.export_path.endswith(".csv"):
+                    f.write(
+                        ",".join("" if v is None else str(v) for v in values) + "\n"
+                    )
+                else:
+                    f.write(json.dumps(dict(zip(CSV_COLUMNS, values))) + "\n")
+
+
+# =============================================================================
+# >> FUNCTIONS
+# =============================================================================
+def sort_key(item):
+    """Sort stats by phase, all bots first."""
+    (phase, slot), _ = item
+    return phase, -1 if slot is None else slot
+
+
+# =============================================================================
+# >> GLOBAL VARIABLES
+# =============================================================================
+profiler = Profiler()
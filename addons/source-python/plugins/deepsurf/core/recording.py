@@ -0,0 +1,442 @@
+"""Module for recording episodes to memory-mapped files.
+
+A recording file holds up to `capacity` rows in columns, one row per
+bot per tick. It's created at full size and rows are appended by
+writing into the memory-mapped columns, so a tick doesn't copy more
+than the row itself.
+
+Layout (little-endian):
+    header          32 bytes, see HEADER, count is the number of
+                    rows written so far
+    meta            JSON, e.g. the map and Segment.serialize(),
+                    padded to ALIGNMENT
+    columns         capacity rows each, see COLUMNS, every column
+                    padded to ALIGNMENT
+
+A row holds the action applied on a tick and what followed it: the
+reward, whether the episode ended and the observation (see state.py)
+and kinematics after it. The first row of an episode has a null
+action and no transition. Otherwise the transition of row i starts
+from the observation in row prev[i], usually of the previous tick.
+When rotating files, each ongoing episode continues from a CARRY row
+repeating its last observation, so every file can be read on its own.
+Rows of ducked bots have FLAG_DUCKED, e.g. to start episodes from
+recorded states, see starts.py.
+
+This module doesn't depend on Source.Python so the learner can import it.
+"""
+
+# =============================================================================
+# >> IMPORTS
+# =============================================================================
+# Python
+import glob
+import json
+import os
+import struct
+
+import numpy as np
+
+# deepsurf
+from .state import decode_batch
+
+# =============================================================================
+# >> ALL DECLARATION
+# =============================================================================
+__all__ = (
+    "HEADER",
+    "MAGIC",
+    "VERSION",
+    "FLAG_FIRST",
+    "FLAG_CARRY",
+    "FLAG_DUCKED",
+    "COLUMNS",
+    "RecordingFile",
+    "Recorder",
+    "Recording",
+    "RecordingSet",
+    "list_recordings",
+)
+
+# =============================================================================
+# >> GLOBAL VARIABLES
+# =============================================================================
+# magic, version, 2 bytes padding, observation size, meta size, capacity, count
+HEADER = struct.Struct("<4sHxxIIQQ")
+COUNT_OFFSET = 24
+MAGIC = b"DSRC"
+VERSION = 1
+ALIGNMENT = 64
+
+# row flags
+FLAG_FIRST = 1
+FLAG_CARRY = 2
+FLAG_DUCKED = 4
+
+# (name, dtype, shape of a row), observations are observation size bytes
+COLUMNS = (
+    ("env", "<u2", ()),
+    ("flags", "u1", ()),
+    ("prev", "<i8", ()),
+    ("actions", "<i2", (5,)),
+    ("rewards", "<f4", ()),
+    ("dones", "u1", ()),
+    # origin, velocity and view angles
+    ("kinematics", "<f4", (9,)),
+    ("observations", "u1", None),
+)
+
+NULL_ACTION = (0, 0, 0, 0, 0)
+
+
+# =============================================================================
+# >> CLASSES
+# =============================================================================
+class RecordingFile:
+    """A recording file mapped into memory, see the module docstring.
+
+    Opens an existing file read-only unless meta is given, in which case
+    a new file is created for capacity rows of observation_size bytes.
+    """
+
+    def __init__(self, path, meta=None, observation_size=0, capacity=0):
+        self.path = path
+        if meta is None:
+            self.open()
+        else:
+            self.create(meta, observation_size, capacity)
+
+    def create(self, meta, observation_size, capacity):
+        meta_bytes = json.dumps(meta).encode("utf-8")
+        self.meta = meta
+        self.observation_size = observation_size
+        self.capacity = capacity
+        self.count = 0
+
+        offsets, size = layout(
+            HEADER.size + len(meta_bytes), observation_size, capacity
+        )
+        self.map = np.memmap(self.path, dtype=np.uint8, mode="w+", shape=(size,))
+        HEADER.pack_into(
+            self.map, 0, MAGIC, VERSION, observation_size, len(meta_bytes), capacity, 0
+        )
+        self.map[HEADER.size : HEADER.size + len(meta_bytes)] = np.frombuffer(
+            meta_bytes, dtype=np.uint8
+        )
+        self.map_columns(offsets)
+
+    def open(self):
+        with open(self.path, "rb") as f:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                raise ValueError(f"'{self.path}' is too short for a recording")
+            magic, version, observation_size, meta_size, capacity, count = (
+                HEADER.unpack(header)
+            )
+            if magic != MAGIC:
+                raise ValueError(f"'{self.path}' is not a deepsurf recording")
+            if version > VERSION:
+                raise ValueError(f"Unsupported recording version {version}")
+            self.meta = json.loads(f.read(meta_size).decode("utf-8"))
+
+        self.observation_size = observation_size
+        self.capacity = capacity
+        self.count = count
+        offsets, size = layout(HEADER.size + meta_size, observation_size, capacity)
+        self.map = np.memmap(self.path, dtype=np.uint8, mode="r", shape=(size,))
+        self.map_columns(offsets)
+
+    def map_columns(self, offsets):
+        self.columns = {}
+        for name, dtype, shape in COLUMNS:
+            if shape is None:
+                shape = (self.observation_size,)
+            offset = offsets[name]
+            dtype = np.dtype(dtype)
+            nbytes = self.capacity * dtype.itemsize * int(np.prod(shape))
+            column = self.map[offset : offset + nbytes].view(dtype)
+            self.columns[name] = column.reshape((self.capacity,) + shape)
+        self.count_view = self.map[COUNT_OFFSET : COUNT_OFFSET + 8].view("<u8")
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, name):
+        """Get the written rows of the column name."""
+        return self.columns[name][: self.count]
+
+    def is_full(self):
+        return self.count >= self.capacity
+
+    def append(
+        self, env_id, flags, prev, action, reward, done, observation, kinematics
+    ):
+        """Write a row, returns its index."""
+        row = self.count
+        columns = self.columns
+        columns["env"][row] = env_id
+        columns["flags"][row] = flags
+        columns["prev"][row] = prev
+        columns["actions"][row] = action
+        columns["rewards"][row] = reward
+        columns["dones"][row] = done
+        columns["kinematics"][row] = kinematics
+        columns["observations"][row] = np.frombuffer(observation, dtype=np.uint8)
+        self.count = row + 1
+        # readers only see rows up to the count
+        self.count_view[0] = self.count
+        return row
+
+    def close(self):
+        if self.map is None:
+            return
+        if self.map.mode != "r":
+            self.map.flush()
+        self.columns = {}
+        self.count_view = None
+        self.map = None
+
+
+class Recorder:
+    """Appends the rows of all bots to recording files in directory,
+    starting a new file once one would exceed max_bytes or has
+    max_episodes episodes, 0 for no episode limit.
+
+    get_meta is called for the meta of every new file.
+    """
+
+    def __init__(self, directory, get_meta, max_bytes=256 << 20, max_episodes=0):
+        self.directory = directory
+        self.get_meta = get_meta
+        self.max_bytes = max_bytes
+        self.max_episodes = max_episodes
+        self.file = None
+        self.files = 0
+        self.rows = 0
+        self.episodes = 0
+        # episodes started in the current file
+        self.file_episodes = 0
+        # env id -> (last row, observation, kinematics, ducked flag)
+        # of ongoing episodes
+        self.ongoing = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def record(
+        self, env_id, action, reward, done, observation, kinematics, first, ducked=False
+    ):
+        """Record a tick of env_id, see the module docstring."""
+        if first:
+            self.ongoing.pop(env_id, None)
+        if self.needs_rotation(len(observation), first):
+            self.rotate(len(observation))
+        if first:
+            self.episodes += 1
+            self.file_episodes += 1
+
+        ongoing = self.ongoing.get(env_id)
+        if ongoing is None:
+            flags, prev = FLAG_FIRST, -1
+            action, reward = NULL_ACTION, 0.0
+        else:
+            flags, prev = 0, ongoing[0]
+        ducked = FLAG_DUCKED if ducked else 0
+
+        row = self.file.append(
+            env_id, flags | ducked, prev, action, reward, done, observation, kinematics
+        )
+        self.rows += 1
+        if done:
+            self.ongoing.pop(env_id, None)
+        else:
+            self.ongoing[env_id] = (row, observation, kinematics, ducked)
+
+    def mark_done(self, env_id):
+        """End the ongoing episode of env_id at its last row."""
+        ongoing = self.ongoing.pop(env_id, None)
+        if ongoing is not None and self.file is not None:
+            self.file.columns["dones"][ongoing[0]] = 1
+
+    def end_episode(self, env_id):
+        """Forget the ongoing episode of env_id without marking it done."""
+        self.ongoing.pop(env_id, None)
+
+    def needs_rotation(self, observation_size, first):
+        file = self.file
+        if file is None or file.is_full():
+            return True
+        if file.observation_size != observation_size:
+            return True
+        return first and 0 < self.max_episodes <= self.file_episodes
+
+    def rotate(self, observation_size):
+        if self.file is not None:
+            self.file.close()
+
+        path = os.path.join(self.directory, f"recording_{self.files:05d}.dsr")
+        while os.path.exists(path):
+            self.files += 1
+            path = os.path.join(self.directory, f"recording_{self.files:05d}.dsr")
+        capacity = max(16, self.max_bytes // row_size(observation_size))
+        self.file = RecordingFile(path, self.get_meta(), observation_size, capacity)
+        self.files += 1
+        self.file_episodes = 0
+
+        # continue ongoing episodes in the new file
+        ongoing = self.ongoing
+        self.ongoing = {}
+        for env_id, (_, observation, kinematics, ducked) in ongoing.items():
+            if len(observation) != observation_size:
+                continue
+            row = self.file.append(
+                env_id,
+                FLAG_CARRY | ducked,
+                -1,
+                NULL_ACTION,
+                0.0,
+                0,
+                observation,
+                kinematics,
+            )
+            self.ongoing[env_id] = (row, observation, kinematics, ducked)
+
+    def split(self):
+        """Start a new file with the next row, e.g. on map change.
+        Ongoing episodes don't continue in it."""
+        self.close()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.ongoing = {}
+
+
+class Recording:
+    """Read access to a recording file without loading it."""
+
+    def __init__(self, path):
+        self.file = RecordingFile(path)
+        self.meta = self.file.meta
+        prev = self.file["prev"]
+        # rows ending a transition
+        self.transition_rows = np.flatnonzero(prev >= 0)
+
+    def __len__(self):
+        """Number of transitions"""
+        return len(self.transition_rows)
+
+    def __getitem__(self, name):
+        """Get the rows of the column name."""
+        return self.file[name]
+
+    def get_transitions(self, rows, decode=True):
+        """Get (states, actions, rewards, dones, next_states) of the
+        transitions ending in rows.
+
+        States are observation vectors (see state.decode_batch) if decode,
+        otherwise the raw observation bytes, one row each.
+        """
+        file = self.file
+        rows = np.asarray(rows)
+        observations = file.columns["observations"]
+        states = observations[file.columns["prev"][rows]]
+        next_states = observations[rows]
+        if decode:
+            states = decode_batch(states.tobytes())
+            next_states = decode_batch(next_states.tobytes())
+        return (
+            states,
+            file.columns["actions"][rows],
+            file.columns["rewards"][rows],
+            file.columns["dones"][rows].astype(bool),
+            next_states,
+        )
+
+    def stream(self, batch_size=256, decode=True):
+        """Iterate over all transitions in order, batch_size at a time."""
+        for start in range(0, len(self.transition_rows), batch_size):
+            yield self.get_transitions(
+                self.transition_rows[start : start + batch_size], decode
+            )
+
+    def sample(self, batch_size, rng=np.random, decode=True):
+        """Get batch_size transitions picked at random."""
+        picks = rng.randint(0, len(self.transition_rows), batch_size)
+        return self.get_transitions(self.transition_rows[picks], decode)
+
+    def close(self):
+        self.file.close()
+
+
+class RecordingSet:
+    """Several recordings read as one, e.g. from list_recordings.
+
+    All recordings must have observations of the same size to sample
+    across them.
+    """
+
+    def __init__(self, paths):
+        self.recordings = [Recording(path) for path in paths]
+        self.recordings = [r for r in self.recordings if len(r) > 0]
+        self.sizes = np.array([len(r) for r in self.recordings], dtype=np.int64)
+
+    def __len__(self):
+        """Number of transitions"""
+        return int(self.sizes.sum())
+
+    def stream(self, batch_size=256, decode=True):
+        """Iterate over the transitions of each recording in turn."""
+        for recording in self.recordings:
+            yield from recording.stream(batch_size, decode)
+
+    def sample(self, batch_size, rng=np.random, decode=True):
+        """Get batch_size transitions picked at random from all recordings."""
+        picks = rng.randint(0, len(self), batch_size)
+        which = np.searchsorted(np.cumsum(self.sizes), picks, side="right")
+        parts = []
+        for i in np.unique(which):
+            recording = self.recordings[i]
+            local = picks[which == i] - (self.sizes[:i].sum())
+            rows = recording.transition_rows[local]
+            parts.append(recording.get_transitions(rows, decode))
+        return tuple(np.concatenate(column) for column in zip(*parts))
+
+    def close(self):
+        for recording in self.recordings:
+            recording.close()
+
+
+# =============================================================================
+# >> FUNCTIONS
+# =============================================================================
+def align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def layout(meta_end, observation_size, capacity):
+    """Get ({column name: offset}, file size) for a recording file."""
+    offsets = {}
+    offset = align(meta_end)
+    for name, dtype, shape in COLUMNS:
+        if shape is None:
+            shape = (observation_size,)
+        offsets[name] = offset
+        offset = align(
+            offset + capacity * np.dtype(dtype).itemsize * int(np.prod(shape))
+        )
+    return offsets, offset
+
+
+def row_size(observation_size):
+    """Get the bytes a row takes in a recording file."""
+    size = 0
+    for _, dtype, shape in COLUMNS:
+        if shape is None:
+            shape = (observation_size,)
+        size += np.dtype(dtype).itemsize * int(np.prod(shape))
+    return size
+
+
+def list_recordings(directory):
+    """Get the paths of the recording files in directory, oldest first."""
+    return sorted(glob.glob(os.path.join(directory, "recording_*.dsr")))
@@ -1,84 +1,143 @@
+"""Module for computing rewards from a bot's snapshot.
+
+All reward components are computed in one pass from the tick's
+snapshot.Snapshot into preallocated arrays indexed like COMPONENTS.
+Components in DIFFERENCE are rewarded by their change since the
+last tick, the others by their value every tick.
+This module doesn't depend on Source.Python.
+"""
+
 # =============================================================================
 # >> IMPORTS
 # =============================================================================
-# Source.Python
-from mathlib import Vector
-
-# deepsurf
-from .zone import Segment
-from .helpers import CustomEntEnum
+# Python
+import math
 
+import numpy as np
 
-class Reward:
-    current = 0
-    previous = 0
-    scale = 1.0
-    bot = None
+# =============================================================================
+# >> ALL DECLARATION
+# =============================================================================
+__all__ = (
+    "COMPONENTS",
+    "DEFAULT_WEIGHTS",
+    "RewardEngine",
+)
 
-    def __init__(self, bot, scale=1.0):
-        self.current = 0
-        self.previous = 0
-        self.bot = bot
-        self.scale = scale
+# =============================================================================
+# >> GLOBAL VARIABLES
+# =============================================================================
+COMPONENTS = (
+    # progress towards the next point, relative to the start
+    "distance",
+    # speed towards the next point
+    "velocity",
+    # view direction towards the next point, -100 to 100
+    "face_target",
+    # view direction along the velocity, -100 to 100
+    "face_velocity",
+    # accumulates while surfing, i.e. on ground too steep to stand on
+    "ramp",
+)
+DIFFERENCE = np.array((True, False, False, False, True))
+# velocity and facing are off by default, they weren't part of the
+# reward the existing models were trained with
+DEFAULT_WEIGHTS = (0.5, 0.0, 0.0, 0.0, 2.0)
+
+ramp_value = 5.0
+# surfaces with a lower normal z can't be stood on
+ramp_normal_z = 0.7
 
-    def tick(self):
-        raise NotImplementedError()
 
-    def get(self):
-        diff = self.current - self.previous
-        self.previous = self.current
-        return diff * self.scale
+# =============================================================================
+# >> CLASSES
+# =============================================================================
+class RewardEngine:
+    """Reward components of a bot.
+
+    components holds the weighted reward of each component on the
+    last tick, totals their sums over the current episode and
+    episode_totals over the last finished one.
+    """
+
+    def __init__(self, weights=DEFAULT_WEIGHTS):
+        size = len(COMPONENTS)
+        self.weights = np.array(weights, dtype=np.float64)
+        self.difference = DIFFERENCE.astype(np.float64)
+        self.terms = np.zeros(size)
+        self.previous = np.zeros(size)
+        self.components = np.zeros(size)
+        self.totals = np.zeros(size)
+        self.episode_totals = np.zeros(size)
+
+    def set_weight(self, name, weight):
+        """Set the weight of component name, raises ValueError
+        for unknown components."""
+        if name not in COMPONENTS:
+            raise ValueError(
+                f"Unknown reward component '{name}', use one of {COMPONENTS}"
+            )
+        self.weights[COMPONENTS.index(name)] = weight
+
+    def tick(self, snapshot, start):
+        """Compute the components for snapshot on a segment starting
+        at start, get the total reward of the tick."""
+        origin = snapshot.origin
+        velocity = snapshot.velocity
+        forward = snapshot.forward
+        target = snapshot.progress.next_point
+        terms = self.terms
+
+        # direction to the next point
+        dx = target.x - origin.x
+        dy = target.y - origin.y
+        dz = target.z - origin.z
+        distance = math.sqrt(dx * dx + dy * dy + dz * dz)
+        if distance > 0.0:
+            dx /= distance
+            dy /= distance
+            dz /= distance
+
+        sx = target.x - start.x
+        sy = target.y - start.y
+        sz = target.z - start.z
+        terms[0] = math.sqrt(sx * sx + sy * sy + sz * sz) - distance
+
+        terms[1] = dx * velocity.x + dy * velocity.y + dz * velocity.z
+        terms[2] = (dx * forward.x + dy * forward.y + dz * forward.z) * 100.0
+
+        speed = math.sqrt(velocity.x**2 + velocity.y**2 + velocity.z**2)
+        if speed > 0.0:
+            terms[3] = (
+                (
+                    velocity.x * forward.x
+                    + velocity.y * forward.y
+                    + velocity.z * forward.z
+                )
+                / speed
+                * 100.0
+            )
+        else:
+            terms[3] = 0.0
+
+        if snapshot.ground_hit and snapshot.ground_normal.z < ramp_normal_z:
+            terms[4] += ramp_value
+
+        # terms - previous for differences, terms for the others
+        components = self.components
+        np.multiply(self.previous, self.difference, out=components)
+        np.subtract(terms, components, out=components)
+        components *= self.weights
+        self.previous[:] = terms
+        self.totals += components
+        return float(components.sum())
+
+    def end_episode(self):
+        """Keep the totals of the finished episode in episode_totals."""
+        self.episode_totals[:] = self.totals
 
     def reset(self):
-        self.current = 0
-        self.previous = 0
-
-
-class DistanceReward(Reward):
-    def tick(self):
-        origin = self.bot.origin
-        start = Segment.instance().start_zone.point
-        target = Segment.instance().get_remaining_points(origin)[0]
-        segment_distance = Vector.get_distance(start, target)
-        current_distance = Vector.get_distance(origin, target)
-        self.current = segment_distance - current_distance
-
-
-class VelocityReward(Reward):
-    def tick(self):
-        origin = self.bot.origin
-        target = Segment.instance().get_remaining_points(origin)[0]
-        want_direction = (target - origin).normalized()
-        velocity = self.bot.velocity
-        return want_direction.dot(velocity)
-
-
-class FaceTargetReward(Reward):
-    def tick(self):
-        origin = self.bot.origin
-        target = Segment.instance().get_remaining_points(origin)[0]
-        want_direction = (target - origin).normalized()
-        view_direction = want_direction
-        self.bot.get_view_angle().get_angle_vectors(forward=view_direction)
-        return want_direction.dot(view_direction) * 100.0
-
-
-class FaceVelocityReward(Reward):
-    def tick(self):
-        velocity = self.bot.velocity.normalized()
-        view_direction = Vector(1, 0, 0)
-        self.bot.get_view_angle().get_angle_vectors(forward=view_direction)
-        return velocity.dot(view_direction) * 100.0
-
-
-class RampReward(Reward):
-    def tick(self):
-        # TODO: use bot mins/maxs instead of simple ray and reduce z distance
-        destination = self.bot.origin + Vector(0, 0, -32.0)
-        entity_enum = CustomEntEnum(self.bot.origin, destination, (self.bot,))
-
-        # Check for normal geometry
-        entity_enum.normal_trace()
-
-        if entity_enum.did_hit and entity_enum.normal.z < 0.7:
-            self.current += 5.0
+        self.terms[:] = 0.0
+        self.previous[:] = 0.0
+        self.components[:] = 0.0
+        self.totals[:] = 0.0
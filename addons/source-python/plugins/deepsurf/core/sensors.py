@@ -0,0 +1,408 @@
+"""Module for ray sensor layouts and sensing.
+
+This module doesn't depend on Source.Python,
+rays are traced through a tracing.Tracer.
+"""
+
+# =============================================================================
+# >> IMPORTS
+# =============================================================================
+# Python
+import math
+import time
+from functools import lru_cache
+
+import numpy as np
+
+# =============================================================================
+# >> GLOBAL VARIABLES
+# =============================================================================
+# layout names by the id sent in observation headers
+LAYOUTS = ("grid", "fibonacci", "cone", "ring")
+golden_angle = math.pi * (3.0 - math.sqrt(5.0))
+
+
+# =============================================================================
+# >> CLASSES
+# =============================================================================
+class RaySensor:
+    """Casts a layout of rays around the bot every tick.
+
+    Results are written to the preallocated distances, teleports
+    and hits (end point or None) arrays.
+
+    With refresh_count set only that many rays are traced per tick,
+    the ones with the highest forward weighted age first. The other
+    rays keep their last result, with the distance adjusted for the
+    bot's displacement along the ray. ages holds the number of ticks
+    since each ray was traced.
+
+    ray_limit caps the rays traced per tick the same way, and
+    skip_teleports stops sensing teleports, see budget.py.
+    """
+
+    def __init__(self, directions, tracer=None, distance=10000.0, height=48.0):
+        # directions in bot space, rotated by the bot's yaw every tick
+        self.directions = directions
+        self.tracer = tracer
+        # optional tracing.TraceCache wrapping tracer
+        self.cache = None
+        # optional tracing.TeleportIndex, tracer should then skip teleports
+        self.teleport_index = None
+        self.distance = distance
+        # shoot rays from above bot origin so they can "see" more of the ground / ramps, etc.
+        self.height = height
+        # reuse the last results if the bot moved and turned less than this
+        self.reuse_distance = 0.0
+        self.reuse_angle = 1.0
+        self.last_origin = None
+        self.last_yaw = 0.0
+
+        num_rays = len(directions)
+        self.world_directions = np.empty_like(directions)
+        self.ends = np.empty_like(directions)
+        self.distances = np.full(num_rays, distance, dtype=np.float32)
+        self.teleports = np.zeros(num_rays, dtype=bool)
+        self.hits = [None] * num_rays
+        self.did_hit = np.zeros(num_rays, dtype=bool)
+        self.ages = np.zeros(num_rays, dtype=np.int32)
+        self.traced = 0
+
+        # rays traced per tick, 0 for all
+        self.refresh_count = 0
+        # at most this many rays traced per tick, 0 for no limit
+        self.ray_limit = 0
+        self.skip_teleports = False
+        self.set_forward_bias(0.0)
+        self.reset_stats()
+
+    def __len__(self):
+        return len(self.directions)
+
+    def set_forward_bias(self, bias):
+        """Refresh forward rays up to 1 + bias times as often as backward ones."""
+        self.forward_bias = bias
+        self.weights = 1.0 + bias * np.maximum(self.directions[:, 0], 0.0)
+
+    def reset(self):
+        """Trace every ray on the next sense, e.g. after teleporting."""
+        self.last_origin = None
+        self.ages[:] = 0
+
+    def reset_stats(self):
+        self.sense_count = 0
+        self.traced_count = 0
+        self.age_total = 0.0
+        self.sense_time = 0.0
+
+    def get_stats(self):
+        """Get average (rays traced, ray age in ticks, ms) per sense."""
+        if self.sense_count == 0:
+            return 0.0, 0.0, 0.0
+        return (
+            self.traced_count / self.sense_count,
+            self.age_total / self.sense_count,
+            self.sense_time * 1000.0 / self.sense_count,
+        )
+
+    def can_reuse(self, origin, yaw):
+        """Can the results of the last sense be reused at origin and yaw?"""
+        if self.last_origin is None or self.reuse_distance <= 0.0:
+            return False
+
+        dx = origin[0] - self.last_origin[0]
+        dy = origin[1] - self.last_origin[1]
+        dz = origin[2] - self.last_origin[2]
+        if dx * dx + dy * dy + dz * dz >= self.reuse_distance * self.reuse_distance:
+            return False
+
+        yaw_change = abs((yaw - self.last_yaw + 180.0) % 360.0 - 180.0)
+        return yaw_change < self.reuse_angle
+
+    def sense(self, origin, yaw):
+        """Cast rays from origin (x, y, z) for a bot facing yaw degrees.
+
+        Returns False if the previous results were reused instead.
+        """
+        start_time = time.perf_counter()
+        reused = not self._sense(origin, yaw)
+        self.sense_count += 1
+        self.traced_count += self.traced
+        self.age_total += self.ages.mean()
+        self.sense_time += time.perf_counter() - start_time
+        return not reused
+
+    def _sense(self, origin, yaw):
+        if self.can_reuse(origin, yaw):
+            self.traced = 0
+            self.ages += 1
+            return False
+
+        rotate_directions(self.directions, yaw, out=self.world_directions)
+        np.multiply(self.world_directions, self.distance, out=self.ends)
+        self.ends += (origin[0], origin[1], origin[2] + self.height)
+
+        num_rays = len(self.directions)
+        count = self.get_refresh_count()
+        if self.last_origin is None or count >= num_rays:
+            indices = np.arange(num_rays)
+        else:
+            indices = self.stagger(origin, count)
+
+        self.ages += 1
+        self.ages[indices] = 0
+        self.trace(origin, indices)
+
+        index = self.teleport_index
+        if (
+            index is not None
+            and not self.skip_teleports
+            and (index.dirty or len(index) > 0)
+        ):
+            self.sense_teleports(origin, indices)
+
+        self.traced = len(indices)
+        self.last_origin = origin
+        self.last_yaw = yaw
+        return True
+
+    def get_refresh_count(self):
+        """Get the number of rays to trace per tick."""
+        count = len(self.directions)
+        if 0 < self.refresh_count < count:
+            count = self.refresh_count
+        if 0 < self.ray_limit < count:
+            count = self.ray_limit
+        return count
+
+    def stagger(self, origin, count):
+        """Adjust the last results for the bot's displacement and
+        get the indices of the count rays to trace this tick."""
+        displacement = np.subtract(origin, self.last_origin)
+        # moving along a ray shortens it by the projected displacement
+        shortened = np.dot(self.world_directions, displacement)
+        np.subtract(
+            self.distances,
+            shortened * self.did_hit,
+            out=self.distances,
+            casting="unsafe",
+        )
+        np.clip(self.distances, 0.0, self.distance, out=self.distances)
+
+        scores = self.weights * (self.ages + 1)
+        return np.argpartition(-scores, count - 1)[:count]
+
+    def trace(self, origin, indices):
+        cache = self.cache
+        distances = self.distances
+        teleports = self.teleports
+        hits = self.hits
+        did_hit = self.did_hit
+        ends = self.ends[indices].tolist()
+        if cache is not None:
+            directions = self.world_directions[indices].tolist()
+
+        for n, i in enumerate(indices.tolist()):
+            if cache is not None:
+                hit, is_teleport = cache.trace(origin, ends[n], directions[n])
+            else:
+                hit, is_teleport = self.tracer.trace(origin, ends[n])
+
+            hits[i] = hit
+            if hit is None:
+                did_hit[i] = False
+                distances[i] = self.distance
+                teleports[i] = False
+            else:
+                did_hit[i] = True
+                distances[i] = math.sqrt(
+                    (hit[0] - origin[0]) ** 2
+                    + (hit[1] - origin[1]) ** 2
+                    + (hit[2] - origin[2]) ** 2
+                )
+                teleports[i] = is_teleport
+
+    def sense_teleports(self, origin, indices):
+        """Test rays against the teleport index at once and
+        clip the ones entering a teleport before the world."""
+        ends = self.ends[indices]
+        ray_lengths = np.linalg.norm(ends - origin, axis=1)
+        limits = np.minimum(self.distances[indices] / ray_lengths, 1.0)
+        enter = self.teleport_index.intersect(origin, ends, limits)
+
+        entities = self.teleport_index.entities
+        for n in np.flatnonzero(np.isfinite(enter).any(axis=1)).tolist():
+            i = indices[n]
+            end = tuple(ends[n])
+            candidates = enter[n]
+            for j in np.argsort(candidates).tolist():
+                if not np.isfinite(candidates[j]):
+                    break
+
+                hit = self.tracer.clip(origin, end, entities[j])
+                if hit is None:
+                    continue
+
+                distance = math.sqrt(
+                    (hit[0] - origin[0]) ** 2
+                    + (hit[1] - origin[1]) ** 2
+                    + (hit[2] - origin[2]) ** 2
+                )
+                if distance < self.distances[i]:
+                    self.distances[i] = distance
+                    self.teleports[i] = True
+                    self.did_hit[i] = True
+                    self.hits[i] = hit
+                break
+
+    def set_cache(self, cache):
+        """Use a tracing.TraceCache, or None to trace every ray."""
+        self.cache = cache
+
+    def set_tracer(self, tracer):
+        self.tracer = tracer
+        if self.cache is not None:
+            self.cache.tracer = tracer
+        self.reset()
+
+
+# =============================================================================
+# >> FUNCTIONS
+# =============================================================================
+def sphere_directions(resolution=10):
+    """Get unit directions on a latitude / longitude grid as a (N, 3) array.
+
+    The actual number of directions will be
+    x^2 - x + 2 for resolution x, e.g. 10 -> 92
+    because we only need 1 for both directly up and down.
+    """
+    directions = []
+    increment = 360.0 / resolution
+
+    for i in range(0, resolution + 1):  # theta in range [0.0 : 180.0]
+        theta = math.radians(i * increment * 0.5)  # theta only changes by 180
+        for j in range(0, resolution):  # phi in range [0.0 : 360.0 - increment]
+            phi = math.radians(j * increment)
+            directions.append(
+                (
+                    math.sin(theta) * math.cos(phi),
+                    math.sin(theta) * math.sin(phi),
+                    math.cos(theta),
+                )
+            )
+
+            # only need one direction at north and south poles
+            if i == 0 or i == resolution:
+                break
+
+    return np.array(directions, dtype=np.float64)
+
+
+def yaw_rotation(yaw):
+    """Get the matrix rotating by yaw degrees around the z axis."""
+    yaw = math.radians(yaw)
+    cos = math.cos(yaw)
+    sin = math.sin(yaw)
+    return np.array(((cos, -sin, 0.0), (sin, cos, 0.0), (0.0, 0.0, 1.0)))
+
+
+def rotate_directions(directions, yaw, out=None):
+    """Rotate (N, 3) directions from bot space to world space.
+
+    Pass a preallocated (N, 3) array as out to avoid allocating.
+    """
+    return np.dot(directions, yaw_rotation(yaw).T, out=out)
+
+
+def grid_directions(budget, fov=360.0):
+    """Latitude / longitude grid with at most budget directions."""
+    if budget < 4:
+        raise ValueError("The grid layout needs a ray budget of at least 4")
+    resolution = 2
+    while (resolution + 1) ** 2 - (resolution + 1) + 2 <= budget:
+        resolution += 1
+    return sphere_directions(resolution)
+
+
+def fibonacci_directions(budget, fov=360.0):
+    """Directions evenly spread over the sphere."""
+    i = np.arange(budget) + 0.5
+    z = 1.0 - 2.0 * i / budget
+    radius = np.sqrt(1.0 - z * z)
+    phi = i * golden_angle
+    return np.stack((radius * np.cos(phi), radius * np.sin(phi), z), axis=1)
+
+
+def cone_directions(budget, fov=180.0):
+    """Directions within fov degrees of forward, denser towards forward."""
+    i = np.arange(budget)
+    # linear in angle from forward, so density falls off with the angle
+    theta = math.radians(fov) * 0.5 * i / max(1, budget - 1)
+    phi = i * golden_angle
+    return np.stack(
+        (np.cos(theta), np.sin(theta) * np.cos(phi), np.sin(theta) * np.sin(phi)),
+        axis=1,
+    )
+
+
+def ring_directions(budget, fov=180.0):
+    """Horizontal ring plus a fan of rays towards the ground in front.
+
+    Half of the budget goes to the ring, the rest to one ray straight
+    down and 3 rows of rays below the horizon spread over fov degrees.
+    """
+    num_ring = max(1, budget // 2)
+    yaw = np.arange(num_ring) * (2.0 * math.pi / num_ring)
+    directions = [np.stack((np.cos(yaw), np.sin(yaw), np.zeros(num_ring)), axis=1)]
+
+    num_fan = budget - num_ring
+    if num_fan > 0:
+        directions.append(np.array(((0.0, 0.0, -1.0),)))
+        num_fan -= 1
+
+    rows = (20.0, 45.0, 70.0)
+    for row, pitch in enumerate(rows):
+        count = num_fan // len(rows) + (1 if row < num_fan % len(rows) else 0)
+        if count == 0:
+            continue
+        half_fov = math.radians(fov) * 0.5
+        yaw = np.linspace(-half_fov, half_fov, count) if count > 1 else np.zeros(1)
+        pitch = math.radians(pitch)
+        directions.append(
+            np.stack(
+                (
+                    np.cos(yaw) * math.cos(pitch),
+                    np.sin(yaw) * math.cos(pitch),
+                    np.full(count, -math.sin(pitch)),
+                ),
+                axis=1,
+            )
+        )
+
+    return np.concatenate(directions)
+
+
+@lru_cache(maxsize=None)
+def get_layout(name="grid", budget=92, fov=180.0):
+    """Get the cached bot space directions of a sensor layout.
+
+    budget is the maximum number of rays, fov is used by the
+    cone and ring layouts. The returned array is read-only.
+    """
+    if budget < 1:
+        raise ValueError(f"Invalid ray budget {budget}")
+    if not 0.0 < fov <= 360.0:
+        raise ValueError(f"Invalid field of view {fov}")
+
+    generators = {
+        "grid": grid_directions,
+        "fibonacci": fibonacci_directions,
+        "cone": cone_directions,
+        "ring": ring_directions,
+    }
+    if name not in generators:
+        raise ValueError(f"Unknown sensor layout '{name}', use one of {LAYOUTS}")
+
+    directions = np.ascontiguousarray(generators[name](budget, fov), dtype=np.float64)
+    directions.flags.writeable = False
+    return directions
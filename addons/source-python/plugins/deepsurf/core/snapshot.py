@@ -0,0 +1,122 @@
+"""Module for per-tick snapshots of bot kinematics."""
+
+# =============================================================================
+# >> IMPORTS
+# =============================================================================
+# Source.Python
+from mathlib import Vector, QAngle
+from players.constants import PlayerStates
+
+# deepsurf
+from .helpers import CustomEntEnum
+from .zone import Progress, Segment
+
+# =============================================================================
+# >> GLOBAL VARIABLES
+# =============================================================================
+# how far below the origin to look for ground
+ground_distance = 32.0
+
+
+# =============================================================================
+# >> CLASSES
+# =============================================================================
+class Snapshot:
+    """Kinematic state of a bot read from the engine once per tick.
+
+    Shared by the state builder, reward functions and HUD instead of
+    each of them reading the bot's properties again.
+    The vectors are reused, don't modify them in place.
+    """
+
+    __slots__ = (
+        "origin",
+        "velocity",
+        "view_angle",
+        "forward",
+        "right",
+        "up",
+        "body_forward",
+        "body_right",
+        "ground_hit",
+        "ground_normal",
+        "ducked",
+        "progress",
+    )
+
+    def __init__(self, progress=None):
+        self.origin = Vector()
+        self.velocity = Vector()
+        self.view_angle = QAngle()
+        # view direction
+        self.forward = Vector()
+        self.right = Vector()
+        self.up = Vector()
+        # yaw only, bot space for observations
+        self.body_forward = Vector()
+        self.body_right = Vector()
+        self.ground_hit = False
+        self.ground_normal = Vector()
+        self.ducked = False
+        self.progress = progress if progress is not None else Progress()
+
+    def capture(self, player, filter=None, segment=None):
+        """Read the kinematic state of player and update route progress
+        along segment, Segment.instance() by default.
+
+        filter is the entities the ground trace ignores, player by default.
+        """
+        self.origin = player.origin
+        self.velocity = player.get_property_vector("m_vecVelocity")
+        self.view_angle = player.view_angle
+        self.ducked = bool(player.get_property_int("m_fFlags") & PlayerStates.DUCKING)
+
+        self.view_angle.get_angle_vectors(self.forward, self.right, self.up)
+        QAngle(0, self.view_angle.y, 0).get_angle_vectors(
+            self.body_forward, self.body_right
+        )
+
+        # TODO: use bot mins/maxs instead of simple ray and reduce z distance
+        destination = self.origin + Vector(0, 0, -ground_distance)
+        entity_enum = CustomEntEnum(
+            self.origin, destination, (player,) if filter is None else filter
+        )
+        entity_enum.normal_trace()
+        self.ground_hit = entity_enum.did_hit
+        self.ground_normal = entity_enum.normal
+
+        if segment is None:
+            segment = Segment.instance()
+        segment.update_progress(self.progress, self.origin)
+        return self
+
+
+class ReadCounter:
+    """Wraps a Player and counts reads of its engine properties."""
+
+    counted = frozenset(
+        (
+            "origin",
+            "velocity",
+            "view_angle",
+            "get_view_angle",
+            "rotation",
+            "angles",
+            "eye_location",
+            "get_property_vector",
+            "get_property_float",
+            "get_property_int",
+        )
+    )
+
+    def __init__(self, player):
+        object.__setattr__(self, "player", player)
+        object.__setattr__(self, "reads", 0)
+
+    def __getattr__(self, name):
+        if name in ReadCounter.counted:
+            object.__setattr__(self, "reads", self.reads + 1)
+        return getattr(self.player, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.player, name, value)
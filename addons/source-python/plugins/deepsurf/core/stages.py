@@ -0,0 +1,111 @@
+"""Module for picking the map stage of each episode.
+
+A stage's score is the moving average of how far along its route
+episodes got, 1 for reaching the end. The modes pick:
+    uniform     any stage with equal probability
+    weak        stages with lower scores more often, each stage at
+                least min_weight as often as an unplayed one
+    chain       the next stage in order after reaching the end of a
+                stage, the same stage again otherwise
+Weights set by the learner replace the scores' in weak mode.
+This module doesn't depend on Source.Python so the learner can import it.
+"""
+
+# =============================================================================
+# >> IMPORTS
+# =============================================================================
+# Python
+import numpy as np
+
+# =============================================================================
+# >> ALL DECLARATION
+# =============================================================================
+__all__ = (
+    "MODES",
+    "StageSampler",
+)
+
+# =============================================================================
+# >> GLOBAL VARIABLES
+# =============================================================================
+MODES = ("uniform", "weak", "chain")
+
+
+# =============================================================================
+# >> CLASSES
+# =============================================================================
+class StageSampler:
+    """Picks stages of a map for episodes, see the module docstring."""
+
+    def __init__(self, stages, mode="weak", smoothing=0.05, min_weight=0.1, seed=None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown stage mode '{mode}', use one of {MODES}")
+        if len(stages) == 0:
+            raise ValueError("No stages to pick from")
+        self.stages = tuple(sorted(stages))
+        self.mode = mode
+        # weight of the newest episode in the scores
+        self.smoothing = smoothing
+        self.min_weight = min_weight
+        self.rng = np.random.RandomState(seed)
+        size = len(self.stages)
+        self.scores = np.zeros(size)
+        self.episodes = np.zeros(size, dtype=np.int64)
+        self.completed = np.zeros(size, dtype=np.int64)
+        # weights from the learner, see set_weights
+        self.weights = None
+        self.probabilities = np.full(size, 1.0 / size)
+        self.update_probabilities()
+
+    def __len__(self):
+        return len(self.stages)
+
+    def pick(self, last=None, completed=False):
+        """Get the stage of the next episode, after an episode of
+        stage last that did or didn't reach its end."""
+        if self.mode == "chain":
+            if last not in self.stages:
+                return self.stages[0]
+            index = self.stages.index(last)
+            if completed:
+                index = (index + 1) % len(self.stages)
+            return self.stages[index]
+
+        index = self.rng.choice(len(self.stages), p=self.probabilities)
+        return self.stages[index]
+
+    def add_result(self, stage, progress, completed):
+        """Add an episode of stage that got progress of the way
+        along its route, 0 to 1."""
+        if stage not in self.stages:
+            return
+        index = self.stages.index(stage)
+        score = 1.0 if completed else min(max(progress, 0.0), 1.0)
+        if self.episodes[index] == 0:
+            self.scores[index] = score
+        else:
+            self.scores[index] += self.smoothing * (score - self.scores[index])
+        self.episodes[index] += 1
+        self.completed[index] += completed
+        self.update_probabilities()
+
+    def set_weights(self, weights):
+        """Pick stages in proportion to weights in weak mode, in the
+        order of stages, None to go by the scores again."""
+        if weights is not None:
+            weights = np.array(weights, dtype=np.float64)
+            if weights.shape != (len(self.stages),) or (weights < 0.0).any():
+                raise ValueError(f"Expected {len(self.stages)} non-negative weights")
+            if weights.sum() <= 0.0:
+                raise ValueError("Stage weights sum to 0")
+        self.weights = weights
+        self.update_probabilities()
+
+    def update_probabilities(self):
+        if self.mode == "uniform":
+            weights = np.ones(len(self.stages))
+        elif self.weights is not None:
+            weights = self.weights
+        else:
+            weights = np.maximum(1.0 - self.scores, self.min_weight)
+        self.probabilities = weights / weights.sum()
@@ -0,0 +1,139 @@
+"""Module for the states bots start episodes from.
+
+A start sampler hands out kinematics rows laid out as in recordings
+(origin, velocity, view angles) and whether the bot is ducked. Rows
+are drawn stage_size at a time into preallocated arrays, so a reset
+only reads a staged row.
+This module doesn't depend on Source.Python.
+"""
+
+# =============================================================================
+# >> IMPORTS
+# =============================================================================
+# Python
+import numpy as np
+
+# deepsurf
+from .recording import FLAG_DUCKED, Recording
+
+# =============================================================================
+# >> ALL DECLARATION
+# =============================================================================
+__all__ = (
+    "StartSampler",
+    "RouteStarts",
+    "RecordingStarts",
+)
+
+# =============================================================================
+# >> GLOBAL VARIABLES
+# =============================================================================
+NUM_KINEMATICS = 9
+
+
+# =============================================================================
+# >> CLASSES
+# =============================================================================
+class StartSampler:
+    """Base of the start samplers, override stage."""
+
+    def __init__(self, stage_size=256, seed=None):
+        self.rng = np.random.RandomState(seed)
+        self.kinematics = np.zeros((stage_size, NUM_KINEMATICS))
+        self.ducked = np.zeros(stage_size, dtype=bool)
+        self.index = stage_size
+        self.stages = 0
+
+    def next(self):
+        """Get the (kinematics, ducked) of the next start, the
+        kinematics are a view valid until the next stage."""
+        if self.index >= len(self.kinematics):
+            self.stage(self.kinematics, self.ducked)
+            self.index = 0
+            self.stages += 1
+        index = self.index
+        self.index = index + 1
+        return self.kinematics[index], bool(self.ducked[index])
+
+    def stage(self, kinematics, ducked):
+        """Fill the arrays with the next starts."""
+        raise NotImplementedError()
+
+
+class RouteStarts(StartSampler):
+    """Starts at a random point of a Segment route but the end,
+    facing the next point and moving towards it at speed."""
+
+    def __init__(self, points, speed=0.0, stage_size=256, seed=None):
+        super().__init__(stage_size, seed)
+        points = np.array(points, dtype=np.float64).reshape(-1, 3)
+        if len(points) < 2:
+            raise ValueError("A route needs at least 2 points")
+
+        directions = points[1:] - points[:-1]
+        lengths = np.linalg.norm(directions, axis=1)
+        directions /= np.maximum(lengths, 1e-6)[:, None]
+        # (origin, velocity, angles) of each point but the end
+        self.starts = np.zeros((len(points) - 1, NUM_KINEMATICS))
+        self.starts[:, 0:3] = points[:-1]
+        self.starts[:, 3:6] = directions * speed
+        self.starts[:, 7] = np.degrees(np.arctan2(directions[:, 1], directions[:, 0]))
+
+    def stage(self, kinematics, ducked):
+        picks = self.rng.randint(0, len(self.starts), len(kinematics))
+        np.take(self.starts, picks, axis=0, out=kinematics)
+        ducked[:] = False
+
+
+class RecordingStarts(StartSampler):
+    """Starts at states sampled from recordings, see recording.py.
+
+    Only recordings of map_name are used, None for any map, and of
+    stage if given, see Bots.get_recording_meta. Episode ends aren't
+    sampled, and at most max_states states are kept.
+    """
+
+    def __init__(
+        self,
+        paths,
+        map_name=None,
+        stage=None,
+        max_states=1 << 20,
+        stage_size=256,
+        seed=None,
+    ):
+        super().__init__(stage_size, seed)
+        kinematics = []
+        ducked = []
+        for path in paths:
+            recording = Recording(path)
+            try:
+                if map_name is not None and recording.meta.get("map") != map_name:
+                    continue
+                if stage is not None and recording.meta.get("stage") != stage:
+                    continue
+                rows = np.flatnonzero(recording["dones"] == 0)
+                kinematics.append(recording["kinematics"][rows].astype(np.float64))
+                ducked.append(recording["flags"][rows] & FLAG_DUCKED != 0)
+            finally:
+                recording.close()
+
+        if not kinematics or sum(len(k) for k in kinematics) == 0:
+            if stage is not None:
+                raise ValueError(f"No recorded states of stage {stage} to start from")
+            raise ValueError("No recorded states to start from")
+
+        self.states = np.concatenate(kinematics)
+        self.states_ducked = np.concatenate(ducked)
+        if len(self.states) > max_states:
+            keep = self.rng.choice(len(self.states), max_states, replace=False)
+            self.states = self.states[keep]
+            self.states_ducked = self.states_ducked[keep]
+
+    def __len__(self):
+        return len(self.states)
+
+    def stage(self, kinematics, ducked):
+        picks = self.rng.randint(0, len(self.states), len(kinematics))
+        np.take(self.states, picks, axis=0, out=kinematics)
+        np.take(self.states_ducked, picks, out=ducked)
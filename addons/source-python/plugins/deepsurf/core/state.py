@@ -0,0 +1,266 @@
+"""Module for the binary observation format sent to the learner.
+
+Layout (little-endian):
+    header          8 bytes, see HEADER, layout is an index into
+                    sensors.LAYOUTS, quality the budget.QUALITY_LEVELS
+                    level the observation was sensed at
+    distances       float32[num_rays]
+    velocity        float32[3], bot space (forward, right, up)
+    waypoints       float32[6], next 2 points in bot space
+    teleport mask   uint8[ceil(num_rays / 8)], bit-packed, MSB first
+    ray ages        uint8[num_rays], ticks since each ray was traced,
+                    saturating at 255, only if flags has FLAG_AGES
+
+The float block starts at an aligned offset, so the learner can use
+`numpy.frombuffer` on the received bytes without copying.
+Observations of the same size can be concatenated and decoded
+into a matrix at once with `decode_batch`.
+This module doesn't depend on Source.Python so the learner can import it.
+"""
+
+# =============================================================================
+# >> IMPORTS
+# =============================================================================
+# Python
+import struct
+from collections import namedtuple
+
+import numpy as np
+
+# =============================================================================
+# >> ALL DECLARATION
+# =============================================================================
+__all__ = (
+    "HEADER",
+    "MAGIC",
+    "VERSION",
+    "FLAG_AGES",
+    "Observation",
+    "DecodedState",
+    "decode_state",
+    "state_to_vector",
+    "observation_size",
+    "decode_batch",
+)
+
+# =============================================================================
+# >> GLOBAL VARIABLES
+# =============================================================================
+# magic, version, flags, num_rays, layout, quality
+# version 1 had no layout, its padding reads as layout 0 (grid),
+# version 2 had no quality, its padding reads as quality 0 (full)
+HEADER = struct.Struct("<2sBBHBB")
+MAGIC = b"DS"
+VERSION = 3
+FLAG_AGES = 1
+
+NUM_VELOCITY = 3
+NUM_WAYPOINTS = 6
+
+DecodedState = namedtuple(
+    "DecodedState",
+    (
+        "version",
+        "flags",
+        "layout",
+        "distances",
+        "velocity",
+        "waypoints",
+        "teleports",
+        "ages",
+        "quality",
+    ),
+)
+
+
+# =============================================================================
+# >> CLASSES
+# =============================================================================
+class Observation:
+    """Preallocated observation buffer for a fixed number of rays.
+
+    Fill the array views and call `encode` to get the bytes to send.
+    """
+
+    def __init__(self, num_rays, layout=0, ages=False):
+        self.num_rays = num_rays
+        self.layout = layout
+        self.flags = FLAG_AGES if ages else 0
+        self.num_floats = num_rays + NUM_VELOCITY + NUM_WAYPOINTS
+        self.mask_size = (num_rays + 7) // 8
+        self.ages_size = num_rays if ages else 0
+        self.size = HEADER.size + self.num_floats * 4 + self.mask_size + self.ages_size
+        # length of the state_to_vector vector
+        self.vector_size = num_rays + self.num_floats + self.ages_size
+        self.buffer = bytearray(self.size)
+        HEADER.pack_into(
+            self.buffer, 0, MAGIC, VERSION, self.flags, num_rays, layout, 0
+        )
+
+        floats = np.frombuffer(
+            self.buffer, dtype="<f4", count=self.num_floats, offset=HEADER.size
+        )
+        self.floats = floats
+        self.distances = floats[:num_rays]
+        self.velocity = floats[num_rays : num_rays + NUM_VELOCITY]
+        self.waypoints = floats[num_rays + NUM_VELOCITY :]
+        self.mask = np.frombuffer(
+            self.buffer,
+            dtype=np.uint8,
+            count=self.mask_size,
+            offset=HEADER.size + self.num_floats * 4,
+        )
+        self.teleports = np.zeros(num_rays, dtype=bool)
+        self.ages = np.frombuffer(
+            self.buffer,
+            dtype=np.uint8,
+            count=self.ages_size,
+            offset=self.size - self.ages_size,
+        )
+
+    def set_ages(self, ages):
+        """Copy ray ages in ticks, if the ages channel is enabled."""
+        if self.ages_size > 0:
+            np.minimum(ages, 255, out=self.ages, casting="unsafe")
+
+    def set_quality(self, level):
+        """Set the quality level the next observations are sensed at."""
+        self.buffer[HEADER.size - 1] = level
+
+    def to_vector(self, out):
+        """Write the observation into the float32 array out, in the
+        same order as state_to_vector but without encoding it."""
+        num_rays = self.num_rays
+        out[:num_rays] = self.distances
+        out[num_rays : num_rays * 2] = self.teleports
+        out[num_rays * 2 : num_rays + self.num_floats] = self.floats[num_rays:]
+        if self.ages_size > 0:
+            out[num_rays + self.num_floats :] = self.ages
+
+    def encode(self):
+        """Get the observation as bytes."""
+        self.mask[:] = np.packbits(self.teleports)
+        return bytes(self.buffer)
+
+
+# =============================================================================
+# >> FUNCTIONS
+# =============================================================================
+def decode_state(data):
+    """Decode observation bytes into numpy arrays.
+
+    The float arrays are read-only views into data.
+    """
+    magic, version, flags, num_rays, layout, quality = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError(f"Not a deepsurf observation (magic {magic!r})")
+    if version > VERSION:
+        raise ValueError(f"Unsupported observation version {version}")
+
+    num_floats = num_rays + NUM_VELOCITY + NUM_WAYPOINTS
+    floats = np.frombuffer(data, dtype="<f4", count=num_floats, offset=HEADER.size)
+    mask = np.frombuffer(
+        data,
+        dtype=np.uint8,
+        count=(num_rays + 7) // 8,
+        offset=HEADER.size + num_floats * 4,
+    )
+    teleports = np.unpackbits(mask)[:num_rays].astype(bool)
+
+    ages = None
+    if flags & FLAG_AGES:
+        ages = np.frombuffer(
+            data,
+            dtype=np.uint8,
+            count=num_rays,
+            offset=HEADER.size + num_floats * 4 + mask.size,
+        )
+
+    return DecodedState(
+        version,
+        flags,
+        layout,
+        floats[:num_rays],
+        floats[num_rays : num_rays + NUM_VELOCITY],
+        floats[num_rays + NUM_VELOCITY :],
+        teleports,
+        ages,
+        quality,
+    )
+
+
+def state_to_vector(data):
+    """Decode observation bytes into a flat float32 vector.
+
+    Uses the same order as the old pickled list:
+    distances, teleports (0.0 or 1.0), velocity, waypoints,
+    followed by ray ages if present.
+    """
+    state = decode_state(data)
+    arrays = [
+        state.distances,
+        state.teleports.astype(np.float32),
+        state.velocity,
+        state.waypoints,
+    ]
+    if state.ages is not None:
+        arrays.append(state.ages.astype(np.float32))
+    return np.concatenate(arrays)
+
+
+def observation_size(data):
+    """Get the size in bytes of the observation starting data."""
+    magic, version, flags, num_rays, layout, quality = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError(f"Not a deepsurf observation (magic {magic!r})")
+    if version > VERSION:
+        raise ValueError(f"Unsupported observation version {version}")
+
+    num_floats = num_rays + NUM_VELOCITY + NUM_WAYPOINTS
+    ages_size = num_rays if flags & FLAG_AGES else 0
+    return HEADER.size + num_floats * 4 + (num_rays + 7) // 8 + ages_size
+
+
+def decode_batch(data):
+    """Decode concatenated observations into a (count, D) float32
+    matrix, one row per observation as in state_to_vector.
+
+    All observations must have the same header, i.e. the same
+    number of rays, layout and flags, except for the quality level.
+    """
+    size = observation_size(data)
+    count = len(data) // size
+    if size * count != len(data):
+        raise ValueError(f"Can't split {len(data)} bytes into {size} byte observations")
+
+    magic, version, flags, num_rays, layout, quality = HEADER.unpack_from(data, 0)
+
+    rows = np.frombuffer(data, dtype=np.uint8).reshape(count, size)
+    header = rows[:, : HEADER.size - 1]
+    if not (header == header[0]).all():
+        raise ValueError("Observations in a batch must have the same header")
+
+    num_floats = num_rays + NUM_VELOCITY + NUM_WAYPOINTS
+    mask_size = (num_rays + 7) // 8
+    floats = np.ndarray(
+        (count, num_floats),
+        dtype="<f4",
+        buffer=data,
+        offset=HEADER.size,
+        strides=(size, 4),
+    )
+    mask_offset = HEADER.size + num_floats * 4
+
+    num_ages = num_rays if flags & FLAG_AGES else 0
+    vectors = np.empty((count, num_rays + num_floats + num_ages), dtype=np.float32)
+    vectors[:, :num_rays] = floats[:, :num_rays]
+    vectors[:, num_rays : num_rays * 2] = np.unpackbits(
+        rows[:, mask_offset : mask_offset + mask_size], axis=1
+    )[:, :num_rays]
+    vectors[:, num_rays * 2 : num_rays + num_floats] = floats[:, num_rays:]
+    if num_ages > 0:
+        ages_offset = mask_offset + mask_size
+        vectors[:, num_rays + num_floats :] = rows[
+            :, ages_offset : ages_offset + num_ages
+        ]
+    return vectors
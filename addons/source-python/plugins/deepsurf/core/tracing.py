@@ -0,0 +1,200 @@
+"""Module for tracing rays against the world.
+
+Ray sensing goes through a `Tracer` so that it can run against the
+engine (helpers.trace.EngineTracer) or a pure-Python stand-in world.
+This module doesn't depend on Source.Python.
+"""
+
+# =============================================================================
+# >> IMPORTS
+# =============================================================================
+# Python
+from collections import OrderedDict
+
+import numpy as np
+
+
+# =============================================================================
+# >> CLASSES
+# =============================================================================
+class Tracer:
+    """Interface for tracing rays against the world."""
+
+    def trace(self, start, end):
+        """Trace a ray from start to end, both (x, y, z) tuples.
+
+        Returns (hit, is_teleport) where hit is the (x, y, z) tuple of
+        the first surface or trigger_teleport hit, or None on a miss.
+        """
+        raise NotImplementedError()
+
+    def clip(self, start, end, entity):
+        """Clip a ray from start to end against a single entity.
+
+        Returns the (x, y, z) tuple where the ray enters the entity,
+        or None on a miss. Used to confirm TeleportIndex candidates.
+        """
+        raise NotImplementedError()
+
+
+class TraceLog(Tracer):
+    """Records the traces of another tracer, e.g. to replay them
+    without a server (see tools/standin).
+
+    Only trace results are recorded, so teleports found through a
+    TeleportIndex are missing from the log.
+    """
+
+    def __init__(self, tracer, capacity=1 << 20):
+        self.tracer = tracer
+        self.capacity = capacity
+        self.starts = []
+        self.ends = []
+        self.hits = []
+        self.teleports = []
+
+    def __len__(self):
+        return len(self.starts)
+
+    def trace(self, start, end):
+        hit, is_teleport = self.tracer.trace(start, end)
+        if len(self.starts) < self.capacity:
+            self.starts.append(start)
+            self.ends.append(end)
+            self.hits.append(hit if hit is not None else (np.nan,) * 3)
+            self.teleports.append(is_teleport)
+        return hit, is_teleport
+
+    def clip(self, start, end, entity):
+        return self.tracer.clip(start, end, entity)
+
+    def save(self, path):
+        """Save the log as an .npz of starts, ends and hits (N, 3),
+        nan for misses, and teleports (N,)."""
+        np.savez(
+            path,
+            starts=np.array(self.starts, dtype=np.float64).reshape(-1, 3),
+            ends=np.array(self.ends, dtype=np.float64).reshape(-1, 3),
+            hits=np.array(self.hits, dtype=np.float64).reshape(-1, 3),
+            teleports=np.array(self.teleports, dtype=bool),
+        )
+
+
+class TeleportIndex:
+    """Axis aligned bounding boxes of trigger_teleports.
+
+    Rays are tested against all boxes at once, only rays entering a
+    box before hitting the world need an exact `Tracer.clip`.
+    The boxes are (re)built lazily by calling builder, which returns
+    a list of (mins, maxs, entity) tuples.
+    """
+
+    def __init__(self, builder=None):
+        self.builder = builder
+        self.mins = np.empty((0, 3))
+        self.maxs = np.empty((0, 3))
+        self.entities = []
+        self.dirty = True
+
+    def __len__(self):
+        return len(self.entities)
+
+    def invalidate(self):
+        """Rebuild before the next use, e.g. when teleports spawn or are deleted."""
+        self.dirty = True
+
+    def build(self):
+        boxes = self.builder() if self.builder is not None else []
+        self.set_boxes(boxes)
+
+    def set_boxes(self, boxes):
+        self.mins = np.array([box[0] for box in boxes], dtype=np.float64).reshape(-1, 3)
+        self.maxs = np.array([box[1] for box in boxes], dtype=np.float64).reshape(-1, 3)
+        self.entities = [box[2] for box in boxes]
+        self.dirty = False
+
+    def intersect(self, start, ends, limits):
+        """Find boxes entered by rays from start to ends before limits.
+
+        start is (x, y, z), ends a (N, 3) array and limits a (N,)
+        array of the fraction of each ray to test.
+        Returns a (N, M) array of entry fractions, inf for no hit.
+        """
+        if self.dirty:
+            self.build()
+
+        rays = ends - start
+        with np.errstate(divide="ignore", invalid="ignore"):
+            inverse = 1.0 / rays[:, None, :]
+            t1 = (self.mins[None, :, :] - start) * inverse
+            t2 = (self.maxs[None, :, :] - start) * inverse
+            # fmin / fmax ignore nan from rays starting on a box plane
+            enter = np.fmax.reduce(np.fmin(t1, t2), axis=2)
+            leave = np.fmin.reduce(np.fmax(t1, t2), axis=2)
+
+        enter = np.maximum(enter, 0.0)
+        hit = (enter <= leave) & (enter <= limits[:, None])
+        return np.where(hit, enter, np.inf)
+
+
+class TraceCache:
+    """LRU cache of trace results for static world geometry.
+
+    Results are keyed by the ray start quantized to a grid of
+    grid_size units and the ray direction quantized to
+    1 / direction_steps, so rays from nearby positions share results.
+    The cached hit point is reused as is, distances are off by at
+    most the grid cell size.
+    """
+
+    def __init__(self, tracer, grid_size=16.0, capacity=65536, direction_steps=64):
+        self.tracer = tracer
+        self.grid_size = grid_size
+        self.capacity = capacity
+        self.direction_steps = direction_steps
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def trace(self, start, end, direction):
+        """Trace a ray from start to end, see Tracer.trace.
+
+        direction is the unit (x, y, z) direction of the ray.
+        """
+        grid = self.grid_size
+        steps = self.direction_steps
+        key = (
+            int(start[0] // grid),
+            int(start[1] // grid),
+            int(start[2] // grid),
+            int(round(direction[0] * steps)),
+            int(round(direction[1] * steps)),
+            int(round(direction[2] * steps)),
+        )
+
+        result = self.entries.get(key)
+        if result is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return result
+
+        self.misses += 1
+        result = self.tracer.trace(start, end)
+        self.entries[key] = result
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+        return result
+
+    def clear(self):
+        """Drop all cached results, e.g. on map change."""
+        self.entries.clear()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def get_hit_rate(self):
+        total = self.hits + self.misses
+        if total == 0:
+            return 0.0
+        return self.hits / total
@@ -1,3 +1,6 @@
 from .zone import Zone
-from .segment import Segment
+from .segment import Segment, segment_store
 from .checkpoint import Checkpoint
+from .route import Progress, Route
+from .store import SegmentStore
+from .map_route import MapRoute
@@ -0,0 +1,64 @@
+"""Module for the stages of a map."""
+
+# =============================================================================
+# >> IMPORTS
+# =============================================================================
+# deepsurf
+from ..starts import RecordingStarts, RouteStarts
+from .segment import Segment
+
+
+# =============================================================================
+# >> CLASSES
+# =============================================================================
+class MapRoute:
+    """Segments of every stage of a map, in stage order.
+
+    Routes are precomputed when created, so bots switch stages
+    without rebuilding them, see Bots.set_stages.
+    """
+
+    def __init__(self, map_name, segments):
+        """Create the stages from {stage: Segment.serialize data},
+        e.g. from the segment store."""
+        self.map_name = map_name
+        self.segments = {}
+        for stage in sorted(segments):
+            segment = Segment()
+            segment.deserialize(segments[stage])
+            segment.get_route()
+            self.segments[stage] = segment
+        self.stages = tuple(self.segments)
+        # (stage, speed) -> starts.RouteStarts, see get_route_starts
+        self.route_starts = {}
+        # (stage, paths) -> starts.RecordingStarts, see get_recording_starts
+        self.recording_starts = {}
+
+    def __len__(self):
+        return len(self.stages)
+
+    def __contains__(self, stage):
+        return stage in self.segments
+
+    def get(self, stage):
+        return self.segments[stage]
+
+    def get_route_starts(self, stage, speed):
+        """Get the starts.RouteStarts of stage, shared by its bots."""
+        key = (stage, speed)
+        starts = self.route_starts.get(key)
+        if starts is None:
+            starts = RouteStarts(self.segments[stage].get_route().points, speed)
+            self.route_starts[key] = starts
+        return starts
+
+    def get_recording_starts(self, stage, paths):
+        """Get the starts.RecordingStarts of stage from the recordings
+        of that stage in paths, shared by its bots. Raises ValueError
+        without recorded states of stage, or OSError."""
+        key = (stage, tuple(paths))
+        starts = self.recording_starts.get(key)
+        if starts is None:
+            starts = RecordingStarts(paths, self.map_name, stage)
+            self.recording_starts[key] = starts
+        return starts
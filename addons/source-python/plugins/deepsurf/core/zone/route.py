@@ -0,0 +1,132 @@
+"""Module for precomputed Segment polylines.
+
+This module doesn't depend on Source.Python.
+"""
+
+# =============================================================================
+# >> IMPORTS
+# =============================================================================
+# Python
+import numpy as np
+
+
+# =============================================================================
+# >> CLASSES
+# =============================================================================
+class Progress:
+    """Progress of a bot along a Route, reused every tick.
+
+    `segment` is also the search hint for the next update,
+    -1 searches the whole route. Progress of another route, e.g. one
+    rebuilt after its Segment changed, is reset by the next update.
+    """
+
+    __slots__ = (
+        "route",
+        "segment",
+        "fraction",
+        "next_index",
+        "closest",
+        "distance",
+        "remaining",
+        "distance_to_route",
+        "next_point",
+        "next_next_point",
+    )
+
+    def __init__(self):
+        self.closest = np.zeros(3)
+        self.reset()
+
+    def reset(self):
+        # the Route this progress is along
+        self.route = None
+        self.segment = -1
+        self.fraction = 0.0
+        self.next_index = 0
+        self.closest[:] = 0.0
+        # along the route from the start
+        self.distance = 0.0
+        # along the route to the end
+        self.remaining = 0.0
+        self.distance_to_route = 0.0
+        # filled in by Segment.update_progress
+        self.next_point = None
+        self.next_next_point = None
+
+
+class Route:
+    """Polyline through the start, checkpoints and end of a Segment."""
+
+    # do a full search if the bot is further than this from the route
+    # after a local search, e.g. after teleporting
+    search_radius = 512.0
+
+    def __init__(self, points):
+        """Create a route from a (K, 3) array of points, K >= 2."""
+        self.points = np.array(points, dtype=np.float64).reshape(-1, 3)
+        self.starts = self.points[:-1]
+        self.directions = self.points[1:] - self.starts
+        self.lengths_sq = np.einsum("ij,ij->i", self.directions, self.directions)
+        self.lengths = np.sqrt(self.lengths_sq)
+        self.cumulative = np.concatenate(((0.0,), np.cumsum(self.lengths)))
+        self.length = self.cumulative[-1]
+
+    def __len__(self):
+        return len(self.points)
+
+    def update(self, position, progress):
+        """Update progress for position (x, y, z).
+
+        Only searches near the last known segment unless
+        the bot is far from the route there.
+        """
+        if progress.route is not self:
+            progress.reset()
+            progress.route = self
+
+        num_segments = len(self.starts)
+        if progress.segment < 0 or progress.segment >= num_segments:
+            self._search(position, progress, 0, num_segments)
+            return progress
+
+        self._search(
+            position,
+            progress,
+            max(0, progress.segment - 1),
+            min(num_segments, progress.segment + 3),
+        )
+        if progress.distance_to_route > self.search_radius:
+            self._search(position, progress, 0, num_segments)
+        return progress
+
+    def _search(self, position, progress, low, high):
+        starts = self.starts[low:high]
+        directions = self.directions[low:high]
+        lengths_sq = self.lengths_sq[low:high]
+
+        to_position = np.subtract(position, starts)
+        dots = np.einsum("ij,ij->i", to_position, directions)
+        fractions = np.divide(
+            dots, lengths_sq, out=np.zeros_like(dots), where=lengths_sq > 0.0
+        )
+        # dots stay unclamped for next_index
+        np.clip(fractions, 0.0, 1.0, out=fractions)
+        closest = starts + directions * fractions[:, None]
+        offsets = closest - position
+        distances_sq = np.einsum("ij,ij->i", offsets, offsets)
+
+        nearest = int(np.argmin(distances_sq))
+        segment = low + nearest
+        fraction = float(fractions[nearest])
+
+        progress.segment = segment
+        progress.fraction = fraction
+        # haven't reached the start of the segment yet,
+        # past the end only the end point remains
+        progress.next_index = segment if dots[nearest] < 0.0 else segment + 1
+        progress.next_index = min(progress.next_index, len(self.points) - 1)
+        progress.closest[:] = closest[nearest]
+        progress.distance = self.cumulative[segment] + fraction * self.lengths[segment]
+        progress.remaining = self.length - progress.distance
+        progress.distance_to_route = float(np.sqrt(distances_sq[nearest]))
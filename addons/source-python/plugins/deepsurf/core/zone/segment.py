@@ -3,15 +3,24 @@
 # =============================================================================
 # >> IMPORTS
 # =============================================================================
-# Python
-from sys import float_info
-
 # Source.Python
 from mathlib import Vector, NULL_VECTOR
 
 # deepsurf
+from ..constants import CFG_PATH
 from .zone import Zone
 from .checkpoint import Checkpoint
+from .route import Progress, Route
+from .store import SegmentStore
+
+# =============================================================================
+# >> GLOBAL VARIABLES
+# =============================================================================
+# segments of the current map by stage, see store.py
+# (JSON files are relative to tf2 folder)
+segment_store = SegmentStore(
+    str(CFG_PATH / "segments"), "./tf/resource/source-python/deepsurf/"
+)
 
 
 # =============================================================================
@@ -26,40 +35,44 @@ class Segment:
 
     @staticmethod
     def instance():
-        """Singleton instance"""
+        """Singleton instance, the segment edited with commands"""
         if Segment.__instance is None:
-            Segment()
+            Segment.__instance = Segment()
         return Segment.__instance
 
     def __init__(self):
-        """Create a new Segment."""
-        if Segment.__instance is not None:
-            raise Exception("This class is a singleton, use .instance() access method.")
-
+        """Create a new Segment, use .instance() unless it's
+        for a stage, see MapRoute."""
         self.checkpoints = []
         self.start_zone = None
         self.end_zone = None
-        Segment.__instance = self
+        # rebuilt when zones change, see get_route
+        self.points = None
+        self.route = None
 
     def add_checkpoint(self, checkpoint):
         """Add a checkpoint to the Segment."""
         self.checkpoints.append(checkpoint)
+        self.route = None
         return len(self.checkpoints)
 
     def remove_checkpoint(self):
         """Remove last checkpoint"""
-        if len(self.checkpoints > 0):
+        if len(self.checkpoints) > 0:
             self.checkpoints = self.checkpoints[:-1]
+            self.route = None
             return len(self.checkpoints) + 1
         return -1
 
     def set_start_zone(self, zone):
         """Add a start zone to the Segment."""
         self.start_zone = zone
+        self.route = None
 
     def set_end_zone(self, zone):
         """Add a end zone to the Segment."""
         self.end_zone = zone
+        self.route = None
 
     def draw(self):
         if self.start_zone is not None:
@@ -73,6 +86,7 @@ class Segment:
         self.checkpoints = []
         self.start_zone = None
         self.end_zone = None
+        self.route = None
 
     def serialize(self):
         if self.is_valid() is False:
@@ -137,34 +151,37 @@ class Segment:
             return False
         return True
 
-    # get a list of all the points we haven't passed yet
-    # NOTE: always includes end_zone.point even if past it
-    def get_remaining_points(self, position):
+    def get_route(self):
+        """Get the precomputed polyline through all zones."""
         if not self.is_valid():
             assert False
 
-        points = [self.start_zone.point]
-        for cp in self.checkpoints:
-            points.append(cp.point)
-        points.append(self.end_zone.point)
-
-        nearest_index = -1
-        nearest_dist = float_info.max
-        for i in range(0, len(points)):
-            dist = position.get_distance(points[i])
-            if dist < nearest_dist:
-                nearest_dist = dist
-                nearest_index = i
-
-        if nearest_index < len(points) - 1:
-            # are we past nearest point?
-            forward = points[nearest_index + 1] - points[nearest_index]
-            to_nearest = points[nearest_index] - position
-            if to_nearest.dot(forward) > 0:
-                next_index = nearest_index
-            else:
-                next_index = nearest_index + 1
-        else:
-            next_index = nearest_index
-
-        return points[next_index:]
+        if self.route is None:
+            self.points = [self.start_zone.point]
+            for cp in self.checkpoints:
+                self.points.append(cp.point)
+            self.points.append(self.end_zone.point)
+            self.route = Route([(p.x, p.y, p.z) for p in self.points])
+
+        return self.route
+
+    def update_progress(self, progress, position):
+        """Update a bot's route.Progress for position.
+
+        Compute once per tick and share the result,
+        searches only near the previous position.
+        """
+        route = self.get_route()
+        route.update((position.x, position.y, position.z), progress)
+        # (same as next point if the end)
+        progress.next_point = self.points[progress.next_index]
+        progress.next_next_point = self.points[
+            min(progress.next_index + 1, len(self.points) - 1)
+        ]
+        return progress
+
+    # get a list of all the points we haven't passed yet
+    # NOTE: always includes end_zone.point even if past it
+    def get_remaining_points(self, position):
+        progress = self.update_progress(Progress(), position)
+        return self.points[progress.next_index :]
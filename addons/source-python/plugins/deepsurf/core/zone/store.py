@@ -0,0 +1,340 @@
+"""Module for storing the segments of maps.
+
+The segments of a map are stored in one binary file holding every
+stage, and cached in memory once the map is loaded. Files are read and
+written by a worker thread and the results picked up by
+SegmentStore.poll on the game thread, so saving and loading segments
+never blocks a tick.
+
+Segments are the dicts of Segment.serialize, as in the JSON files of
+older versions, which can still be imported and exported.
+
+Layout of a segment file (little-endian):
+    header          HEADER, magic, version and number of stages
+    index           a STAGE entry per stage, sorted by stage, offset
+                    is where its points start
+    points          per stage the start, checkpoint and end points as
+                    float32 (x, y, z), then the checkpoint indices
+                    as int32
+
+This module doesn't depend on Source.Python.
+"""
+
+# =============================================================================
+# >> IMPORTS
+# =============================================================================
+# Python
+import glob
+import json
+import os
+import queue
+import struct
+import threading
+
+import numpy as np
+
+# =============================================================================
+# >> ALL DECLARATION
+# =============================================================================
+__all__ = (
+    "HEADER",
+    "STAGE",
+    "MAGIC",
+    "VERSION",
+    "pack_segments",
+    "unpack_segments",
+    "SegmentStore",
+)
+
+# =============================================================================
+# >> GLOBAL VARIABLES
+# =============================================================================
+# magic, version, number of stages
+HEADER = struct.Struct("<4sHH")
+# stage, checkpoints, start orientation, offset of the points
+STAGE = struct.Struct("<iHfI")
+MAGIC = b"DSSG"
+VERSION = 1
+EXTENSION = ".dss"
+
+
+# =============================================================================
+# >> CLASSES
+# =============================================================================
+class SegmentStore:
+    """Segments of the current map by stage, see the module docstring.
+
+    Segment files are kept in directory, JSON files are imported
+    from and exported to json_directory as {map}_{stage}.json.
+    """
+
+    def __init__(self, directory, json_directory):
+        self.directory = directory
+        self.json_directory = json_directory
+        self.map_name = None
+        # stage -> segment of the current map, None while loading
+        self.segments = None
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        self.thread = None
+        # jobs submitted but not picked up by poll yet
+        self.pending = 0
+
+    def is_loaded(self):
+        return self.segments is not None
+
+    def get(self, stage):
+        """Get the segment of stage, None if there's none or the
+        map is still loading."""
+        if self.segments is None:
+            return None
+        return self.segments.get(stage)
+
+    def get_stages(self):
+        """Get the stages with a segment, in order."""
+        if self.segments is None:
+            return []
+        return sorted(self.segments)
+
+    def get_path(self, map_name):
+        return os.path.join(self.directory, map_name + EXTENSION)
+
+    def load_map(self, map_name):
+        """Start loading the segments of map_name, importing its JSON
+        files if it has no segment file yet."""
+        self.map_name = map_name
+        self.segments = None
+        path = self.get_path(map_name)
+        json_directory = self.json_directory
+        self.submit(
+            lambda: read_map(path, json_directory, map_name),
+            lambda result: self.on_loaded(map_name, result),
+        )
+
+    def on_loaded(self, map_name, result):
+        if map_name != self.map_name:
+            # loaded for a previous map
+            return
+        if isinstance(result, Exception):
+            print(f"[deepsurf] Failed to load segments of {map_name}: {result}")
+            self.segments = {}
+            return
+
+        self.segments, imported = result
+        if imported:
+            print(f"[deepsurf] Imported {len(self.segments)} segments of {map_name}")
+            self.write()
+        else:
+            print(f"[deepsurf] Loaded {len(self.segments)} segments of {map_name}")
+
+    def save(self, stage, segment):
+        """Set the segment of stage and write the map's file.
+        Returns False if the map is still loading."""
+        if self.segments is None:
+            return False
+        self.segments[stage] = segment
+        self.write()
+        return True
+
+    def remove(self, stage):
+        """Remove the segment of stage and write the map's file.
+        Returns False if there's none."""
+        if self.segments is None or stage not in self.segments:
+            return False
+        del self.segments[stage]
+        self.write()
+        return True
+
+    def write(self):
+        # packed on the game thread, segments may change before the write
+        data = pack_segments(self.segments)
+        path = self.get_path(self.map_name)
+        map_name = self.map_name
+        self.submit(
+            lambda: write_file(path, data), lambda result: on_written(map_name, result)
+        )
+
+    def import_json(self):
+        """Merge the JSON files of the current map into its segments,
+        replacing stages that already have one."""
+        if self.segments is None:
+            return False
+        map_name = self.map_name
+        json_directory = self.json_directory
+        self.submit(
+            lambda: read_json(json_directory, map_name),
+            lambda result: self.on_imported(map_name, result),
+        )
+        return True
+
+    def on_imported(self, map_name, result):
+        if map_name != self.map_name or self.segments is None:
+            return
+        if isinstance(result, Exception):
+            print(f"[deepsurf] Failed to import segments of {map_name}: {result}")
+            return
+        self.segments.update(result)
+        print(f"[deepsurf] Imported {len(result)} segments of {map_name}")
+        self.write()
+
+    def export_json(self):
+        """Write each segment of the current map to a JSON file."""
+        if self.segments is None:
+            return False
+        segments = dict(self.segments)
+        map_name = self.map_name
+        json_directory = self.json_directory
+        self.submit(
+            lambda: write_json(json_directory, map_name, segments),
+            lambda result: on_written(map_name, result),
+        )
+        return True
+
+    def submit(self, job, done):
+        """Run job on the worker thread, done is called with its
+        result or exception by poll."""
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self.work, daemon=True)
+            self.thread.start()
+        self.pending += 1
+        self.jobs.put((job, done))
+
+    def work(self):
+        while True:
+            job, done = self.jobs.get()
+            if job is None:
+                return
+            try:
+                result = job()
+            except Exception as e:
+                result = e
+            self.results.put((done, result))
+
+    def poll(self):
+        """Pick up finished jobs, call once per tick."""
+        while self.pending > 0:
+            try:
+                done, result = self.results.get_nowait()
+            except queue.Empty:
+                return
+            self.pending -= 1
+            done(result)
+
+    def close(self):
+        """Finish the submitted writes and stop the worker."""
+        while True:
+            if self.thread is not None and self.thread.is_alive():
+                self.jobs.put((None, None))
+                self.thread.join()
+            self.thread = None
+            self.poll()
+            # e.g. the write of segments imported on loading
+            if self.pending == 0:
+                return
+
+
+# =============================================================================
+# >> FUNCTIONS
+# =============================================================================
+def pack_segments(segments):
+    """Get the segment file bytes of {stage: segment}."""
+    stages = sorted(segments)
+    offset = HEADER.size + STAGE.size * len(stages)
+    index = []
+    parts = []
+    for stage in stages:
+        segment = segments[stage]
+        checkpoints = segment["checkpoints"]
+        points = [segment["start_zone"]] + checkpoints + [segment["end_zone"]]
+        points = np.array(
+            [(point["x"], point["y"], point["z"]) for point in points], dtype="<f4"
+        )
+        indices = np.array([cp["index"] for cp in checkpoints], dtype="<i4")
+        orientation = segment["start_zone"]["orientation"]
+        index.append(STAGE.pack(stage, len(checkpoints), orientation, offset))
+        parts.append(points.tobytes())
+        parts.append(indices.tobytes())
+        offset += points.nbytes + indices.nbytes
+
+    return b"".join([HEADER.pack(MAGIC, VERSION, len(stages))] + index + parts)
+
+
+def unpack_segments(data):
+    """Get {stage: segment} from segment file bytes."""
+    if len(data) < HEADER.size:
+        raise ValueError("Too short for a segment file")
+    magic, version, num_stages = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a deepsurf segment file")
+    if version > VERSION:
+        raise ValueError(f"Unsupported segment file version {version}")
+
+    segments = {}
+    for i in range(num_stages):
+        stage, num_checkpoints, orientation, offset = STAGE.unpack_from(
+            data, HEADER.size + STAGE.size * i
+        )
+        points = np.frombuffer(data, "<f4", (num_checkpoints + 2) * 3, offset)
+        points = points.reshape(-1, 3).tolist()
+        indices = np.frombuffer(
+            data, "<i4", num_checkpoints, offset + len(points) * 12
+        ).tolist()
+        x, y, z = points[0]
+        start_zone = {"orientation": orientation, "x": x, "y": y, "z": z}
+        x, y, z = points[-1]
+        segments[stage] = {
+            "start_zone": start_zone,
+            "end_zone": {"x": x, "y": y, "z": z},
+            "checkpoints": [
+                {"index": index, "x": x, "y": y, "z": z}
+                for index, (x, y, z) in zip(indices, points[1:-1])
+            ],
+        }
+    return segments
+
+
+def read_map(path, json_directory, map_name):
+    """Get ({stage: segment}, imported) for map_name, imported if read
+    from JSON files for lack of a segment file."""
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return unpack_segments(f.read()), False
+    segments = read_json(json_directory, map_name)
+    return segments, len(segments) > 0
+
+
+def read_json(directory, map_name):
+    """Get {stage: segment} from the {map_name}_{stage}.json files."""
+    segments = {}
+    prefix = os.path.join(directory, map_name + "_")
+    for path in glob.glob(glob.escape(prefix) + "*.json"):
+        stage = path[len(prefix) : -len(".json")]
+        if not stage.isdigit():
+            continue
+        with open(path) as f:
+            segments[int(stage)] = json.load(f)
+    return segments
+
+
+def write_json(directory, map_name, segments):
+    os.makedirs(directory, exist_ok=True)
+    for stage, segment in segments.items():
+        path = os.path.join(directory, f"{map_name}_{stage}.json")
+        with open(path, "w") as f:
+            json.dump(segment, f, ensure_ascii=False, indent=4)
+    return len(segments)
+
+
+def write_file(path, data):
+    """Replace the file at path with data, readers never see
+    a partial file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        f.write(data)
+    os.replace(temporary, path)
+
+
+def on_written(map_name, result):
+    if isinstance(result, Exception):
+        print(f"[deepsurf] Failed to write segments of {map_name}: {result}")
@@ -6,14 +6,17 @@
 # Source.Python
 from engines.server import server, queue_command_string
 from events import Event
-from listeners import OnTick
+from listeners import OnEntityDeleted, OnEntitySpawned, OnLevelInit, OnTick
 from cvars import cvar
 from players.entity import Player
 
 # deepsurf
-from .core.zone import Segment
+from .core.zone import Segment, segment_store
 from .core import commands
-from .core.bot import Bot
+from .core.bot import Bots
+from .core.budget import QUALITY_LEVELS
+from .core.helpers import teleport_index
+from .core.profiler import profiler
 
 
 # =============================================================================
@@ -26,12 +29,19 @@ def load():
     )
     cvar.find_var("sv_airaccelerate").set_float(150)
     cvar.find_var("sv_accelerate").set_float(10)
+    if server.map_name:
+        segment_store.load_map(server.map_name)
     print(f"[deepsurf] Loaded!")
 
 
 def unload():
     """Called when Source.Python unloads the plugin."""
-    Bot.instance().kick("Plugin unloading")
+    Bots.instance().kick("Plugin unloading")
+    Bots.instance().set_recording(None)
+    profiler.disable()
+    Bots.instance().network.close()
+    # finish writing segments
+    segment_store.close()
     print(f"[deepsurf] Unloaded!")
 
 
@@ -39,13 +49,50 @@ def unload():
 def on_player_spawn(game_event):
     queue_command_string("mp_waitingforplayers_cancel 1")
     player = Player.from_userid(game_event["userid"])
-    if Bot.instance().bot and Bot.instance().bot.index == player.index:
-        Bot.instance().on_spawn()
+    bot = Bots.instance().from_index(player.index)
+    if bot is not None:
+        bot.on_spawn()
+
+
+@OnLevelInit
+def on_level_init(map_name):
+    teleport_index.invalidate()
+    # cached for the map, see dps_loadcfg
+    segment_store.load_map(map_name)
+    # stages are per map
+    if Bots.instance().map_route is not None:
+        Bots.instance().set_stages(None)
+    # cached traces are only valid for the previous map
+    for bot in Bots.instance():
+        if bot.sensor.cache is not None:
+            bot.sensor.cache.clear()
+    # recording files are per map
+    if Bots.instance().recorder is not None:
+        Bots.instance().recorder.split()
+
+
+@OnEntitySpawned
+def on_entity_spawned(base_entity):
+    if base_entity.classname == "trigger_teleport":
+        teleport_index.invalidate()
+
+
+@OnEntityDeleted
+def on_entity_deleted(base_entity):
+    if base_entity.classname == "trigger_teleport":
+        teleport_index.invalidate()
 
 
 @OnTick
 def on_tick():
-    Bot.instance().tick()
-    # draw zones every second
-    if server.tick % 67 == 0:
+    segment_store.poll()
+    Bots.instance().tick()
+    if profiler.enabled:
+        profiler.tick()
+    # draw zones every second, unless over the tick budget
+    if server.tick % 67 == 0 and QUALITY_LEVELS[Bots.instance().quality].draw:
         Segment.instance().draw()
+        # and those of the stages bots are on
+        if Bots.instance().map_route is not None:
+            for segment in Bots.instance().get_segments():
+                segment.draw()
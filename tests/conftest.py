@@ -0,0 +1,28 @@
+"""Runs the tests against the stand-in engine, see tools/standin."""
+
+# =============================================================================
+# >> IMPORTS
+# =============================================================================
+# Python
+import os
+import sys
+
+import pytest
+
+# deepsurf
+root = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, os.path.join(root, "tools"))
+sys.path.insert(0, os.path.join(root, "addons", "source-python", "plugins"))
+import standin
+
+world, start, end, checkpoints = standin.surf_world()
+server = standin.install(world)
+
+
+# =============================================================================
+# >> FIXTURES
+# =============================================================================
+@pytest.fixture
+def surf():
+    """Get (start point, end point, checkpoints) of the surf map."""
+    return start, end, checkpoints
@@ -0,0 +1,134 @@
+"""Tests for actions.py, run with pytest from the repository root."""
+
+# =============================================================================
+# >> IMPORTS
+# =============================================================================
+# Python
+import random
+
+import pytest
+
+# deepsurf
+from deepsurf.core.actions import ActionSpace
+from deepsurf.core.bot import default_action_space
+from mathlib import QAngle
+from players.bots import BotCmd
+from players.constants import PlayerButtons
+
+
+# =============================================================================
+# >> FUNCTIONS
+# =============================================================================
+def get_angle_change(index):
+    """Bot.get_angle_change before the action tables."""
+    turn_values = 200
+
+    # min 0.05 per tick, max 5.0
+    # (3.35 /s , 335 /s)
+    if index <= turn_values / 2:
+        return index * 0.05
+
+    index -= turn_values / 2
+    return index * -0.05
+
+
+def get_cmd(
+    snapshot_angles,
+    move_action=0,
+    yaw_action=0,
+    pitch_action=0,
+    jump_action=0,
+    duck_action=0,
+):
+    """Bot.get_cmd before the action tables."""
+    bcmd = BotCmd()
+    bcmd.reset()
+    view_angles = QAngle(snapshot_angles.x, snapshot_angles.y, snapshot_angles.z)
+
+    if yaw_action != 0:
+        view_angles.y += get_angle_change(yaw_action)
+    if pitch_action != 0:
+        view_angles.x += get_angle_change(pitch_action)
+        if view_angles.x < -89.0:
+            view_angles.x = -89.0
+        if view_angles.x > 89.0:
+            view_angles.x = 89.0
+
+    bcmd.view_angles = view_angles
+
+    if move_action != 0:
+        # Map move direction to forward + side axis
+        move_speed = 400
+        move_options = {
+            1: {"forward_move": move_speed, "side_move": 0},
+            2: {"forward_move": move_speed, "side_move": move_speed},
+            3: {"forward_move": 0, "side_move": move_speed},
+            4: {"forward_move": -move_speed, "side_move": move_speed},
+            5: {"forward_move": -move_speed, "side_move": 0},
+            6: {"forward_move": -move_speed, "side_move": -move_speed},
+            7: {"forward_move": 0, "side_move": -move_speed},
+            8: {"forward_move": move_speed, "side_move": -move_speed},
+        }
+        move = move_options[move_action]
+        bcmd.forward_move = move["forward_move"]
+        bcmd.side_move = move["side_move"]
+
+    if jump_action != 0:
+        bcmd.buttons |= PlayerButtons.JUMP
+
+    if duck_action != 0:
+        bcmd.buttons |= PlayerButtons.DUCK
+
+    return bcmd
+
+
+def random_action(rng, heads):
+    return tuple(rng.randrange(size) for size in heads)
+
+
+def random_angles(rng):
+    # the engine keeps the pitch within +-89
+    return QAngle(
+        rng.uniform(-89.0, 89.0), rng.uniform(-360.0, 360.0), rng.uniform(-5.0, 5.0)
+    )
+
+
+def assert_same_cmd(bcmd, expected):
+    assert bcmd.view_angles.x == expected.view_angles.x
+    assert bcmd.view_angles.y == expected.view_angles.y
+    assert bcmd.view_angles.z == expected.view_angles.z
+    assert bcmd.forward_move == expected.forward_move
+    assert bcmd.side_move == expected.side_move
+    assert bcmd.buttons == expected.buttons
+
+
+# =============================================================================
+# >> TESTS
+# =============================================================================
+def test_matches_old_get_cmd():
+    space = default_action_space
+    assert space.heads == (9, 201, 201, 2, 2)
+    rng = random.Random(0)
+    bcmd = BotCmd()
+    view_angles = QAngle()
+    for _ in range(20000):
+        base = random_angles(rng)
+        action = random_action(rng, space.heads)
+        space.fill(bcmd, view_angles, base, action)
+        assert_same_cmd(bcmd, get_cmd(base, *action))
+
+
+@pytest.mark.parametrize("index", (0, 1, 99, 100, 101, 150, 200))
+def test_turn_edges(index):
+    base = QAngle(88.0, 10.0, 0.0)
+    for action in ((0, index, 0, 0, 0), (0, 0, index, 0, 0)):
+        bcmd = default_action_space.fill(BotCmd(), QAngle(), base, action)
+        assert_same_cmd(bcmd, get_cmd(base, *action))
+
+
+def test_disabled_buttons():
+    masks = {"jump": PlayerButtons.JUMP, "duck": PlayerButtons.DUCK}
+    space = ActionSpace(masks, buttons=("duck",))
+    assert space.heads == (9, 201, 201, 1, 2)
+    bcmd = space.fill(BotCmd(), QAngle(), QAngle(), (0, 0, 0, 0, 1))
+    assert bcmd.buttons == PlayerButtons.DUCK
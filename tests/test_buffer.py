@@ -0,0 +1,165 @@
+"""Tests for buffer.py, run with pytest from the repository root."""
+
+# =============================================================================
+# >> IMPORTS
+# =============================================================================
+# Python
+import numpy as np
+import pytest
+
+# deepsurf
+from deepsurf.core.buffer import NUM_ACTIONS, TransitionBuffer, decode_transitions
+from deepsurf.core.state import Observation, state_to_vector
+
+# =============================================================================
+# >> GLOBAL VARIABLES
+# =============================================================================
+observation = Observation(8)
+
+
+# =============================================================================
+# >> FUNCTIONS
+# =============================================================================
+def make_state(i):
+    """Get the encoded observation number i."""
+    observation.distances[:] = np.arange(8) + 100.0 * i
+    observation.velocity[:] = (i, -i, 0.5 * i)
+    observation.teleports[:] = np.arange(8) == i % 8
+    return observation.encode()
+
+
+def make_action(i):
+    return (i % 9, i, 200 - i, i % 2, 1 - i % 2)
+
+
+def make_buffer(capacity):
+    return TransitionBuffer(capacity, observation.size)
+
+
+def check_chunk(chunk, first, count, dones=()):
+    """Check chunk holds the count transitions after observation first."""
+    states, actions, rewards, chunk_dones, next_states = decode_transitions(*chunk)
+    assert len(states) == len(next_states) == count
+    for i in range(count):
+        assert np.array_equal(states[i], state_to_vector(make_state(first + i)))
+        assert np.array_equal(
+            next_states[i], state_to_vector(make_state(first + i + 1))
+        )
+        assert tuple(actions[i]) == make_action(first + i)
+        assert rewards[i] == np.float32(0.25 * (first + i))
+        assert chunk_dones[i] == (first + i in dones)
+
+
+def add(buffer, i, done=False):
+    buffer.add(make_action(i), 0.25 * i, done, make_state(i + 1))
+
+
+# =============================================================================
+# >> TESTS
+# =============================================================================
+def test_episode():
+    buffer = make_buffer(8)
+    assert buffer.can_begin()
+    buffer.begin(make_state(0))
+    for i in range(3):
+        add(buffer, i, done=i == 2)
+    assert len(buffer) == 3
+    assert not buffer.can_begin()
+
+    chunk = buffer.chunk()
+    observations, actions, rewards, dones = chunk
+    assert len(observations) == 4 * observation.size
+    assert len(actions) == 3 * NUM_ACTIONS * 2
+    assert len(rewards) == 3 * 4
+    assert len(dones) == 3
+    check_chunk(chunk, 0, 3, dones=(2,))
+
+    buffer.consume()
+    assert len(buffer) == 0
+    assert buffer.can_begin()
+    # the episode is done
+    with pytest.raises(ValueError):
+        add(buffer, 3)
+
+
+def test_partial_consume_keeps_observation():
+    buffer = make_buffer(8)
+    buffer.begin(make_state(0))
+    for i in range(5):
+        add(buffer, i)
+
+    check_chunk(buffer.chunk(2), 0, 2)
+    buffer.consume(2)
+    assert len(buffer) == 3
+    check_chunk(buffer.chunk(2), 2, 2)
+    buffer.consume(2)
+    assert len(buffer) == 1
+
+    # sending the rest starts over from the current observation
+    check_chunk(buffer.chunk(4), 4, 1)
+    buffer.consume(4)
+    assert (buffer.start, buffer.end) == (0, 0)
+    add(buffer, 5)
+    add(buffer, 6, done=True)
+    check_chunk(buffer.chunk(), 5, 2, dones=(6,))
+
+
+def test_full_blocks_until_drained():
+    buffer = make_buffer(3)
+    buffer.begin(make_state(0))
+    for i in range(3):
+        add(buffer, i)
+    assert buffer.is_full()
+    with pytest.raises(ValueError):
+        add(buffer, 3)
+
+    # a partially sent buffer stays full, writing is linear
+    buffer.consume(2)
+    assert buffer.is_full()
+    assert len(buffer) == 1
+    with pytest.raises(ValueError):
+        add(buffer, 3)
+
+    buffer.consume(2)
+    assert not buffer.is_full()
+    add(buffer, 3)
+    check_chunk(buffer.chunk(), 3, 1)
+
+
+def test_begin_needs_sent_episode():
+    buffer = make_buffer(4)
+    with pytest.raises(ValueError):
+        add(buffer, 0)
+
+    buffer.begin(make_state(0))
+    add(buffer, 0, done=True)
+    with pytest.raises(ValueError):
+        buffer.begin(make_state(10))
+
+    buffer.consume()
+    buffer.begin(make_state(10))
+    add(buffer, 10)
+    check_chunk(buffer.chunk(), 10, 1)
+
+
+def test_clear():
+    buffer = make_buffer(4)
+    buffer.begin(make_state(0))
+    add(buffer, 0)
+    buffer.clear()
+    assert len(buffer) == 0
+    assert buffer.can_begin()
+    with pytest.raises(ValueError):
+        add(buffer, 1)
+
+
+def test_decode_copies():
+    buffer = make_buffer(4)
+    buffer.begin(make_state(0))
+    add(buffer, 0)
+    chunk = tuple(bytes(view) for view in buffer.chunk())
+    # decoding sent bytes doesn't depend on the buffer
+    buffer.consume()
+    buffer.clear()
+    buffer.begin(make_state(20))
+    check_chunk(chunk, 0, 1)
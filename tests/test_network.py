@@ -0,0 +1,85 @@
+"""Tests for the ActionPipeline of network.py, run with pytest from the
+repository root."""
+
+# =============================================================================
+# >> IMPORTS
+# =============================================================================
+# deepsurf
+from deepsurf.core.network import ActionPipeline
+
+
+# =============================================================================
+# >> CLASSES
+# =============================================================================
+class Result:
+    """Stands in for an rpyc AsyncResult."""
+
+    def __init__(self, value, ready=True):
+        self._value = value
+        self.ready = ready
+
+    @property
+    def value(self):
+        if isinstance(self._value, Exception):
+            raise self._value
+        return self._value
+
+
+class Client:
+    def wait(self, result, timeout):
+        return result.ready
+
+
+# =============================================================================
+# >> TESTS
+# =============================================================================
+def test_replies_oldest_first():
+    pipeline = ActionPipeline(Client(), delay=1)
+    pipeline.submit(1, Result(((0, "a0"), (1, "b0"))), "first")
+    pipeline.submit(2, Result(((0, "a1"),)), "second")
+    pipeline.submit(3, Result(((1, "b2"),)), "third")
+
+    assert pipeline.collect(1) == []
+    assert pipeline.collect(3) == [
+        (((0, "a0"), (1, "b0")), "first"),
+        (((0, "a1"),), "second"),
+    ]
+    # only bot 0's first action was replaced before being applied
+    assert pipeline.missed == 1
+    assert pipeline.collect(4) == [(((1, "b2"),), "third")]
+    assert pipeline.missed == 1
+    assert len(pipeline.pending) == 0
+
+
+def test_late_reply_dropped_behind_newer():
+    pipeline = ActionPipeline(Client(), delay=1)
+    pipeline.submit(1, Result(((0, "old"),), ready=False))
+    pipeline.submit(2, Result(((0, "new"),)))
+    assert pipeline.collect(3) == [(((0, "new"),), None)]
+    assert pipeline.missed == 1
+    assert pipeline.late == 0
+    assert len(pipeline.pending) == 0
+
+
+def test_late_reply_kept():
+    pipeline = ActionPipeline(Client(), delay=1)
+    pipeline.submit(1, Result(((0, "a"),), ready=False))
+    assert pipeline.collect(2) == []
+    assert pipeline.late == 1
+    assert len(pipeline.pending) == 1
+
+
+def test_failed_reply_skipped():
+    pipeline = ActionPipeline(Client(), delay=1)
+    error = ValueError("learner failed")
+    pipeline.submit(1, Result(((0, "a0"),)))
+    pipeline.submit(2, Result(error))
+    pipeline.submit(3, Result(((1, "b2"),)))
+    assert pipeline.collect(4) == [(((0, "a0"),), None), (((1, "b2"),), None)]
+    assert pipeline.failed == 1
+    assert pipeline.error is error
+    assert pipeline.missed == 0
+
+    pipeline.reset_stats()
+    assert (pipeline.late, pipeline.missed, pipeline.failed) == (0, 0, 0)
+    assert pipeline.error is None
@@ -0,0 +1,86 @@
+"""Tests for zone/route.py, run with pytest from the repository root."""
+
+# =============================================================================
+# >> IMPORTS
+# =============================================================================
+# Python
+import numpy as np
+
+# deepsurf
+from deepsurf.core.zone import Checkpoint, Progress, Route, Segment, Zone
+from mathlib import Vector
+
+
+# =============================================================================
+# >> FUNCTIONS
+# =============================================================================
+def make_segment(num_checkpoints):
+    """Get a Segment along x with a point every 100 units."""
+    segment = Segment()
+    segment.set_start_zone(Zone(Vector(0, 0, 0), 0.0))
+    for i in range(num_checkpoints):
+        segment.add_checkpoint(Checkpoint(i, Vector(100 * (i + 1), 0, 0)))
+    segment.set_end_zone(Zone(Vector(100 * (num_checkpoints + 1), 0, 0)))
+    return segment
+
+
+# =============================================================================
+# >> TESTS
+# =============================================================================
+def test_progress_along_route():
+    route = Route([(0, 0, 0), (100, 0, 0), (100, 100, 0)])
+    progress = route.update((50, 10, 0), Progress())
+    assert progress.segment == 0
+    assert progress.next_index == 1
+    assert np.isclose(progress.distance, 50.0)
+    assert np.isclose(progress.remaining, 150.0)
+    assert np.isclose(progress.distance_to_route, 10.0)
+
+    route.update((110, 60, 0), progress)
+    assert progress.segment == 1
+    assert progress.next_index == 2
+    assert np.isclose(progress.distance, 160.0)
+
+
+def test_start_zone():
+    segment = make_segment(3)
+    progress = segment.update_progress(Progress(), Vector(0, 0, 0))
+    # in the start zone the next point is the first checkpoint
+    assert progress.next_index == 1
+    assert progress.next_point == segment.points[1]
+
+    # behind the start zone the start is still ahead
+    segment.update_progress(progress, Vector(-50, 0, 0))
+    assert progress.segment == 0
+    assert progress.next_index == 0
+    assert progress.distance == 0.0
+
+
+def test_route_gets_shorter():
+    segment = make_segment(5)
+    progress = Progress()
+    segment.update_progress(progress, Vector(550, 0, 0))
+    assert progress.segment == 5
+
+    for _ in range(4):
+        segment.remove_checkpoint()
+    segment.update_progress(progress, Vector(150, 0, 0))
+    assert progress.route is segment.get_route()
+    assert progress.segment == 1
+    assert progress.next_index == 2
+    assert progress.next_point == segment.points[-1]
+    assert np.isclose(progress.remaining, 450.0)
+
+
+def test_segment_past_route():
+    long_route = Route([(100 * i, 0, 0) for i in range(6)])
+    short_route = Route([(0, 0, 0), (100, 0, 0), (200, 0, 0)])
+    progress = long_route.update((450, 0, 0), Progress())
+    assert progress.segment == 4
+
+    # progress of the long route reused without a reset
+    progress.route = short_route
+    short_route.update((150, 0, 0), progress)
+    assert progress.segment == 1
+    assert progress.next_index == 2
+    assert np.isclose(progress.distance, 150.0)
@@ -0,0 +1,83 @@
+"""Tests for sensors.py, run with pytest from the repository root."""
+
+# =============================================================================
+# >> IMPORTS
+# =============================================================================
+# Python
+import math
+
+import numpy as np
+import pytest
+
+# deepsurf
+from deepsurf.core.bot import Bot
+from deepsurf.core.sensors import LAYOUTS, get_layout, rotate_directions
+from deepsurf.core.zone import Segment, Zone
+from mathlib import QAngle, Vector
+
+# =============================================================================
+# >> GLOBAL VARIABLES
+# =============================================================================
+yaws = (0.0, 33.0, 90.0, -90.0, 180.0, 271.5, 359.0)
+pitches = (-89.0, -30.0, 0.0, 45.0, 89.0)
+
+
+# =============================================================================
+# >> FUNCTIONS
+# =============================================================================
+def reference_directions(directions, yaw):
+    """Rotate directions around z one ray at a time."""
+    yaw = math.radians(yaw)
+    cos = math.cos(yaw)
+    sin = math.sin(yaw)
+    return np.array(
+        [(x * cos - y * sin, x * sin + y * cos, z) for x, y, z in directions.tolist()]
+    )
+
+
+# =============================================================================
+# >> TESTS
+# =============================================================================
+@pytest.mark.parametrize("layout", LAYOUTS)
+@pytest.mark.parametrize("yaw", yaws)
+def test_rotate_directions(layout, yaw):
+    directions = get_layout(layout, 92)
+    reference = reference_directions(directions, yaw)
+    assert np.allclose(rotate_directions(directions, yaw), reference)
+
+    out = np.empty_like(directions)
+    rotate_directions(directions, yaw, out=out)
+    assert np.allclose(out, reference)
+    assert np.allclose(np.linalg.norm(out, axis=1), 1.0)
+
+
+def test_rotate_forward():
+    # yaw 90 turns +x into +y
+    assert np.allclose(
+        rotate_directions(np.array([[1.0, 0.0, 0.0]]), 90.0), [[0, 1, 0]]
+    )
+
+
+@pytest.mark.parametrize("layout", LAYOUTS)
+@pytest.mark.parametrize("pitch", pitches)
+def test_rays_follow_yaw_only(surf, layout, pitch):
+    start, end, _ = surf
+    segment = Segment.instance()
+    segment.clear()
+    segment.set_start_zone(Zone(Vector(*start), 0))
+    segment.set_end_zone(Zone(Vector(*end)))
+
+    bot = Bot(0)
+    bot.set_sensor_layout(layout, 92)
+    bot.spawn()
+    bot.on_spawn()
+    try:
+        for yaw in yaws:
+            bot.bot.snap_to_position(Vector(*start), QAngle(pitch, yaw, 0.0))
+            bot.capture()
+            bot.get_point_cloud()
+            # bot space only turns with the yaw, see Snapshot.body_forward
+            reference = reference_directions(bot.sensor.directions, yaw)
+            assert np.allclose(bot.sensor.world_directions, reference)
+    finally:
+        bot.kick("Test done")
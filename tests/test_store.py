@@ -0,0 +1,139 @@
+"""Tests for zone/store.py, run with pytest from the repository root."""
+
+# =============================================================================
+# >> IMPORTS
+# =============================================================================
+# Python
+import json
+import os
+import struct
+
+import numpy as np
+import pytest
+
+# deepsurf
+from deepsurf.core.zone import SegmentStore
+from deepsurf.core.zone.store import (
+    HEADER,
+    MAGIC,
+    STAGE,
+    VERSION,
+    pack_segments,
+    read_json,
+    read_map,
+    unpack_segments,
+)
+
+
+# =============================================================================
+# >> FUNCTIONS
+# =============================================================================
+def make_segment(offset, num_checkpoints):
+    """Get a Segment.serialize dict with float32 exact coordinates."""
+    return {
+        "start_zone": {"orientation": 90.0, "x": offset, "y": -64.0, "z": 128.5},
+        "end_zone": {"x": offset + 4096.0, "y": 32.25, "z": -256.0},
+        "checkpoints": [
+            {"index": i, "x": offset + 512.0 * (i + 1), "y": 8.0 * i, "z": 0.125}
+            for i in range(num_checkpoints)
+        ],
+    }
+
+
+def make_segments():
+    return {
+        1: make_segment(0.0, 3),
+        2: make_segment(-1024.0, 0),
+        7: make_segment(64.0, 5),
+    }
+
+
+def wait(store):
+    store.close()
+    assert store.pending == 0
+
+
+# =============================================================================
+# >> TESTS
+# =============================================================================
+def test_round_trip():
+    segments = make_segments()
+    assert unpack_segments(pack_segments(segments)) == segments
+
+
+def test_empty():
+    assert unpack_segments(pack_segments({})) == {}
+
+
+def test_layout():
+    segments = {3: make_segment(0.0, 2)}
+    data = pack_segments(segments)
+    assert HEADER.unpack_from(data, 0) == (MAGIC, VERSION, 1)
+    stage, num_checkpoints, orientation, offset = STAGE.unpack_from(data, HEADER.size)
+    assert (stage, num_checkpoints, orientation) == (3, 2, 90.0)
+    assert offset == HEADER.size + STAGE.size
+
+    points = np.frombuffer(data, "<f4", 4 * 3, offset).reshape(-1, 3)
+    assert points[0].tolist() == [0.0, -64.0, 128.5]
+    assert points[-1].tolist() == [4096.0, 32.25, -256.0]
+    indices = np.frombuffer(data, "<i4", 2, offset + points.nbytes)
+    assert indices.tolist() == [0, 1]
+    assert len(data) == offset + points.nbytes + indices.nbytes
+
+
+def test_invalid():
+    data = pack_segments(make_segments())
+    with pytest.raises(ValueError):
+        unpack_segments(data[: HEADER.size - 1])
+    with pytest.raises(ValueError):
+        unpack_segments(b"XXXX" + data[4:])
+    with pytest.raises(ValueError):
+        unpack_segments(struct.pack("<4sHH", MAGIC, VERSION + 1, 0))
+
+
+def test_json_import(tmp_path):
+    segments = make_segments()
+    json_directory = tmp_path / "json"
+    json_directory.mkdir()
+    for stage, segment in segments.items():
+        with open(json_directory / f"surf_test_{stage}.json", "w") as f:
+            json.dump(segment, f)
+    # other maps and files aren't stages of the map
+    (json_directory / "surf_test_bonus.json").write_text("{}")
+    (json_directory / "surf_other_1.json").write_text("{}")
+
+    assert read_json(str(json_directory), "surf_test") == segments
+
+    store = SegmentStore(str(tmp_path / "segments"), str(json_directory))
+    store.load_map("surf_test")
+    wait(store)
+    assert store.get_stages() == [1, 2, 7]
+    assert store.get(7) == segments[7]
+
+    # imported segments are written to the map's segment file
+    path = store.get_path("surf_test")
+    assert os.path.exists(path)
+    assert read_map(path, str(json_directory), "surf_test") == (segments, False)
+
+
+def test_store_save_and_remove(tmp_path):
+    store = SegmentStore(str(tmp_path / "segments"), str(tmp_path / "json"))
+    store.load_map("surf_test")
+    wait(store)
+    assert store.get_stages() == []
+
+    segments = make_segments()
+    for stage, segment in segments.items():
+        assert store.save(stage, segment)
+    assert store.remove(2)
+    assert not store.remove(2)
+    wait(store)
+
+    with open(store.get_path("surf_test"), "rb") as f:
+        saved = unpack_segments(f.read())
+    del segments[2]
+    assert saved == segments
+
+    store.export_json()
+    wait(store)
+    assert read_json(str(tmp_path / "json"), "surf_test") == segments
@@ -0,0 +1,107 @@
+"""Benchmark batched action requests for multiple bots.
+
+Requests greedy actions for a batch of bots per tick from the
+stand-in network, one call per bot, one call with a tuple of
+encoded states keyed by env id and one call with a stacked buffer.
+
+Usage: python bench_batch.py [--ticks 500] [--latency 0.0] [--host HOST --port PORT]
+"""
+
+# =============================================================================
+# >> IMPORTS
+# =============================================================================
+# Python
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# deepsurf
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(__file__), "..", "addons", "source-python", "plugins"),
+)
+from deepsurf.core.network import NetworkClient
+from deepsurf.core.state import Observation
+from bench_rpc import start_stub
+
+# =============================================================================
+# >> GLOBAL VARIABLES
+# =============================================================================
+batch_sizes = (1, 2, 4, 8, 16, 32, 64)
+# (name, use_batch, use_stacked)
+modes = (("per-bot", False, False), ("keyed", True, False), ("stacked", True, True))
+
+
+# =============================================================================
+# >> FUNCTIONS
+# =============================================================================
+def random_entries(batch_size):
+    """Get (env_id, state) entries for batch_size bots with 92 rays."""
+    entries = []
+    for env_id in range(batch_size):
+        observation = Observation(92)
+        observation.distances[:] = np.random.rand(92) * 10000.0
+        observation.teleports[:] = np.random.rand(92) < 0.1
+        entries.append((env_id, observation.encode()))
+    return entries
+
+
+def run(client, entries, ticks):
+    """Request actions for entries `ticks` times, return
+    (round-trips per tick, ms per tick, actions per second)."""
+    client.round_trips = 0
+    start = time.perf_counter()
+    for _ in range(ticks):
+        actions = client.get_action_run_batch(entries)
+    elapsed = time.perf_counter() - start
+
+    assert len(actions) == len(entries)
+    assert all(len(action) == 5 for _, action in actions)
+    return (
+        client.round_trips / ticks,
+        elapsed * 1000.0 / ticks,
+        len(entries) * ticks / elapsed,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--ticks", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--host", default=None, help="use a running learner")
+    parser.add_argument("--port", type=int, default=18811)
+    args = parser.parse_args()
+
+    if args.host is None:
+        server = start_stub(args.latency)
+        client = NetworkClient([("localhost", server.port)])
+    else:
+        client = NetworkClient([(args.host, args.port)])
+    if not client.wait_connected(10.0):
+        sys.exit("Could not connect to the learner")
+
+    supported = {
+        "per-bot": True,
+        "keyed": client.use_batch and client.has("get_action_run_batch"),
+        "stacked": client.has("get_action_run_stacked"),
+    }
+
+    print(
+        f"{'bots':>5}{'mode':>10}{'round-trips/tick':>18}{'ms/tick':>10}"
+        f"{'actions/s':>12}"
+    )
+    for batch_size in batch_sizes:
+        entries = random_entries(batch_size)
+        for name, use_batch, use_stacked in modes:
+            if not supported[name]:
+                continue
+            client.use_batch = use_batch
+            client.use_stacked = use_stacked
+            round_trips, ms, actions = run(client, entries, args.ticks)
+            print(
+                f"{batch_size:>5}{name:>10}{round_trips:>18.2f}{ms:>10.3f}"
+                f"{actions:>12.0f}"
+            )
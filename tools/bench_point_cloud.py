@@ -0,0 +1,77 @@
+"""Benchmark rotating the ray directions into world space.
+
+Compares the per-tick cost of the old per-direction loop with the
+single matrix multiply used by Bot.get_point_cloud. The rotation is
+checked against a scalar reference by tests/test_sensors.py.
+
+Usage: python bench_point_cloud.py [--ticks 10000]
+"""
+
+# =============================================================================
+# >> IMPORTS
+# =============================================================================
+# Python
+import argparse
+import math
+import os
+import sys
+import timeit
+
+import numpy as np
+
+# deepsurf
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(__file__), "..", "addons", "source-python", "plugins"),
+)
+from deepsurf.core.sensors import rotate_directions, sphere_directions
+
+
+# =============================================================================
+# >> FUNCTIONS
+# =============================================================================
+def loop_tick(directions, origin, yaw):
+    """The old per-tick loop, a tuple standing in for each Vector."""
+    cos = math.cos(yaw)
+    sin = math.cos(yaw)
+    ends = []
+    for x, y, z in directions:
+        local_dir = (x * cos - y * sin, x * sin + y * cos, 0.0)
+        length = math.sqrt(local_dir[0] ** 2 + local_dir[1] ** 2) or 1.0
+        ends.append(
+            (
+                origin[0] + local_dir[0] / length * 10000.0,
+                origin[1] + local_dir[1] / length * 10000.0,
+                origin[2] + 48.0 + local_dir[2] / length * 10000.0,
+            )
+        )
+    return ends
+
+
+def vector_tick(directions, rotated, ends, origin, yaw):
+    """The per-tick work of Bot.get_point_cloud."""
+    rotate_directions(directions, yaw, out=rotated)
+    np.multiply(rotated, 10000.0, out=ends)
+    ends += (origin[0], origin[1], origin[2] + 48.0)
+    return ends.tolist()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--ticks", type=int, default=10000)
+    args = parser.parse_args()
+
+    directions = sphere_directions(10)
+    rotated = np.empty_like(directions)
+    ends = np.empty_like(directions)
+    direction_list = directions.tolist()
+    origin = (100.0, -200.0, 300.0)
+
+    loop = timeit.timeit(
+        lambda: loop_tick(direction_list, origin, 33.0), number=args.ticks
+    )
+    vector = timeit.timeit(
+        lambda: vector_tick(directions, rotated, ends, origin, 33.0), number=args.ticks
+    )
+    print(f"loop:   {loop * 1e6 / args.ticks:8.2f} us/tick")
+    print(f"vector: {vector * 1e6 / args.ticks:8.2f} us/tick")
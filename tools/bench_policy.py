@@ -0,0 +1,111 @@
+"""Benchmark in-process policy inference and check it against the learner.
+
+Exports a random MLP, serves it from the stand-in network and compares
+the in-process greedy actions with the learner's get_action_run on a
+fixed set of observations, then measures in-process latency per batch.
+
+Usage: python bench_policy.py [--ticks 2000] [--hidden 256 256] [--policy PATH]
+"""
+
+# =============================================================================
+# >> IMPORTS
+# =============================================================================
+# Python
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# deepsurf
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(__file__), "..", "addons", "source-python", "plugins"),
+)
+from deepsurf.core.network import NetworkClient
+from deepsurf.core.policy import HEADS, Policy, save_policy
+from deepsurf.core.state import Observation
+from bench_rpc import start_stub
+
+# =============================================================================
+# >> GLOBAL VARIABLES
+# =============================================================================
+batch_sizes = (1, 4, 16, 64)
+num_rays = 92
+num_checked = 256
+
+
+# =============================================================================
+# >> FUNCTIONS
+# =============================================================================
+def export_random_policy(path, hidden, seed=0):
+    """Export an MLP with random weights taking 92 ray observations."""
+    rng = np.random.RandomState(seed)
+    sizes = [Observation(num_rays).vector_size, *hidden, sum(HEADS)]
+    weights = [
+        rng.randn(n_in, n_out) / np.sqrt(n_in) for n_in, n_out in zip(sizes, sizes[1:])
+    ]
+    biases = [rng.randn(n_out) * 0.1 for n_out in sizes[1:]]
+    save_policy(path, weights, biases)
+
+
+def random_observations(count, seed=1):
+    rng = np.random.RandomState(seed)
+    observations = []
+    for _ in range(count):
+        observation = Observation(num_rays)
+        observation.distances[:] = rng.rand(num_rays) * 10000.0
+        observation.teleports[:] = rng.rand(num_rays) < 0.1
+        observation.velocity[:] = rng.randn(3) * 300.0
+        observation.waypoints[:] = rng.randn(6) * 1000.0
+        observations.append(observation)
+    return observations
+
+
+def check(policy, client, observations):
+    """Count observations where in-process and learner actions differ."""
+    mismatches = 0
+    for observation in observations:
+        (local,) = policy.act([observation])
+        remote = tuple(client.get_action_run(observation.encode()))
+        if local != remote:
+            mismatches += 1
+    return mismatches
+
+
+def run(policy, observations, ticks):
+    """Get actions for observations `ticks` times, return ms per call."""
+    start = time.perf_counter()
+    for _ in range(ticks):
+        policy.act(observations)
+    return (time.perf_counter() - start) * 1000.0 / ticks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--ticks", type=int, default=2000)
+    parser.add_argument("--hidden", type=int, nargs="*", default=[256, 256])
+    parser.add_argument("--policy", default=None, help="use an exported policy")
+    args = parser.parse_args()
+
+    path = args.policy
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), "policy.npz")
+        export_random_policy(path, args.hidden)
+
+    server = start_stub(0.0, path)
+    client = NetworkClient([("localhost", server.port)])
+    if not client.wait_connected(10.0):
+        sys.exit("Could not connect to the stand-in network")
+
+    policy = Policy(path, max(batch_sizes))
+    observations = random_observations(num_checked)
+    mismatches = check(policy, client, observations)
+    print(f"{mismatches} of {num_checked} actions differ from the learner")
+
+    print(f"{'bots':>5}{'ms/tick':>10}{'us/bot':>10}")
+    for batch_size in batch_sizes:
+        ms = run(policy, observations[:batch_size], args.ticks)
+        print(f"{batch_size:>5}{ms:>10.3f}{ms * 1000.0 / batch_size:>10.1f}")
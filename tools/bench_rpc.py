@@ -0,0 +1,128 @@
+"""Benchmark learner round-trips and latency per training tick.
+
+Runs the training tick's network calls against the stand-in network
+and compares the single round-trip step call with the legacy
+post_action + get_action path and with buffered transitions sent
+in chunks.
+
+Usage: python bench_rpc.py [--ticks 2000] [--latency 0.0] [--chunk-size 64]
+                           [--host HOST --port PORT]
+"""
+
+# =============================================================================
+# >> IMPORTS
+# =============================================================================
+# Python
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+# deepsurf
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(__file__), "..", "addons", "source-python", "plugins"),
+)
+from deepsurf.core.buffer import TransitionBuffer
+from deepsurf.core.network import NetworkClient
+from deepsurf.core.state import Observation
+from network_stub import create_server
+
+# =============================================================================
+# >> GLOBAL VARIABLES
+# =============================================================================
+# same number of rays as Bot.get_state
+observation = Observation(92)
+
+
+# =============================================================================
+# >> FUNCTIONS
+# =============================================================================
+def random_state():
+    observation.distances[:] = [random.random() for _ in range(92)]
+    observation.teleports[:] = [random.random() < 0.1 for _ in range(92)]
+    return observation.encode()
+
+
+def run(client, ticks, use_step):
+    """Run the network calls of `ticks` training ticks, return ms per tick."""
+    client.use_step = use_step
+    client.round_trips = 0
+    state = random_state()
+    client.get_action(state)
+
+    start = time.perf_counter()
+    for _ in range(ticks):
+        state = random_state()
+        client.step(0.0, state, False)
+    elapsed = time.perf_counter() - start
+
+    # don't count the initial get_action
+    round_trips = (client.round_trips - 1) / ticks
+    return round_trips, elapsed * 1000.0 / ticks
+
+
+def run_buffered(client, ticks, chunk_size):
+    """Run `ticks` training ticks buffering transitions, return ms per tick."""
+    client.round_trips = 0
+    state = random_state()
+    buffer = TransitionBuffer(chunk_size, len(state))
+    buffer.begin(state)
+    action = client.get_action(state)
+
+    start = time.perf_counter()
+    for _ in range(ticks):
+        state = random_state()
+        buffer.add(action, 0.0, False, state)
+        ((_, action),) = client.get_action_batch([(0, state)])
+        if len(buffer) >= chunk_size:
+            client.post_transitions(0, buffer.chunk())
+            buffer.consume()
+    elapsed = time.perf_counter() - start
+
+    round_trips = (client.round_trips - 1) / ticks
+    return round_trips, elapsed * 1000.0 / ticks
+
+
+def start_stub(latency, policy=None):
+    server = create_server(0, latency, policy=policy)
+    thread = threading.Thread(target=server.start, daemon=True)
+    thread.start()
+    while not server.active:
+        time.sleep(0.01)
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--ticks", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--chunk-size", type=int, default=64)
+    parser.add_argument("--host", default=None, help="use a running learner")
+    parser.add_argument("--port", type=int, default=18811)
+    args = parser.parse_args()
+
+    if args.host is None:
+        server = start_stub(args.latency)
+        client = NetworkClient([("localhost", server.port)])
+    else:
+        client = NetworkClient([(args.host, args.port)])
+    if not client.wait_connected(10.0):
+        sys.exit("Could not connect to the learner")
+
+    supports_step = client.use_step
+    if not supports_step:
+        print("learner does not implement step, only benchmarking legacy path")
+
+    print(f"{'path':<12}{'round-trips/tick':>18}{'ms/tick':>10}")
+    for name, use_step in (("legacy", False), ("step", True)):
+        if use_step and not supports_step:
+            continue
+        round_trips, ms = run(client, args.ticks, use_step)
+        print(f"{name:<12}{round_trips:>18.2f}{ms:>10.3f}")
+
+    if client.has("post_transitions"):
+        round_trips, ms = run_buffered(client, args.ticks, args.chunk_size)
+        print(f"{'buffered':<12}{round_trips:>18.2f}{ms:>10.3f}")
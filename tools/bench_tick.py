@@ -0,0 +1,183 @@
+"""Benchmark the training tick without a server.
+
+Runs Bot.train_tick with random actions against the stand-in engine
+(see standin) on an analytic surf map, or on traces logged with
+dps_tracelog, and reports the time spent in each phase as timed by
+the profiler (see dps_profile). With --repeat the ticks are run for
+each action repeat (see dps_repeat) to compare decisions per second
+and wall-clock speed. --fast-reset and --starts reset the bots as
+dps_fastreset and dps_starts do, the ticks wasted per reset are
+reported as by dps_resetstats.
+
+Usage: python bench_tick.py [--ticks 2000] [--bots 1] [--layout grid] [--budget 92]
+                            [--cache] [--stagger 0] [--teleport-index]
+                            [--traces PATH] [--quality 0] [--repeat 1,2,4]
+                            [--fast-reset] [--starts zone] [--time-limit 10]
+"""
+
+# =============================================================================
+# >> IMPORTS
+# =============================================================================
+# Python
+import argparse
+import os
+import random
+import sys
+import time
+
+# deepsurf
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(__file__), "..", "addons", "source-python", "plugins"),
+)
+import standin
+
+world, start, end, checkpoints = standin.surf_world()
+server = standin.install(world)
+
+from deepsurf.core.bot import Bot, Bots
+from deepsurf.core.profiler import profiler
+from deepsurf.core.starts import RouteStarts
+from deepsurf.core.zone import Checkpoint, Segment, Zone
+from mathlib import Vector
+from standin.replay import ReplayTracer
+
+
+# =============================================================================
+# >> FUNCTIONS
+# =============================================================================
+def setup_segment():
+    segment = Segment.instance()
+    segment.clear()
+    segment.set_start_zone(Zone(Vector(*start), 0))
+    segment.set_end_zone(Zone(Vector(*end)))
+    for i, point in enumerate(checkpoints):
+        segment.add_checkpoint(Checkpoint(i, Vector(*point)))
+
+
+def create_bots(args):
+    bots = []
+    for slot in range(args.bots):
+        bot = Bot(slot)
+        bot.set_sensor_layout(args.layout, args.budget)
+        bot.spawn()
+        if args.traces is not None:
+            bot.sensor.set_tracer(ReplayTracer(args.traces, bot.sensor.tracer))
+        if args.cache:
+            bot.set_trace_cache(16.0, 65536)
+        bot.set_teleport_index(args.teleport_index)
+        if args.stagger > 0:
+            bot.set_stagger(args.stagger, 1.0, True)
+        bot.set_quality(args.quality)
+        bot.set_time_limit(args.time_limit)
+        bot.fast_reset = args.fast_reset
+        if args.starts == "route":
+            bot.starts = RouteStarts((start,) + tuple(checkpoints) + (end,), seed=slot)
+        bot.on_spawn()
+        bot.train()
+        bots.append(bot)
+    return bots
+
+
+def run(bots, ticks, rng):
+    """Run ticks training ticks with random actions,
+    return (seconds, decisions)."""
+    decisions = 0
+    start_time = time.perf_counter()
+    for _ in range(ticks):
+        for bot in bots:
+            entry = bot.train_tick()
+            if entry is None:
+                # repeating the last action
+                continue
+            if entry[3] and bot.fast_reset:
+                # the next episode starts on the same tick, see Bots.step
+                bot.train_tick()
+            decisions += 1
+            bot.set_action(
+                (
+                    rng.randint(0, 8),
+                    rng.randint(0, 200),
+                    rng.randint(0, 200),
+                    rng.randint(0, 1),
+                    rng.randint(0, 1),
+                )
+            )
+        server.advance()
+    return time.perf_counter() - start_time, decisions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--ticks", type=int, default=2000)
+    parser.add_argument("--bots", type=int, default=1)
+    parser.add_argument("--layout", default="grid")
+    parser.add_argument("--budget", type=int, default=92)
+    parser.add_argument("--cache", action="store_true")
+    parser.add_argument("--stagger", type=int, default=0)
+    parser.add_argument("--teleport-index", action="store_true")
+    parser.add_argument("--traces", default=None, help="replay a dps_tracelog file")
+    parser.add_argument(
+        "--quality", type=int, default=0, help="budget quality level, see dps_budget"
+    )
+    parser.add_argument(
+        "--repeat", default="1", help="comma separated action repeats, see dps_repeat"
+    )
+    parser.add_argument("--fast-reset", action="store_true")
+    parser.add_argument(
+        "--starts", default="zone", choices=("zone", "route"), help="see dps_starts"
+    )
+    parser.add_argument("--time-limit", type=float, default=10.0)
+    args = parser.parse_args()
+
+    setup_segment()
+    bots = create_bots(args)
+    rng = random.Random(0)
+
+    repeats = [int(ticks) for ticks in args.repeat.split(",")]
+    baseline = None
+    for repeat in repeats:
+        for bot in bots:
+            bot.set_action_repeat(repeat)
+        # warm up caches and the teleport index
+        run(bots, 10, rng)
+        elapsed, decisions = run(bots, args.ticks, rng)
+        bot_ticks = args.ticks * len(bots)
+        if baseline is None:
+            baseline = elapsed
+        print(
+            f"{args.ticks} ticks, {len(bots)} bots, {len(bots[0].sensor)} rays, "
+            f"repeat {repeat}: {args.ticks / elapsed:.0f} ticks/s, "
+            f"{bot_ticks / elapsed:.0f} bot ticks/s, "
+            f"{decisions / elapsed:.0f} decisions/s, "
+            f"{decisions / (bot_ticks * server.tick_interval):.1f} decisions/s "
+            f"per bot in game time, {baseline / elapsed:.2f}x speed"
+        )
+
+    for bot in bots:
+        bot.set_action_repeat(repeats[0])
+    Bots.instance().set_profiling(True)
+    run(bots, args.ticks, rng)
+    Bots.instance().set_profiling(False)
+
+    rows = profiler.summary()
+    train_tick = next(row for row in rows if row[0] == "train_tick")
+    total = train_tick[2] * train_tick[3]
+    print(
+        f"{'phase':<16}{'count':>8}{'mean us':>10}{'p50':>9}{'p95':>9}{'p99':>9}"
+        f"{'share':>8}"
+    )
+    for phase, _, count, mean, p50, p95, p99, _ in rows:
+        print(
+            f"{phase:<16}{count:>8}{mean:>10.1f}{p50:>9.1f}{p95:>9.1f}{p99:>9.1f}"
+            f"{count * mean / total * 100.0:>7.1f}%"
+        )
+    for bot in bots:
+        resets, wasted_ticks, reset_ms = bot.get_reset_stats()
+        print(
+            f"bot {bot.slot}: {resets} resets, {wasted_ticks:.2f} ticks wasted "
+            f"before the first action, {reset_ms * 1000.0:.1f} us per reset"
+        )
+        if isinstance(bot.sensor.tracer, ReplayTracer):
+            tracer = bot.sensor.tracer
+            print(f"bot {bot.slot}: {tracer.found} replayed, {tracer.missing} traced")
@@ -0,0 +1,178 @@
+"""Stand-in learner network service for running deepsurf without a learner.
+
+Serves random actions over rpyc with the same interface as the real
+learner, so the plugin and benchmarks can be run locally.
+With --policy, greedy actions come from an exported policy instead,
+see policy.py.
+
+Usage: python network_stub.py [--port 18811] [--latency 0.0] [--policy PATH]
+"""
+
+# =============================================================================
+# >> IMPORTS
+# =============================================================================
+# Python
+import argparse
+import os
+import random
+import sys
+import time
+
+import rpyc
+from rpyc.utils.server import ThreadedServer
+
+# deepsurf
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(__file__), "..", "addons", "source-python", "plugins"),
+)
+from deepsurf.core.buffer import decode_transitions
+from deepsurf.core.policy import HEADS, Policy
+from deepsurf.core.state import decode_batch, state_to_vector
+
+
+# =============================================================================
+# >> CLASSES
+# =============================================================================
+class StubNetwork:
+    """Learner stand-in returning random actions."""
+
+    # simulated inference / training time per call in seconds
+    latency = 0.0
+    # greedy actions come from this policy when set
+    policy = None
+
+    def __init__(self):
+        self.transitions = 0
+        self.episodes = 0
+        # env_id -> {component: total} of the last episode
+        self.reward_components = {}
+        # env id -> (stage, progress, completed) of the last episode
+        self.stage_results = {}
+        # actions per part, see exposed_set_action_space
+        self.heads = HEADS
+
+    def _random_action(self):
+        return tuple(random.randrange(head) for head in self.heads)
+
+    def _wait(self):
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def exposed_get_action(self, state):
+        state_to_vector(state)
+        self._wait()
+        return self._random_action()
+
+    def exposed_get_action_run(self, state):
+        if self.policy is None:
+            return self.exposed_get_action(state)
+        self._wait()
+        return self.policy.act_vectors(state_to_vector(state)[None])[0]
+
+    def exposed_post_action(self, reward, state, done):
+        state_to_vector(state)
+        self.transitions += 1
+
+    def exposed_end_episode(self, total_reward, env_id=0):
+        self.episodes += 1
+
+    def exposed_explore(self):
+        pass
+
+
+class StepStubNetwork(StubNetwork):
+    """Learner stand-in that also implements the single round-trip
+    step and the batched calls for multiple bots."""
+
+    def exposed_step(self, reward, state, done):
+        self.exposed_post_action(reward, state, done)
+        return self.exposed_get_action(state)
+
+    def exposed_step_batch(self, entries):
+        actions = []
+        for env_id, reward, state, done in entries:
+            state_to_vector(state)
+            if reward is not None:
+                self.transitions += 1
+            if not done:
+                actions.append((env_id, self._random_action()))
+        self._wait()
+        return tuple(actions)
+
+    def exposed_get_action_batch(self, entries):
+        for _, state in entries:
+            state_to_vector(state)
+        self._wait()
+        return tuple((env_id, self._random_action()) for env_id, _ in entries)
+
+    def exposed_get_action_stacked(self, data):
+        states = decode_batch(data)
+        self._wait()
+        return tuple(self._random_action() for _ in range(len(states)))
+
+    def exposed_get_action_run_batch(self, entries):
+        if self.policy is None:
+            return self.exposed_get_action_batch(entries)
+        return tuple(
+            (env_id, self.exposed_get_action_run(state)) for env_id, state in entries
+        )
+
+    def exposed_get_action_run_stacked(self, data):
+        if self.policy is None:
+            return self.exposed_get_action_stacked(data)
+        self._wait()
+        return tuple(self.policy.act_vectors(decode_batch(data)))
+
+    def exposed_post_transitions(self, env_id, observations, actions, rewards, dones):
+        states, *_ = decode_transitions(observations, actions, rewards, dones)
+        self.transitions += len(states)
+
+    def exposed_set_action_space(self, descriptor):
+        self.heads = dict(descriptor)["heads"]
+
+    def exposed_post_reward_components(self, env_id, names, totals):
+        self.reward_components[env_id] = dict(zip(names, totals))
+
+    def exposed_post_stage_result(self, env_id, stage, progress, completed):
+        self.stage_results[env_id] = (stage, progress, completed)
+
+    def exposed_get_stage_weights(self, map_name, stages):
+        # leave picking stages to the plugin
+        return None
+
+
+class StubService(rpyc.Service):
+    """rpyc service exposing the stand-in network."""
+
+    exposed_Network = StepStubNetwork
+
+
+class LegacyStubService(rpyc.Service):
+    """rpyc service exposing the stand-in network without step."""
+
+    exposed_Network = StubNetwork
+
+
+# =============================================================================
+# >> FUNCTIONS
+# =============================================================================
+def create_server(port=18811, latency=0.0, legacy=False, policy=None):
+    """Create a server for the stand-in network, serving greedy
+    actions from the policy exported to path policy if given."""
+    StubNetwork.latency = latency
+    StubNetwork.policy = None if policy is None else Policy(policy)
+    service = LegacyStubService if legacy else StubService
+    return ThreadedServer(service, port=port)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=18811)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--legacy", action="store_true", help="disable step")
+    parser.add_argument("--policy", default=None, help="exported policy .npz")
+    args = parser.parse_args()
+
+    print(f"[deepsurf] Stub network listening on port {args.port}")
+    create_server(args.port, args.latency, args.legacy, args.policy).start()
@@ -0,0 +1,96 @@
+"""Headless stand-in for the Source.Python modules the plugin imports.
+
+Call `install` before importing deepsurf.core to run the plugin's
+tick loop on a plain Python install, against an analytic world
+(see world.py) instead of a TF2 server.
+"""
+
+# =============================================================================
+# >> IMPORTS
+# =============================================================================
+# Python
+import sys
+import types
+
+# stand-in
+from . import engine, mathlib
+from .world import World, box, ramp, surf_world
+
+# =============================================================================
+# >> ALL DECLARATION
+# =============================================================================
+__all__ = (
+    "install",
+    "World",
+    "box",
+    "ramp",
+    "surf_world",
+)
+
+# =============================================================================
+# >> GLOBAL VARIABLES
+# =============================================================================
+# module name -> {attribute: value}
+MODULES = {
+    "mathlib": {
+        "Vector": mathlib.Vector,
+        "QAngle": mathlib.QAngle,
+        "NULL_VECTOR": mathlib.NULL_VECTOR,
+        "NULL_QANGLE": mathlib.NULL_QANGLE,
+    },
+    "engines": {},
+    "engines.server": {
+        "server": engine.server,
+        "queue_command_string": engine.queue_command_string,
+    },
+    "engines.trace": {
+        "engine_trace": engine.engine_trace,
+        "EntityEnumerator": engine.EntityEnumerator,
+        "GameTrace": engine.GameTrace,
+        "TraceFilterSimple": engine.TraceFilterSimple,
+        "Ray": engine.Ray,
+        "ContentMasks": engine.ContentMasks,
+    },
+    "engines.precache": {"Model": engine.Model},
+    "effects": {"beam": engine.draw, "box": engine.draw},
+    "entities": {"HandleEntity": engine.HandleEntity},
+    "entities.entity": {"Entity": engine.Entity},
+    "entities.helpers": {
+        "index_from_edict": engine.index_from_edict,
+        "index_from_basehandle": engine.index_from_basehandle,
+    },
+    "filters": {},
+    "filters.recipients": {"RecipientFilter": engine.RecipientFilter},
+    "filters.entities": {"EntityIter": engine.entity_iter},
+    "memory": {"make_object": engine.make_object},
+    "messages": {"HintText": engine.Message, "SayText2": engine.Message},
+    "players": {},
+    "players.bots": {"bot_manager": engine.bot_manager, "BotCmd": engine.BotCmd},
+    "players.entity": {"Player": engine.Player},
+    "paths": {"CFG_PATH": engine.cfg_path},
+    "plugins": {},
+    "plugins.manager": {"plugin_manager": engine.plugin_manager},
+    "players.constants": {
+        "PlayerButtons": engine.PlayerButtons,
+        "PlayerStates": engine.PlayerStates,
+    },
+}
+
+
+# =============================================================================
+# >> FUNCTIONS
+# =============================================================================
+def install(world):
+    """Register the stand-in modules and run the engine against world.
+
+    Returns engine.server, advance it once per tick.
+    """
+    for name, attributes in MODULES.items():
+        module = sys.modules.get(name)
+        if module is None:
+            module = types.ModuleType(name)
+            module.__path__ = []
+            sys.modules[name] = module
+        module.__dict__.update(attributes)
+    engine.set_world(world)
+    return engine.server
@@ -0,0 +1,484 @@
+"""Stand-ins for the Source.Python engine surface the plugin uses.
+
+Players are points moved by a simplified Source movement model,
+traces run against a world.World.
+"""
+
+# =============================================================================
+# >> IMPORTS
+# =============================================================================
+# Python
+import math
+import pathlib
+import tempfile
+import types
+
+# stand-in
+from .mathlib import Vector, QAngle
+
+# =============================================================================
+# >> GLOBAL VARIABLES
+# =============================================================================
+gravity = 800.0
+friction = 4.0
+stop_speed = 100.0
+accelerate = 10.0
+air_accelerate = 150.0
+# air acceleration only adds speed up to this along the wish direction
+air_speed_cap = 30.0
+max_speed = 400.0
+jump_speed = 289.0
+ground_normal_z = 0.7
+# keep players this far from surfaces
+surface_offset = 0.03125
+# cfg/source-python, kept out of the working directory
+cfg_path = pathlib.Path(tempfile.gettempdir()) / "deepsurf-standin" / "cfg"
+
+
+# =============================================================================
+# >> CLASSES
+# =============================================================================
+class Server:
+    """engines.server.server, advanced by `advance`."""
+
+    def __init__(self):
+        self.tick = 0
+        self.tick_interval = 0.015
+        self.map_name = "standin"
+
+    @property
+    def time(self):
+        return self.tick * self.tick_interval
+
+    def advance(self, ticks=1):
+        self.tick += ticks
+
+
+class Ray:
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+
+
+class Plane:
+    def __init__(self):
+        self.normal = Vector()
+
+
+class GameTrace:
+    def __init__(self):
+        self.fraction = 1.0
+        self.end_position = Vector()
+        self.plane = Plane()
+        self.entity = None
+
+    def did_hit(self):
+        return self.fraction < 1.0
+
+    def set_hit(self, ray, fraction, normal, entity):
+        start = ray.start
+        end = ray.end
+        self.fraction = fraction
+        self.end_position = Vector(
+            start.x + (end.x - start.x) * fraction,
+            start.y + (end.y - start.y) * fraction,
+            start.z + (end.z - start.z) * fraction,
+        )
+        self.plane.normal = Vector(*normal)
+        self.entity = entity
+
+
+class ContentMasks:
+    ALL = 0xFFFFFFFF
+
+
+class TraceFilterSimple:
+    def __init__(self, ignore=()):
+        self.ignore = ignore
+
+
+class EntityEnumerator:
+    def __init__(self):
+        pass
+
+    def enum_entity(self, entity_handle):
+        raise NotImplementedError()
+
+
+class EngineTrace:
+    """engines.trace.engine_trace against `world`."""
+
+    def __init__(self):
+        self.world = None
+        self.traces = 0
+
+    def trace_ray(self, ray, mask, filter, trace):
+        self.traces += 1
+        start = ray.start
+        end = ray.end
+        hit = self.world.trace((start.x, start.y, start.z), (end.x, end.y, end.z))
+        if hit is not None:
+            trace.set_hit(ray, hit[0], hit[1], entities[0])
+
+    def enumerate_entities(self, ray, triggers, enumerator):
+        start = ray.start
+        end = ray.end
+        start = (start.x, start.y, start.z)
+        end = (end.x, end.y, end.z)
+        for teleport in self.world.teleports:
+            if teleport.intersect(start, end) is not None:
+                if not enumerator.enum_entity(teleport.index):
+                    break
+
+    def clip_ray_to_entity(self, ray, mask, entity, trace):
+        if not isinstance(entity, int):
+            entity = entity.index
+        teleport = entities[entity].teleport
+        start = ray.start
+        end = ray.end
+        fraction = teleport.intersect(
+            (start.x, start.y, start.z), (end.x, end.y, end.z)
+        )
+        if fraction is not None:
+            trace.set_hit(ray, fraction, (0.0, 0.0, 1.0), entities[entity])
+
+
+class Entity:
+    """Entities are looked up by index, see entities."""
+
+    def __new__(cls, index):
+        return entities[index]
+
+
+class WorldEntity:
+    index = 0
+    classname = "worldspawn"
+
+
+class TeleportEntity:
+    """A world.Teleport as a trigger_teleport entity."""
+
+    classname = "trigger_teleport"
+
+    def __init__(self, teleport):
+        self.teleport = teleport
+        self.index = teleport.index
+        self.origin = Vector(*teleport.mins)
+        self.size = Vector(*teleport.maxs) - self.origin
+
+    def get_property_vector(self, name):
+        if name == "m_Collision.m_vecMins":
+            return Vector()
+        if name == "m_Collision.m_vecMaxs":
+            return self.size.copy()
+        raise KeyError(name)
+
+
+class HandleEntity:
+    def __init__(self, handle):
+        self.basehandle = handle
+
+
+class Edict:
+    def __init__(self, index):
+        self.index = index
+
+
+class Player:
+    """A player moved by a simplified Source movement model.
+
+    Player(index) returns the existing player with that index.
+    """
+
+    def __new__(cls, index):
+        return entities[index]
+
+    @classmethod
+    def create(cls, index, name):
+        player = object.__new__(cls)
+        player.index = index
+        player.name = name
+        player.classname = "player"
+        player.team = 0
+        player.spectators = ()
+        player._origin = Vector()
+        player._velocity = Vector()
+        player._view_angle = QAngle()
+        player.on_ground = False
+        player.ducked = False
+        player.view_offset = Vector(0, 0, 68)
+        player.teleports = 0
+        entities[index] = player
+        return player
+
+    @property
+    def origin(self):
+        return self._origin.copy()
+
+    @property
+    def view_angle(self):
+        return self._view_angle.copy()
+
+    def get_view_angle(self):
+        return self._view_angle.copy()
+
+    def get_property_vector(self, name):
+        if name == "m_vecOrigin":
+            return self._origin.copy()
+        if name == "m_vecVelocity":
+            return self._velocity.copy()
+        if name == "m_vecViewOffset":
+            return self.view_offset.copy()
+        raise KeyError(name)
+
+    def set_property_vector(self, name, value):
+        if name == "m_vecViewOffset":
+            self.view_offset = value.copy()
+
+    def get_property_int(self, name):
+        if name == "m_fFlags":
+            return (PlayerStates.ONGROUND if self.on_ground else 0) | (
+                PlayerStates.DUCKING if self.ducked else 0
+            )
+        raise KeyError(name)
+
+    def set_property_int(self, name, value):
+        if name == "m_fFlags":
+            self.on_ground = bool(value & PlayerStates.ONGROUND)
+            self.ducked = bool(value & PlayerStates.DUCKING)
+
+    def set_property_bool(self, name, value):
+        if name == "m_Local.m_bDucked":
+            self.ducked = value
+
+    def set_property_float(self, name, value):
+        pass
+
+    def set_property_uchar(self, name, value):
+        pass
+
+    def spawn(self, force=False):
+        pass
+
+    def set_noblock(self, enabled):
+        pass
+
+    def kick(self, reason):
+        entities.pop(self.index, None)
+
+    def snap_to_position(self, origin=None, angles=None, velocity=None):
+        if origin is not None:
+            self._origin = origin.copy()
+        if angles is not None:
+            self._view_angle = angles.copy()
+        self._velocity = velocity.copy() if velocity is not None else Vector()
+
+    def move(self, bcmd):
+        """Run one tick of movement for a BotCmd."""
+        self._view_angle = bcmd.view_angles.copy()
+        dt = server.tick_interval
+
+        yaw = math.radians(self._view_angle.y)
+        forward_x, forward_y = math.cos(yaw), math.sin(yaw)
+        wish_x = forward_x * bcmd.forward_move + forward_y * bcmd.side_move
+        wish_y = forward_y * bcmd.forward_move - forward_x * bcmd.side_move
+        wish_speed = min(math.hypot(wish_x, wish_y), max_speed)
+        if wish_speed > 0.0:
+            length = math.hypot(wish_x, wish_y)
+            wish_x /= length
+            wish_y /= length
+
+        # no hull change, ducking only sets the flag
+        self.ducked = bool(bcmd.buttons & PlayerButtons.DUCK)
+        velocity = self._velocity
+        self.on_ground = self.check_ground()
+        if self.on_ground and bcmd.buttons & PlayerButtons.JUMP:
+            velocity.z = jump_speed
+            self.on_ground = False
+
+        if self.on_ground:
+            speed = velocity.length_2D
+            if speed > 0.0:
+                drop = max(speed, stop_speed) * friction * dt
+                scale = max(speed - drop, 0.0) / speed
+                velocity.x *= scale
+                velocity.y *= scale
+            self.accelerate(wish_x, wish_y, wish_speed, accelerate, dt)
+            velocity.z = 0.0
+        else:
+            self.accelerate(
+                wish_x, wish_y, min(wish_speed, air_speed_cap), air_accelerate, dt
+            )
+            velocity.z -= gravity * dt
+
+        self.slide(dt)
+
+        teleport = engine_trace.world.teleport_at(
+            (self._origin.x, self._origin.y, self._origin.z)
+        )
+        if teleport is not None:
+            self._origin = Vector(*teleport.destination)
+            self._velocity = Vector()
+            self.teleports += 1
+
+    def accelerate(self, wish_x, wish_y, wish_speed, rate, dt):
+        velocity = self._velocity
+        current = velocity.x * wish_x + velocity.y * wish_y
+        add = wish_speed - current
+        if add <= 0.0:
+            return
+        add = min(add, rate * max_speed * dt)
+        velocity.x += wish_x * add
+        velocity.y += wish_y * add
+
+    def check_ground(self):
+        origin = self._origin
+        start = (origin.x, origin.y, origin.z)
+        hit = engine_trace.world.trace(start, (origin.x, origin.y, origin.z - 2.0))
+        return (
+            hit is not None and hit[1][2] >= ground_normal_z and self._velocity.z <= 0.0
+        )
+
+    def slide(self, dt):
+        """Move along the velocity, sliding along surfaces hit."""
+        origin = self._origin
+        velocity = self._velocity
+        remaining = dt
+        for _ in range(4):
+            start = (origin.x, origin.y, origin.z)
+            end = (
+                origin.x + velocity.x * remaining,
+                origin.y + velocity.y * remaining,
+                origin.z + velocity.z * remaining,
+            )
+            hit = engine_trace.world.trace(start, end)
+            if hit is None:
+                origin.x, origin.y, origin.z = end
+                return
+
+            fraction, (nx, ny, nz) = hit
+            origin.x = start[0] + (end[0] - start[0]) * fraction + nx * surface_offset
+            origin.y = start[1] + (end[1] - start[1]) * fraction + ny * surface_offset
+            origin.z = start[2] + (end[2] - start[2]) * fraction + nz * surface_offset
+            remaining *= 1.0 - fraction
+
+            # clip the velocity to the surface
+            into = velocity.x * nx + velocity.y * ny + velocity.z * nz
+            if into < 0.0:
+                velocity.x -= nx * into
+                velocity.y -= ny * into
+                velocity.z -= nz * into
+            if remaining <= 0.0:
+                return
+
+
+class BotCmd:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.view_angles = QAngle()
+        self.forward_move = 0.0
+        self.side_move = 0.0
+        self.up_move = 0.0
+        self.buttons = 0
+
+
+class PlayerButtons:
+    ATTACK = 1 << 0
+    JUMP = 1 << 1
+    DUCK = 1 << 2
+
+
+class PlayerStates:
+    ONGROUND = 1 << 0
+    DUCKING = 1 << 1
+
+
+class BotController:
+    def __init__(self, player):
+        self.player = player
+
+    def run_player_move(self, bcmd):
+        self.player.move(bcmd)
+
+
+class BotManager:
+    def create_bot(self, name):
+        index = max(list(entities) + [64]) + 1
+        Player.create(index, name)
+        return Edict(index)
+
+    def get_bot_controller(self, edict):
+        return BotController(entities[edict.index])
+
+
+class Model:
+    def __init__(self, path):
+        self.path = path
+        self.index = 0
+
+
+class PluginManager:
+    def get_plugin_info(self, name):
+        """Plugin info of the plugin module name is in."""
+        return types.SimpleNamespace(name=name.split(".")[0])
+
+
+class RecipientFilter(list):
+    pass
+
+
+class Message:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def send(self, *args, **kwargs):
+        pass
+
+
+# =============================================================================
+# >> FUNCTIONS
+# =============================================================================
+def set_world(world):
+    """Make world the one traces and movement run against."""
+    engine_trace.world = world
+    for index in [i for i, e in entities.items() if isinstance(e, TeleportEntity)]:
+        del entities[index]
+    for teleport in world.teleports:
+        entities[teleport.index] = TeleportEntity(teleport)
+
+
+def make_object(cls, handle):
+    return cls(handle)
+
+
+def index_from_basehandle(basehandle):
+    return basehandle
+
+
+def index_from_edict(edict):
+    return edict.index
+
+
+def entity_iter(classname):
+    return [e for e in entities.values() if e.classname == classname]
+
+
+def draw(*args, **kwargs):
+    """Stand-in for effects that only draw."""
+
+
+def queue_command_string(command):
+    pass
+
+
+# =============================================================================
+# >> GLOBAL VARIABLES
+# =============================================================================
+server = Server()
+engine_trace = EngineTrace()
+bot_manager = BotManager()
+plugin_manager = PluginManager()
+# index -> entity
+entities = {0: WorldEntity()}
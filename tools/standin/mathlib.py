@@ -0,0 +1,133 @@
+"""Stand-in for the Source.Python mathlib module."""
+
+# =============================================================================
+# >> IMPORTS
+# =============================================================================
+# Python
+import math
+
+
+# =============================================================================
+# >> CLASSES
+# =============================================================================
+class Vector:
+    """3D vector with the operations the plugin uses."""
+
+    __slots__ = ("x", "y", "z")
+
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self.x = float(x)
+        self.y = float(y)
+        self.z = float(z)
+
+    def __repr__(self):
+        return f"Vector({self.x}, {self.y}, {self.z})"
+
+    def __str__(self):
+        return f"{self.x} {self.y} {self.z}"
+
+    def __iter__(self):
+        return iter((self.x, self.y, self.z))
+
+    def __eq__(self, other):
+        return self.x == other.x and self.y == other.y and self.z == other.z
+
+    def __add__(self, other):
+        return Vector(self.x + other.x, self.y + other.y, self.z + other.z)
+
+    def __sub__(self, other):
+        return Vector(self.x - other.x, self.y - other.y, self.z - other.z)
+
+    def __mul__(self, scale):
+        return Vector(self.x * scale, self.y * scale, self.z * scale)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, scale):
+        return Vector(self.x / scale, self.y / scale, self.z / scale)
+
+    def __neg__(self):
+        return Vector(-self.x, -self.y, -self.z)
+
+    def copy(self):
+        return Vector(self.x, self.y, self.z)
+
+    def dot(self, other):
+        return self.x * other.x + self.y * other.y + self.z * other.z
+
+    def cross(self, other):
+        return Vector(
+            self.y * other.z - self.z * other.y,
+            self.z * other.x - self.x * other.z,
+            self.x * other.y - self.y * other.x,
+        )
+
+    @property
+    def length(self):
+        return math.sqrt(self.x * self.x + self.y * self.y + self.z * self.z)
+
+    @property
+    def length_2D(self):
+        return math.sqrt(self.x * self.x + self.y * self.y)
+
+    def normalized(self):
+        length = self.length
+        if length == 0.0:
+            return Vector()
+        return Vector(self.x / length, self.y / length, self.z / length)
+
+    def get_distance(self, other):
+        dx = self.x - other.x
+        dy = self.y - other.y
+        dz = self.z - other.z
+        return math.sqrt(dx * dx + dy * dy + dz * dz)
+
+
+class QAngle:
+    """Pitch, yaw and roll in degrees."""
+
+    __slots__ = ("x", "y", "z")
+
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self.x = float(x)
+        self.y = float(y)
+        self.z = float(z)
+
+    def __repr__(self):
+        return f"QAngle({self.x}, {self.y}, {self.z})"
+
+    def __iter__(self):
+        return iter((self.x, self.y, self.z))
+
+    def copy(self):
+        return QAngle(self.x, self.y, self.z)
+
+    def get_angle_vectors(self, forward=None, right=None, up=None):
+        """Write the direction vectors into the given Vectors,
+        matching the engine's AngleVectors."""
+        pitch = math.radians(self.x)
+        yaw = math.radians(self.y)
+        roll = math.radians(self.z)
+        sp, cp = math.sin(pitch), math.cos(pitch)
+        sy, cy = math.sin(yaw), math.cos(yaw)
+        sr, cr = math.sin(roll), math.cos(roll)
+
+        if forward is not None:
+            forward.x = cp * cy
+            forward.y = cp * sy
+            forward.z = -sp
+        if right is not None:
+            right.x = -sr * sp * cy + cr * sy
+            right.y = -sr * sp * sy - cr * cy
+            right.z = -sr * cp
+        if up is not None:
+            up.x = cr * sp * cy + sr * sy
+            up.y = cr * sp * sy - sr * cy
+            up.z = cr * cp
+
+
+# =============================================================================
+# >> GLOBAL VARIABLES
+# =============================================================================
+NULL_VECTOR = Vector()
+NULL_QANGLE = QAngle()
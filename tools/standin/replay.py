@@ -0,0 +1,83 @@
+"""Replay traces logged on a server, see tracing.TraceLog."""
+
+# =============================================================================
+# >> IMPORTS
+# =============================================================================
+# Python
+import math
+
+import numpy as np
+
+# deepsurf
+from deepsurf.core.tracing import Tracer
+
+
+# =============================================================================
+# >> CLASSES
+# =============================================================================
+class ReplayTracer(Tracer):
+    """Answers traces from a trace log.
+
+    Rays are matched by start position quantized to grid_size units
+    and direction quantized to 1 / direction_steps, as in
+    tracing.TraceCache. Rays missing from the log go to fallback,
+    e.g. an EngineTracer against an analytic world, or miss.
+    """
+
+    def __init__(self, path, fallback=None, grid_size=16.0, direction_steps=64):
+        self.fallback = fallback
+        self.grid_size = grid_size
+        self.direction_steps = direction_steps
+        self.results = {}
+        self.found = 0
+        self.missing = 0
+
+        with np.load(path) as data:
+            starts = data["starts"]
+            ends = data["ends"]
+            hits = data["hits"]
+            teleports = data["teleports"]
+
+        for start, end, hit, is_teleport in zip(
+            starts.tolist(), ends.tolist(), hits.tolist(), teleports.tolist()
+        ):
+            if math.isnan(hit[0]):
+                result = (None, False)
+            else:
+                result = (tuple(hit), bool(is_teleport))
+            self.results[self.key(start, end)] = result
+
+    def __len__(self):
+        return len(self.results)
+
+    def key(self, start, end):
+        dx = end[0] - start[0]
+        dy = end[1] - start[1]
+        dz = end[2] - start[2]
+        length = math.sqrt(dx * dx + dy * dy + dz * dz) or 1.0
+        grid = self.grid_size
+        steps = self.direction_steps / length
+        return (
+            int(start[0] // grid),
+            int(start[1] // grid),
+            int(start[2] // grid),
+            int(round(dx * steps)),
+            int(round(dy * steps)),
+            int(round(dz * steps)),
+        )
+
+    def trace(self, start, end):
+        result = self.results.get(self.key(start, end))
+        if result is not None:
+            self.found += 1
+            return result
+
+        self.missing += 1
+        if self.fallback is None:
+            return None, False
+        return self.fallback.trace(start, end)
+
+    def clip(self, start, end, entity):
+        if self.fallback is None:
+            return None
+        return self.fallback.clip(start, end, entity)
@@ -0,0 +1,203 @@
+"""Analytic worlds of convex brushes and teleport volumes.
+
+Rays are traced in pure Python against planes, so the stand-in
+engine can run without numpy arrays per ray.
+"""
+
+# =============================================================================
+# >> IMPORTS
+# =============================================================================
+# Python
+import math
+
+
+# =============================================================================
+# >> CLASSES
+# =============================================================================
+class Brush:
+    """Convex solid, the points p with n . p <= d for all planes (n, d)."""
+
+    def __init__(self, planes):
+        self.planes = [
+            (float(n[0]), float(n[1]), float(n[2]), float(d)) for n, d in planes
+        ]
+        # bounds for a quick reject, set by box and ramp
+        self.mins = None
+        self.maxs = None
+
+    def intersect(self, start, end):
+        """Get (fraction, normal) where the ray from start to end enters
+        the brush, None on a miss. Starting inside is a hit at 0."""
+        sx, sy, sz = start
+        rx = end[0] - sx
+        ry = end[1] - sy
+        rz = end[2] - sz
+        enter = -1.0
+        leave = 1.0
+        normal = (0.0, 0.0, 1.0)
+        for nx, ny, nz, d in self.planes:
+            distance = nx * sx + ny * sy + nz * sz - d
+            denom = nx * rx + ny * ry + nz * rz
+            if denom == 0.0:
+                if distance > 0.0:
+                    return None
+                continue
+            t = -distance / denom
+            if denom < 0.0:
+                if t > enter:
+                    enter = t
+                    normal = (nx, ny, nz)
+            elif t < leave:
+                leave = t
+            if enter > leave:
+                return None
+
+        if enter > 1.0 or leave < 0.0:
+            return None
+        return max(enter, 0.0), normal
+
+
+class Teleport:
+    """trigger_teleport volume sending players to destination."""
+
+    classname = "trigger_teleport"
+
+    def __init__(self, index, mins, maxs, destination):
+        self.index = index
+        self.mins = tuple(float(v) for v in mins)
+        self.maxs = tuple(float(v) for v in maxs)
+        self.destination = tuple(float(v) for v in destination)
+
+    def contains(self, point):
+        return all(self.mins[i] <= point[i] <= self.maxs[i] for i in range(3))
+
+    def intersect(self, start, end):
+        """Get the fraction where the ray from start to end enters
+        the volume, None on a miss."""
+        enter = 0.0
+        leave = 1.0
+        for i in range(3):
+            ray = end[i] - start[i]
+            if ray == 0.0:
+                if not self.mins[i] <= start[i] <= self.maxs[i]:
+                    return None
+                continue
+            t1 = (self.mins[i] - start[i]) / ray
+            t2 = (self.maxs[i] - start[i]) / ray
+            if t1 > t2:
+                t1, t2 = t2, t1
+            enter = max(enter, t1)
+            leave = min(leave, t2)
+            if enter > leave:
+                return None
+        return enter
+
+
+class World:
+    """Brushes and teleports a stand-in map is made of."""
+
+    def __init__(self, brushes=(), teleports=()):
+        self.brushes = list(brushes)
+        self.teleports = list(teleports)
+
+    def trace(self, start, end):
+        """Get (fraction, normal) of the first brush hit by the ray,
+        None on a miss."""
+        best = None
+        for brush in self.brushes:
+            if brush.mins is not None and not _bounds_overlap(brush, start, end):
+                continue
+            hit = brush.intersect(start, end)
+            if hit is not None and (best is None or hit[0] < best[0]):
+                best = hit
+        return best
+
+    def teleport_at(self, point):
+        for teleport in self.teleports:
+            if teleport.contains(point):
+                return teleport
+        return None
+
+
+# =============================================================================
+# >> FUNCTIONS
+# =============================================================================
+def _bounds_overlap(brush, start, end):
+    for i in range(3):
+        low = start[i] if start[i] < end[i] else end[i]
+        high = end[i] if start[i] < end[i] else start[i]
+        if high < brush.mins[i] or low > brush.maxs[i]:
+            return False
+    return True
+
+
+def box(mins, maxs):
+    """Axis aligned box brush."""
+    brush = Brush(
+        [
+            ((1, 0, 0), maxs[0]),
+            ((-1, 0, 0), -mins[0]),
+            ((0, 1, 0), maxs[1]),
+            ((0, -1, 0), -mins[1]),
+            ((0, 0, 1), maxs[2]),
+            ((0, 0, -1), -mins[2]),
+        ]
+    )
+    brush.mins = tuple(mins)
+    brush.maxs = tuple(maxs)
+    return brush
+
+
+def ramp(x0, x1, center_y, half_width, bottom, top):
+    """Surf ramp along x, a prism with a triangular cross-section
+    peaking at center_y."""
+    height = top - bottom
+    length = math.hypot(height, half_width)
+    ny = height / length
+    nz = half_width / length
+    left = center_y - half_width
+    right = center_y + half_width
+    brush = Brush(
+        [
+            ((1, 0, 0), x1),
+            ((-1, 0, 0), -x0),
+            ((0, 0, -1), -bottom),
+            ((0, -ny, nz), -ny * left + nz * bottom),
+            ((0, ny, nz), ny * right + nz * bottom),
+        ]
+    )
+    brush.mins = (x0, left, bottom)
+    brush.maxs = (x1, right, top)
+    return brush
+
+
+def surf_world(ramps=4, ramp_length=2048.0, gap=512.0):
+    """A line of surf ramps along x over a floor teleporting
+    back to the start.
+
+    Returns (world, start point, end point, checkpoints).
+    """
+    brushes = []
+    checkpoints = []
+    x = 0.0
+    for i in range(ramps):
+        y = 512.0 if i % 2 else -512.0
+        brushes.append(ramp(x, x + ramp_length, y, 384.0, -512.0, 0.0))
+        checkpoints.append((x + ramp_length, y * 0.5, 64.0))
+        x += ramp_length + gap
+
+    end_x = x
+    brushes.append(box((end_x, -1024.0, -64.0), (end_x + 1024.0, 1024.0, 0.0)))
+    brushes.append(box((-1024.0, -4096.0, -2048.0), (end_x + 2048.0, 4096.0, -1984.0)))
+
+    start = (64.0, -512.0, 48.0)
+    teleports = [
+        Teleport(
+            1,
+            (-1024.0, -4096.0, -1984.0),
+            (end_x + 2048.0, 4096.0, -1536.0),
+            start,
+        )
+    ]
+    world = World(brushes, teleports)
+    return world, start, (end_x + 512.0, 0.0, 16.0), checkpoints[:-1]